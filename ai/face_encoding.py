@@ -3,15 +3,31 @@ Face Encoding Script for Smart Attendance System
 
 This script is used to encode faces from student images for recognition.
 It processes images and generates face encodings that are stored in the database.
+
+A directory is encoded in parallel into one consolidated gallery:
+    encodings/gallery.npy          float32 matrix, one row per student
+    encodings/gallery_names.json   names (image filenames without extension),
+                                   with the row count and SHA-256 of gallery.npy
+    encodings/manifest.json        content hash and mtime of every image
+Re-running skips images whose content has not changed, and an interrupted
+run resumes from its last checkpoint.
 """
 
 import face_recognition
 import numpy as np
 from PIL import Image
+from multiprocessing import Pool
+import argparse
+import hashlib
+import json
 import pickle
 import os
 import sys
 
+GALLERY_FILE = 'gallery.npy'
+NAMES_FILE = 'gallery_names.json'
+MANIFEST_FILE = 'manifest.json'
+
 def encode_face_from_file(image_path):
     """
     Encode a face from an image file
@@ -66,38 +82,188 @@ def save_encoding(encoding, output_path):
         print(f"Error saving encoding: {str(e)}")
         return False
 
-def batch_encode_faces(input_directory, output_directory):
+def file_digest(path):
+    """SHA-256 of a file's contents"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _atomic_write(path, write):
+    """Write via a temporary file so an interruption never leaves a partial file"""
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        write(f)
+    os.replace(tmp_path, path)
+
+def gallery_digest(matrix):
+    """SHA-256 of an encodings matrix; ties gallery_names.json to the gallery.npy it was written with"""
+    return hashlib.sha256(np.ascontiguousarray(matrix, dtype=np.float32)).hexdigest()
+
+def load_gallery(output_directory, mmap_mode=None, verify=True):
     """
-    Encode all faces in a directory
+    Load a consolidated gallery
+    
+    Args:
+        output_directory: Directory containing gallery.npy and gallery_names.json
+        mmap_mode: Passed to np.load, e.g. 'r' to memory-map the encodings
+        verify: Check the matrix against the hash stored with the names
+            (reads the whole matrix once); the row count is always checked
+        
+    Returns:
+        (encodings matrix, list of names), or (None, []) if there is no gallery
+    
+    Raises:
+        ValueError: if the two files were not written together, e.g. a save
+            was interrupted between them
+    """
+    gallery_path = os.path.join(output_directory, GALLERY_FILE)
+    names_path = os.path.join(output_directory, NAMES_FILE)
+    if not (os.path.exists(gallery_path) and os.path.exists(names_path)):
+        return None, []
+    
+    with open(names_path) as f:
+        meta = json.load(f)
+    matrix = np.load(gallery_path, mmap_mode=mmap_mode)
+    # Galleries written before the hash was stored hold a plain list of names
+    names = meta['names'] if isinstance(meta, dict) else meta
+    if len(names) != len(matrix) or (
+        isinstance(meta, dict) and verify and gallery_digest(matrix) != meta['sha256']
+    ):
+        raise ValueError(f"{GALLERY_FILE} and {NAMES_FILE} in {output_directory} do not match; "
+                         f"re-run face_encoding.py to rebuild the gallery")
+    return matrix, names
+
+def save_gallery(output_directory, encodings_by_name, manifest):
+    """
+    Write the consolidated gallery and manifest
+    
+    Each file is replaced atomically, the matrix first. The names file
+    carries the matrix's row count and hash, so a save interrupted between
+    the two replaces is detected by load_gallery instead of pairing rows
+    with the wrong names.
+    """
+    names = sorted(encodings_by_name)
+    matrix = np.array([encodings_by_name[name] for name in names], dtype=np.float32).reshape(-1, 128)
+    meta = {'rows': len(names), 'sha256': gallery_digest(matrix), 'names': names}
+    
+    _atomic_write(os.path.join(output_directory, GALLERY_FILE), lambda f: np.save(f, matrix))
+    _atomic_write(os.path.join(output_directory, NAMES_FILE), lambda f: f.write(json.dumps(meta).encode()))
+    _atomic_write(
+        os.path.join(output_directory, MANIFEST_FILE),
+        lambda f: f.write(json.dumps(manifest, indent=1, sort_keys=True).encode())
+    )
+
+def _encode_job(image_path):
+    """Worker entry point: (image_path, encoding or None)"""
+    return image_path, encode_face_from_file(image_path)
+
+def batch_encode_faces(input_directory, output_directory, workers=None, checkpoint_every=100):
+    """
+    Encode all faces in a directory into a consolidated gallery
     
     Args:
         input_directory: Directory containing student images
-        output_directory: Directory to save encodings
+        output_directory: Directory to save the gallery and manifest
+        workers: Number of encoding processes (default: CPU count)
+        checkpoint_every: Save progress after this many newly encoded images
     """
     if not os.path.exists(output_directory):
         os.makedirs(output_directory)
     
     image_extensions = ['.jpg', '.jpeg', '.png', '.bmp']
     
-    for filename in os.listdir(input_directory):
+    # Previous run: manifest entries and encodings by name
+    manifest_path = os.path.join(output_directory, MANIFEST_FILE)
+    old_manifest = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            old_manifest = json.load(f)
+    try:
+        old_matrix, old_names = load_gallery(output_directory)
+    except ValueError as e:
+        # Rows and names cannot be paired: re-encode everything the manifest marks as encoded
+        print(f"{e}; re-encoding")
+        old_matrix, old_names = None, []
+    old_encodings = dict(zip(old_names, old_matrix)) if old_matrix is not None else {}
+    
+    manifest = {}
+    encodings_by_name = {}
+    to_encode = []
+    
+    for filename in sorted(os.listdir(input_directory)):
         file_ext = os.path.splitext(filename)[1].lower()
         
-        if file_ext in image_extensions:
-            image_path = os.path.join(input_directory, filename)
-            encoding = encode_face_from_file(image_path)
-            
-            if encoding is not None:
-                output_filename = os.path.splitext(filename)[0] + '.pkl'
-                output_path = os.path.join(output_directory, output_filename)
-                save_encoding(encoding, output_path)
+        if file_ext not in image_extensions:
+            continue
+        
+        image_path = os.path.join(input_directory, filename)
+        name = os.path.splitext(filename)[0]
+        stat = os.stat(image_path)
+        entry = {'name': name, 'mtime': stat.st_mtime, 'size': stat.st_size}
+        previous = old_manifest.get(filename)
+        
+        # Unchanged mtime and size: trust the previous result without hashing
+        if previous and previous['mtime'] == entry['mtime'] and previous['size'] == entry['size']:
+            entry['sha256'] = previous['sha256']
+        else:
+            entry['sha256'] = file_digest(image_path)
+        
+        if previous and previous['sha256'] == entry['sha256'] and (
+            not previous.get('encoded') or name in old_encodings
+        ):
+            entry['encoded'] = previous.get('encoded', False)
+            manifest[filename] = entry
+            if entry['encoded']:
+                encodings_by_name[name] = old_encodings[name]
+            continue
+        
+        manifest[filename] = entry
+        to_encode.append(image_path)
+    
+    skipped = len(manifest) - len(to_encode)
+    print(f"{len(manifest)} images: {skipped} unchanged, {len(to_encode)} to encode")
+    
+    # Entries not yet encoded are left out of checkpoints, so a rerun retries them
+    pending = {os.path.basename(path) for path in to_encode}
+    
+    def checkpoint():
+        done = {key: value for key, value in manifest.items() if key not in pending}
+        save_gallery(output_directory, encodings_by_name, done)
+    
+    if to_encode:
+        with Pool(processes=workers) as pool:
+            for count, (image_path, encoding) in enumerate(
+                pool.imap_unordered(_encode_job, to_encode), start=1
+            ):
+                filename = os.path.basename(image_path)
+                entry = manifest[filename]
+                entry['encoded'] = encoding is not None
+                if encoding is not None:
+                    encodings_by_name[entry['name']] = encoding
+                pending.discard(filename)
+                
+                if count % checkpoint_every == 0:
+                    checkpoint()
+                    print(f"Encoded {count}/{len(to_encode)} images")
+    
+    checkpoint()
+    print(f"Gallery saved to {output_directory} ({len(encodings_by_name)} encodings)")
+    return encodings_by_name
 
 if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print("Usage: python face_encoding.py <image_path_or_directory>")
-        print("Example: python face_encoding.py student_photos/")
-        sys.exit(1)
+    parser = argparse.ArgumentParser(
+        description="Encode a face image, or a directory of images into a consolidated gallery"
+    )
+    parser.add_argument("input_path", help="Image file or directory of student images")
+    parser.add_argument("--output", help="Gallery directory (default: <input>/encodings)")
+    parser.add_argument("--workers", type=int, default=None, help="Encoding processes (default: CPU count)")
+    parser.add_argument("--checkpoint-every", type=int, default=100,
+                        help="Save progress after this many newly encoded images")
+    args = parser.parse_args()
     
-    input_path = sys.argv[1]
+    input_path = args.input_path
     
     if os.path.isfile(input_path):
         # Single file encoding
@@ -107,8 +273,8 @@ if __name__ == "__main__":
             save_encoding(encoding, output_path)
     elif os.path.isdir(input_path):
         # Batch encoding
-        output_dir = os.path.join(input_path, 'encodings')
-        batch_encode_faces(input_path, output_dir)
+        output_dir = args.output or os.path.join(input_path, 'encodings')
+        batch_encode_faces(input_path, output_dir, args.workers, args.checkpoint_every)
     else:
         print(f"Error: {input_path} is not a valid file or directory")
         sys.exit(1)
@@ -0,0 +1,474 @@
+"""
+Face Recognition Script for Smart Attendance System
+
+This script performs real-time face recognition for attendance marking.
+It compares captured faces against stored encodings in the database.
+
+(Not named face_recognition.py: run from ai/, that name would shadow the
+face_recognition library for this script and its siblings.)
+"""
+
+import face_recognition
+import numpy as np
+from PIL import Image
+import pickle
+import argparse
+import queue
+import threading
+import time
+import cv2
+import sys
+import os
+from face_encoding import load_gallery
+
+VIDEO_EXTENSIONS = ['.mp4', '.avi', '.mov', '.mkv', '.webm']
+
+class FrameGrabber:
+    """
+    Reads frames from a camera or video file on a dedicated thread
+    
+    A camera drops stale frames so the consumer always gets the latest one;
+    a video file is read in order with a small buffer so no frame is skipped.
+    """
+    
+    def __init__(self, source, buffer_size=2):
+        self.capture = cv2.VideoCapture(source)
+        self.live = isinstance(source, int)
+        self.frames = queue.Queue(maxsize=buffer_size)
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+    
+    def start(self):
+        if not self.capture.isOpened():
+            raise IOError("Could not open video source")
+        self.thread.start()
+        return self
+    
+    def _put_latest(self, item):
+        """Queue an item without blocking, dropping the oldest buffered one if full"""
+        while True:
+            try:
+                self.frames.put_nowait(item)
+                return
+            except queue.Full:
+                try:
+                    self.frames.get_nowait()
+                except queue.Empty:
+                    pass
+    
+    def _put_in_order(self, item):
+        """Queue an item, waiting for room until the grabber is stopped"""
+        while not self.stopped.is_set():
+            try:
+                self.frames.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+    
+    def _run(self):
+        try:
+            while not self.stopped.is_set():
+                ret, frame = self.capture.read()
+                if not ret:
+                    break
+                if self.live:
+                    # Latest frame wins
+                    self._put_latest(frame)
+                else:
+                    self._put_in_order(frame)
+            # End-of-stream marker; after stop() nobody reads, so it must not block
+            if self.stopped.is_set() or self.live:
+                self._put_latest(None)
+            else:
+                self._put_in_order(None)
+        finally:
+            # Released here, by the thread that reads it, once reading has ended
+            self.capture.release()
+    
+    def read(self):
+        """Next frame, or None when the source is exhausted"""
+        return self.frames.get()
+    
+    def stop(self):
+        self.stopped.set()
+        if self.thread.ident is None:
+            # Never started: nothing else owns the capture
+            self.capture.release()
+            return
+        # The thread exits after at most one capture read; it releases the capture itself
+        self.thread.join(timeout=5)
+        if self.thread.is_alive():
+            print("Video source is not responding; it will be released when its read returns")
+
+def box_iou(a, b):
+    """Intersection over union of two (top, right, bottom, left) boxes"""
+    top, right = max(a[0], b[0]), min(a[1], b[1])
+    bottom, left = min(a[2], b[2]), max(a[3], b[3])
+    inter = max(0, right - left) * max(0, bottom - top)
+    if inter == 0:
+        return 0.0
+    area_a = (a[1] - a[3]) * (a[2] - a[0])
+    area_b = (b[1] - b[3]) * (b[2] - b[0])
+    return inter / float(area_a + area_b - inter)
+
+class FaceTracker:
+    """
+    Associates detections across frames by box overlap
+    
+    Each track is encoded until it is recognized (or max_attempts runs out),
+    so a face that stays in view is not re-encoded on every detection.
+    """
+    
+    def __init__(self, iou_threshold=0.3, max_missed=2, max_attempts=3):
+        self.iou_threshold = iou_threshold
+        self.max_missed = max_missed
+        self.max_attempts = max_attempts
+        self.tracks = []
+        self.next_id = 0
+    
+    def update(self, boxes):
+        """Match detected boxes to tracks; returns the current tracks"""
+        unmatched = list(range(len(boxes)))
+        for track in self.tracks:
+            best, best_iou = None, self.iou_threshold
+            for i in unmatched:
+                iou = box_iou(track['box'], boxes[i])
+                if iou >= best_iou:
+                    best, best_iou = i, iou
+            if best is None:
+                track['missed'] += 1
+            else:
+                track['box'] = boxes[best]
+                track['missed'] = 0
+                unmatched.remove(best)
+        
+        self.tracks = [track for track in self.tracks if track['missed'] <= self.max_missed]
+        for i in unmatched:
+            self.tracks.append({
+                'id': self.next_id, 'box': boxes[i], 'missed': 0,
+                'name': None, 'confidence': None, 'attempts': 0
+            })
+            self.next_id += 1
+        return self.tracks
+    
+    def needs_encoding(self):
+        """Visible tracks that are not recognized yet"""
+        return [
+            track for track in self.tracks
+            if track['missed'] == 0 and track['name'] is None and track['attempts'] < self.max_attempts
+        ]
+
+class FaceRecognizer:
+    """Face Recognition class for attendance system"""
+    
+    def __init__(self, tolerance=0.6):
+        """
+        Initialize face recognizer
+        
+        Args:
+            tolerance: Face matching tolerance (lower is more strict)
+        """
+        self.tolerance = tolerance
+        self.known_encodings = np.empty((0, 128), dtype=np.float32)
+        self.known_names = []
+        self._squared_norms = None
+    
+    def load_encodings_from_directory(self, encodings_dir, verify=False):
+        """
+        Load all face encodings from a directory
+        
+        Args:
+            encodings_dir: Directory containing a gallery from face_encoding.py,
+                or pickle files with encodings
+            verify: Also check gallery.npy against the hash stored with the
+                names; this reads the whole matrix, so it is off by default
+                (the row count is always checked)
+        """
+        if not os.path.exists(encodings_dir):
+            print(f"Encodings directory {encodings_dir} not found")
+            return
+        
+        try:
+            # Memory-mapped: pages are read on first use and shared between processes
+            encodings, names = load_gallery(encodings_dir, mmap_mode='r', verify=verify)
+        except ValueError as e:
+            print(f"Gallery not loaded: {e}")
+            return
+        if encodings is not None:
+            self.known_names = names
+            self.known_encodings = encodings
+            self._squared_norms = None
+            print(f"Loaded gallery with {len(self.known_names)} encodings")
+            return
+        
+        encodings = []
+        names = []
+        for filename in os.listdir(encodings_dir):
+            if filename.endswith('.pkl'):
+                filepath = os.path.join(encodings_dir, filename)
+                try:
+                    with open(filepath, 'rb') as f:
+                        encodings.append(pickle.load(f))
+                        # Use filename without extension as name
+                        names.append(os.path.splitext(filename)[0])
+                except Exception as e:
+                    print(f"Error loading {filename}: {str(e)}")
+        
+        if encodings:
+            self.known_encodings = np.array(encodings, dtype=np.float32)
+        self.known_names = names
+        self._squared_norms = None
+        print(f"Loaded {len(names)} encodings")
+    
+    def match(self, encoding):
+        """
+        Find the closest known face in one vectorized pass
+        
+        Args:
+            encoding: 128-d face encoding
+            
+        Returns:
+            (name, distance) of the closest face within tolerance, or None
+        """
+        if len(self.known_names) == 0:
+            return None
+        
+        if self._squared_norms is None:
+            self._squared_norms = np.einsum('ij,ij->i', self.known_encodings, self.known_encodings)
+        
+        probe = np.asarray(encoding, dtype=np.float32)
+        # |g - p|^2 = |g|^2 - 2 g.p + |p|^2, one matrix-vector product over the gallery
+        squared = self._squared_norms - 2 * (self.known_encodings @ probe) + probe @ probe
+        best = int(np.argmin(squared))
+        distance = float(np.sqrt(max(squared[best], 0.0)))
+        
+        if distance > self.tolerance:
+            return None
+        return self.known_names[best], distance
+    
+    def recognize_face_from_image(self, image_path):
+        """
+        Recognize face from an image file
+        
+        Args:
+            image_path: Path to the image file
+            
+        Returns:
+            Dictionary with recognition results
+        """
+        try:
+            # Load image
+            image = face_recognition.load_image_file(image_path)
+            
+            # Find face locations and encodings
+            face_locations = face_recognition.face_locations(image)
+            face_encodings = face_recognition.face_encodings(image, face_locations)
+            
+            if len(face_encodings) == 0:
+                return {
+                    'success': False,
+                    'message': 'No face detected in image'
+                }
+            
+            # Use the first detected face
+            unknown_encoding = face_encodings[0]
+            
+            # Compare with known faces
+            match = self.match(unknown_encoding)
+            
+            if match is not None:
+                name, distance = match
+                return {
+                    'success': True,
+                    'name': name,
+                    'confidence': float(1 - distance),
+                    'message': 'Face recognized successfully'
+                }
+            
+            return {
+                'success': False,
+                'message': 'Face not recognized'
+            }
+            
+        except Exception as e:
+            return {
+                'success': False,
+                'message': f'Error: {str(e)}'
+            }
+    
+    def recognize_from_webcam(self, source=0, detect_every=5, detection_width=480,
+                              debounce_seconds=10, display=True, max_frames=None):
+        """
+        Continuous face recognition from a camera or video file
+        
+        Frames are captured on a separate thread. Detection runs on a
+        downscaled copy every `detect_every` frames, faces are tracked between
+        detections, and each track is encoded at full resolution until it is
+        recognized. A name is reported at most once per `debounce_seconds`.
+        
+        Args:
+            source: Camera index or path to a video file
+            detect_every: Run detection on every Nth frame
+            detection_width: Width of the detection copy (0 = full resolution)
+            debounce_seconds: Minimum time between reports of the same name
+            display: Show a preview window (False for headless runs)
+            max_frames: Stop after this many frames
+            
+        Returns:
+            Dictionary with recognition events and per-stage timings
+        """
+        grabber = FrameGrabber(source).start()
+        tracker = FaceTracker()
+        last_reported = {}
+        events = []
+        timings = {'detect': [], 'encode': [], 'match': []}
+        frames = 0
+        start = time.perf_counter()
+        
+        if display:
+            print("Press 'q' to quit")
+        
+        try:
+            while max_frames is None or frames < max_frames:
+                frame = grabber.read()
+                if frame is None:
+                    break
+                frames += 1
+                
+                if (frames - 1) % detect_every == 0:
+                    # Convert BGR to RGB
+                    rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+                    
+                    stage = time.perf_counter()
+                    height, width = rgb_frame.shape[:2]
+                    scale = detection_width / width if 0 < detection_width < width else 1.0
+                    small = cv2.resize(rgb_frame, None, fx=scale, fy=scale) if scale < 1.0 else rgb_frame
+                    face_locations = [
+                        (
+                            int(top / scale), min(int(right / scale), width),
+                            min(int(bottom / scale), height), int(left / scale)
+                        )
+                        for (top, right, bottom, left) in face_recognition.face_locations(small)
+                    ]
+                    timings['detect'].append(time.perf_counter() - stage)
+                    
+                    tracker.update(face_locations)
+                    pending = tracker.needs_encoding()
+                    
+                    if pending:
+                        stage = time.perf_counter()
+                        face_encodings = face_recognition.face_encodings(
+                            rgb_frame, [track['box'] for track in pending]
+                        )
+                        timings['encode'].append(time.perf_counter() - stage)
+                        
+                        for track, encoding in zip(pending, face_encodings):
+                            track['attempts'] += 1
+                            stage = time.perf_counter()
+                            match = self.match(encoding)
+                            timings['match'].append(time.perf_counter() - stage)
+                            if match is None:
+                                continue
+                            
+                            track['name'], distance = match
+                            track['confidence'] = 1 - distance
+                            now = time.monotonic()
+                            if now - last_reported.get(track['name'], -debounce_seconds) >= debounce_seconds:
+                                last_reported[track['name']] = now
+                                events.append({
+                                    'name': track['name'],
+                                    'confidence': float(track['confidence']),
+                                    'frame': frames
+                                })
+                                print(f"Recognized: {track['name']} (Confidence: {track['confidence']:.2%})")
+                
+                if display:
+                    # Draw tracked faces
+                    for track in tracker.tracks:
+                        top, right, bottom, left = track['box']
+                        color = (0, 255, 0) if track['name'] else (0, 0, 255)
+                        cv2.rectangle(frame, (left, top), (right, bottom), color, 2)
+                        if track['name']:
+                            cv2.putText(frame, track['name'], (left, max(top - 8, 0)),
+                                        cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
+                    
+                    cv2.imshow('Face Recognition - Press Q to Quit', frame)
+                    
+                    if cv2.waitKey(1) & 0xFF == ord('q'):
+                        break
+        finally:
+            grabber.stop()
+            if display:
+                cv2.destroyAllWindows()
+        
+        elapsed = time.perf_counter() - start
+        return {
+            'frames': frames,
+            'seconds': elapsed,
+            'fps': frames / elapsed if elapsed > 0 else 0.0,
+            'tracks': tracker.next_id,
+            'events': events,
+            'timings': timings
+        }
+
+def print_pipeline_stats(stats):
+    """Print frames per second and per-stage latency of a live run"""
+    print(f"\nFrames: {stats['frames']} in {stats['seconds']:.1f}s ({stats['fps']:.1f} fps)")
+    print(f"Tracks: {stats['tracks']}, recognitions reported: {len(stats['events'])}")
+    for stage, samples in stats['timings'].items():
+        if samples:
+            ms = np.array(samples) * 1000
+            print(f"  {stage:<7} calls {len(ms):>6}  mean {ms.mean():8.2f}ms  p95 {np.percentile(ms, 95):8.2f}ms")
+        else:
+            print(f"  {stage:<7} calls      0")
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(
+        description="Recognize faces in an image, a camera stream or a video file",
+        epilog="Example: python recognize.py ./encodings student.jpg"
+    )
+    parser.add_argument("encodings_dir", help="Gallery directory from face_encoding.py")
+    parser.add_argument("target", help="Image path, video path, 'webcam' or a camera index")
+    parser.add_argument("--tolerance", type=float, default=0.6)
+    parser.add_argument("--detect-every", type=int, default=5, help="Run detection on every Nth frame")
+    parser.add_argument("--detection-width", type=int, default=480,
+                        help="Width frames are downscaled to for detection (0 = full resolution)")
+    parser.add_argument("--debounce", type=float, default=10, help="Seconds between reports of the same name")
+    parser.add_argument("--headless", action="store_true",
+                        help="No preview window; print fps and per-stage latency at the end")
+    parser.add_argument("--max-frames", type=int, default=None)
+    parser.add_argument("--verify-gallery", action="store_true",
+                        help="Check gallery.npy against its stored hash (reads the whole gallery)")
+    args = parser.parse_args()
+    
+    target = args.target
+    
+    # Initialize recognizer
+    recognizer = FaceRecognizer(tolerance=args.tolerance)
+    recognizer.load_encodings_from_directory(args.encodings_dir, verify=args.verify_gallery)
+    
+    if target.lower() == 'webcam' or target.isdigit() or os.path.splitext(target)[1].lower() in VIDEO_EXTENSIONS:
+        # Continuous recognition
+        source = 0 if target.lower() == 'webcam' else int(target) if target.isdigit() else target
+        stats = recognizer.recognize_from_webcam(
+            source,
+            detect_every=max(1, args.detect_every),
+            detection_width=args.detection_width,
+            debounce_seconds=args.debounce,
+            display=not args.headless,
+            max_frames=args.max_frames
+        )
+        print_pipeline_stats(stats)
+    else:
+        # Single image recognition
+        result = recognizer.recognize_face_from_image(target)
+        print("\nRecognition Result:")
+        print(f"Success: {result['success']}")
+        print(f"Message: {result['message']}")
+        if result['success']:
+            print(f"Name: {result['name']}")
+            print(f"Confidence: {result['confidence']:.2%}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,302 @@
+"""
+Lecture Video Attendance for Smart Attendance System
+
+This script takes attendance from a recorded lecture. The video is split
+into segments that are processed in parallel; each segment samples frames
+at a fixed rate, detects faces on a downscaled copy, encodes all faces of a
+frame in one batch and matches them against the gallery from face_encoding.py.
+Students seen in at least --min-sightings sampled frames are reported as
+present, either as JSON/CSV or posted to the backend's /attendance/bulk API.
+
+Usage:
+    python video_attendance.py lecture.mp4 ./encodings --sample-fps 1 --workers 8
+    python video_attendance.py lecture.mp4 ./encodings --post http://localhost:8000 --marked-by 1 --subject Maths
+"""
+
+import face_recognition
+import numpy as np
+from multiprocessing import Pool
+from urllib import request as urlrequest
+import argparse
+import csv
+import json
+import os
+import sys
+import cv2
+from face_encoding import load_gallery
+
+# Per-process gallery, loaded once by the pool initializer
+_gallery = None
+
+def _init_worker(encodings_dir):
+    """Memory-map the gallery in each worker process"""
+    global _gallery
+    # extract_attendance verified the gallery hash once; workers only check row counts
+    encodings, names = load_gallery(encodings_dir, mmap_mode='r', verify=False)
+    if encodings is None:
+        raise IOError(f"No gallery found in {encodings_dir}")
+    squared_norms = np.einsum('ij,ij->i', encodings, encodings)
+    _gallery = (encodings, names, squared_norms)
+
+def match_faces(probes, tolerance):
+    """
+    Match every face of a frame against the gallery in one pass
+
+    Returns:
+        Dictionary of name -> distance for faces within tolerance
+    """
+    encodings, names, squared_norms = _gallery
+    if len(encodings) == 0:
+        return {}
+    probes = np.asarray(probes, dtype=np.float32)
+    squared = squared_norms[None, :] - 2 * (probes @ encodings.T) + np.einsum('ij,ij->i', probes, probes)[:, None]
+    best = np.argmin(squared, axis=1)
+    distances = np.sqrt(np.maximum(squared[np.arange(len(probes)), best], 0.0))
+
+    matches = {}
+    for index, distance in zip(best, distances):
+        if distance <= tolerance:
+            name = names[index]
+            # A student counts once per frame
+            matches[name] = min(float(distance), matches.get(name, float('inf')))
+    return matches
+
+def process_segment(job):
+    """
+    Sample, detect, encode and match one segment of the video
+
+    Args:
+        job: (video_path, start_frame, end_frame, step, fps, tolerance, detection_width)
+            end_frame None reads to the end of the video
+
+    Returns:
+        (sightings by name, sampled frame count)
+    """
+    video_path, start_frame, end_frame, step, fps, tolerance, detection_width = job
+    capture = cv2.VideoCapture(video_path)
+    if start_frame:
+        capture.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+
+    sightings = {}
+    sampled = 0
+    frame_index = start_frame
+
+    try:
+        while end_frame is None or frame_index < end_frame:
+            if frame_index % step:
+                # Skipped frames are grabbed but never converted
+                if not capture.grab():
+                    break
+                frame_index += 1
+                continue
+
+            ret, frame = capture.read()
+            if not ret:
+                break
+            sampled += 1
+
+            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            height, width = rgb_frame.shape[:2]
+            scale = detection_width / width if 0 < detection_width < width else 1.0
+            small = cv2.resize(rgb_frame, None, fx=scale, fy=scale) if scale < 1.0 else rgb_frame
+            face_locations = [
+                (
+                    int(top / scale), min(int(right / scale), width),
+                    min(int(bottom / scale), height), int(left / scale)
+                )
+                for (top, right, bottom, left) in face_recognition.face_locations(small)
+            ]
+
+            if face_locations:
+                face_encodings = face_recognition.face_encodings(rgb_frame, face_locations)
+                timestamp = frame_index / fps
+                for name, distance in match_faces(face_encodings, tolerance).items():
+                    entry = sightings.setdefault(name, {
+                        'sightings': 0, 'best_distance': distance,
+                        'first_seen': timestamp, 'last_seen': timestamp
+                    })
+                    entry['sightings'] += 1
+                    entry['best_distance'] = min(entry['best_distance'], distance)
+                    entry['first_seen'] = min(entry['first_seen'], timestamp)
+                    entry['last_seen'] = max(entry['last_seen'], timestamp)
+
+            frame_index += 1
+    finally:
+        capture.release()
+
+    return sightings, sampled
+
+def aggregate(segment_results, min_sightings):
+    """
+    Combine per-segment sightings across the whole video
+
+    Returns:
+        (present students, students seen fewer than min_sightings times)
+    """
+    totals = {}
+    for sightings, _ in segment_results:
+        for name, entry in sightings.items():
+            total = totals.get(name)
+            if total is None:
+                totals[name] = dict(entry)
+                continue
+            total['sightings'] += entry['sightings']
+            total['best_distance'] = min(total['best_distance'], entry['best_distance'])
+            total['first_seen'] = min(total['first_seen'], entry['first_seen'])
+            total['last_seen'] = max(total['last_seen'], entry['last_seen'])
+
+    present, below = [], []
+    for name, total in sorted(totals.items(), key=lambda item: item[1]['first_seen']):
+        result = {
+            'student_roll': name,
+            'sightings': total['sightings'],
+            'confidence': round(1 - total['best_distance'], 4),
+            'first_seen': round(total['first_seen'], 1),
+            'last_seen': round(total['last_seen'], 1)
+        }
+        (present if total['sightings'] >= min_sightings else below).append(result)
+    return present, below
+
+def extract_attendance(video_path, encodings_dir, sample_fps=1.0, workers=None, min_sightings=3,
+                       tolerance=0.6, detection_width=640, segments_per_worker=4):
+    """
+    Take attendance from a lecture video
+
+    Args:
+        video_path: Path to the video file
+        encodings_dir: Gallery directory from face_encoding.py
+        sample_fps: Frames per second of video to analyze
+        workers: Number of processes (default: CPU count)
+        min_sightings: Sampled frames a student must appear in to count as present
+        tolerance: Face matching tolerance (lower is more strict)
+        detection_width: Width frames are downscaled to for detection (0 = full resolution)
+        segments_per_worker: Segments per process, for load balancing
+
+    Returns:
+        Dictionary with present students, near misses and run statistics
+    """
+    # Verify the gallery files belong together once, before any worker maps them
+    encodings, _ = load_gallery(encodings_dir, mmap_mode='r')
+    if encodings is None:
+        raise IOError(f"No gallery found in {encodings_dir}")
+    if len(encodings) == 0:
+        raise ValueError(f"The gallery in {encodings_dir} has no encodings; encode student photos first")
+    del encodings
+
+    capture = cv2.VideoCapture(video_path)
+    if not capture.isOpened():
+        raise IOError(f"Could not open video {video_path}")
+    fps = capture.get(cv2.CAP_PROP_FPS) or 25.0
+    total_frames = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+    capture.release()
+
+    step = max(1, int(round(fps / sample_fps)))
+    workers = workers or os.cpu_count() or 1
+
+    if total_frames > 0:
+        count = max(1, min(workers * segments_per_worker, total_frames // step))
+        # Segment boundaries fall on sampled frames so no sample is read twice
+        bounds = [(total_frames * i // count) // step * step for i in range(count)] + [total_frames]
+        jobs = [
+            (video_path, bounds[i], bounds[i + 1], step, fps, tolerance, detection_width)
+            for i in range(count) if bounds[i] < bounds[i + 1]
+        ]
+    else:
+        # Unknown length (some containers): read sequentially
+        jobs = [(video_path, 0, None, step, fps, tolerance, detection_width)]
+
+    print(f"{total_frames} frames at {fps:.1f} fps, sampling every {step} frames "
+          f"in {len(jobs)} segments on {workers} workers", file=sys.stderr)
+
+    with Pool(processes=workers, initializer=_init_worker, initargs=(encodings_dir,)) as pool:
+        results = pool.map(process_segment, jobs, chunksize=1)
+
+    present, below = aggregate(results, min_sightings)
+    return {
+        'video': os.path.basename(video_path),
+        'sampled_frames': sum(sampled for _, sampled in results),
+        'min_sightings': min_sightings,
+        'present': present,
+        'below_threshold': below
+    }
+
+def post_attendance(api_url, result, subject, marked_by):
+    """Submit the present students to the backend's bulk attendance endpoint"""
+    payload = {
+        'subject': subject,
+        'marked_by': marked_by,
+        'records': [
+            {
+                'student_roll': student['student_roll'],
+                'confidence_score': int(student['confidence'] * 100),
+                'remarks': f"From video {result['video']}"
+            }
+            for student in result['present']
+        ]
+    }
+    req = urlrequest.Request(
+        api_url.rstrip('/') + '/attendance/bulk',
+        data=json.dumps(payload).encode(),
+        headers={'Content-Type': 'application/json'},
+        method='POST'
+    )
+    with urlrequest.urlopen(req) as response:
+        return json.loads(response.read())
+
+def write_results(result, output_path):
+    """Write present students to a .csv file, or the full result to JSON"""
+    if output_path.lower().endswith('.csv'):
+        with open(output_path, 'w', newline='') as f:
+            writer = csv.DictWriter(
+                f, fieldnames=['student_roll', 'sightings', 'confidence', 'first_seen', 'last_seen']
+            )
+            writer.writeheader()
+            writer.writerows(result['present'])
+    else:
+        with open(output_path, 'w') as f:
+            json.dump(result, f, indent=2)
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description="Take attendance from a recorded lecture")
+    parser.add_argument("video", help="Path to the lecture video")
+    parser.add_argument("encodings_dir", help="Gallery directory from face_encoding.py")
+    parser.add_argument("--sample-fps", type=float, default=1.0, help="Frames per second of video to analyze")
+    parser.add_argument("--workers", type=int, default=None, help="Processes (default: CPU count)")
+    parser.add_argument("--min-sightings", type=int, default=3,
+                        help="Sampled frames a student must appear in to count as present")
+    parser.add_argument("--tolerance", type=float, default=0.6)
+    parser.add_argument("--detection-width", type=int, default=640,
+                        help="Width frames are downscaled to for detection (0 = full resolution)")
+    parser.add_argument("--output", help="Write results to a .json or .csv file instead of stdout")
+    parser.add_argument("--post", metavar="API_URL", help="Backend URL to post bulk attendance to")
+    parser.add_argument("--subject", help="Subject for posted attendance")
+    parser.add_argument("--marked-by", type=int, help="User id recorded as marking the attendance")
+    args = parser.parse_args()
+
+    if args.post and args.marked_by is None:
+        parser.error("--post requires --marked-by")
+
+    result = extract_attendance(
+        args.video, args.encodings_dir,
+        sample_fps=args.sample_fps,
+        workers=args.workers,
+        min_sightings=args.min_sightings,
+        tolerance=args.tolerance,
+        detection_width=args.detection_width
+    )
+
+    if args.output:
+        write_results(result, args.output)
+        print(f"{len(result['present'])} students present, results written to {args.output}", file=sys.stderr)
+    else:
+        print(json.dumps(result, indent=2))
+
+    if args.post:
+        response = post_attendance(args.post, result, args.subject, args.marked_by)
+        print(response['message'], file=sys.stderr)
+        if response['unknown']:
+            print(f"Unknown students: {', '.join(map(str, response['unknown']))}", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -12,6 +12,71 @@ class Settings(BaseSettings):
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
     FACE_ENCODINGS_DIR: str = "./face_encodings"
     FACE_RECOGNITION_TOLERANCE: float = 0.6
+    # Gallery search index: "exact" scans every encoding, "ivf" probes the
+    # FACE_INDEX_NPROBE nearest of FACE_INDEX_NLIST clusters (0 = sqrt(N)).
+    # Higher nprobe means better recall and slower queries. Galleries smaller
+    # than FACE_INDEX_MIN_SIZE are always scanned exactly.
+    FACE_INDEX_TYPE: str = "exact"
+    FACE_INDEX_NLIST: int = 0
+    FACE_INDEX_NPROBE: int = 8
+    FACE_INDEX_MIN_SIZE: int = 10000
+    # Scan the gallery as "int8" codes ("none" = float32) and re-rank each
+    # probe's FACE_GALLERY_RERANK nearest rows exactly. Exact
+    # rows then go to a memory-mapped file in FACE_GALLERY_SPILL_DIR (empty =
+    # system temp dir; keep it on disk, not tmpfs, for the memory saving)
+    FACE_GALLERY_QUANTIZATION: str = "none"
+    FACE_GALLERY_RERANK: int = 8
+    FACE_GALLERY_SPILL_DIR: str = ""
+    # When mark-by-face is scoped to a department/year/section, retry against
+    # the whole gallery if the scoped shard has no match
+    FACE_SCOPE_FALLBACK_GLOBAL: bool = False
+    # Face detection/encoding worker processes (0 = one thread in the API
+    # process) and how many jobs may be running or queued before new face
+    # requests are rejected with 503
+    FACE_WORKERS: int = 2
+    FACE_MAX_PENDING: int = 8
+    # Faces are detected on a copy whose longest side is at most this many
+    # pixels (0 = no further downscale); encodings use the decoded image,
+    # which for large JPEGs is already reduced towards FACE_DECODE_MAX_SIZE
+    # (below), so that setting bounds the encoding resolution
+    FACE_DETECTION_MAX_SIZE: int = 1024
+    FACE_DETECTION_UPSAMPLE: int = 1
+    # Cache of detection results keyed by image hash (0 entries = disabled)
+    FACE_CACHE_SIZE: int = 256
+    FACE_CACHE_TTL_SECONDS: int = 300
+    # Bulk enrollment: images per archive, per-image size limit and how many
+    # encodings are written per transaction
+    FACE_BULK_MAX_FILES: int = 5000
+    FACE_BULK_MAX_IMAGE_BYTES: int = 10 * 1024 * 1024
+    FACE_BULK_BATCH_SIZE: int = 100
+    # Extra face templates a student may have on top of the primary encoding
+    FACE_MAX_TEMPLATES: int = 5
+    # Live WebSocket sessions: largest accepted frame, and how many processed
+    # frames a face may go undetected before its track is dropped
+    FACE_LIVE_MAX_FRAME_BYTES: int = 2 * 1024 * 1024
+    FACE_LIVE_TRACK_TTL: int = 5
+    # Concurrent mark-by-face matches arriving within this window (or until
+    # FACE_BATCH_MAX_SIZE are waiting) share one gallery pass; 0 disables
+    FACE_BATCH_WINDOW_MS: float = 5
+    FACE_BATCH_MAX_SIZE: int = 32
+    # Recently marked (student, subject, day) entries and idempotency keys
+    # kept in memory to answer duplicate marks without a database write
+    ATTENDANCE_DEDUPE_CACHE_SIZE: int = 100000
+    ATTENDANCE_DEDUPE_TTL_SECONDS: int = 3600
+    # Uploaded images: largest accepted file and pixel count. JPEGs whose
+    # longest side is at least twice FACE_DECODE_MAX_SIZE are decoded at
+    # 1/2, 1/4 or 1/8 scale, never below it (0 = always full resolution)
+    FACE_MAX_UPLOAD_BYTES: int = 10 * 1024 * 1024
+    FACE_MAX_IMAGE_PIXELS: int = 50_000_000
+    FACE_DECODE_MAX_SIZE: int = 1600
+    # Load the face models in every worker as it starts (the pool
+    # initializer), run them once and build the gallery before the API starts
+    # serving (otherwise each worker loads them on its first request)
+    FACE_WARMUP: bool = False
+    FACE_ENCODING_DTYPE: str = "float32"  # stored encoding precision: float32 or float64
+    # Reload the in-memory face gallery after this many seconds (0 = never).
+    # Only needed when several worker processes share one database.
+    FACE_GALLERY_REFRESH_SECONDS: int = 0
 
     class Config:
         env_file = ".env"
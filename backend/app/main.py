@@ -1,9 +1,15 @@
+import time
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
-from app.database import Base, engine
+from app.database import Base, engine, SessionLocal
+from app.config import settings
 from app.routes.auth_routes import router as auth_router
 from app.routes.student_routes import router as student_router
 from app.routes.attendance_routes import router as attendance_router
+from app.services import face_service, attendance_service
+from app.utils.metrics import registry
+from app.utils.pagination import NEXT_CURSOR_HEADER
 
 # Create all database tables on startup
 Base.metadata.create_all(bind=engine)
@@ -21,6 +27,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
 # Register all routers
 app.include_router(auth_router, prefix="/auth", tags=["Authentication"])
@@ -28,6 +35,53 @@ app.include_router(student_router, prefix="/students", tags=["Students"])
 app.include_router(attendance_router, prefix="/attendance", tags=["Attendance"])
 
 
+@app.on_event("startup")
+def build_attendance_summary():
+    """Fill the attendance summary counters on a database that predates them"""
+    db = SessionLocal()
+    try:
+        built = attendance_service.ensure_attendance_summary(db)
+    finally:
+        db.close()
+    if built is not None:
+        print(f"Built {built} attendance summary counters from existing attendance rows")
+
+
+@app.on_event("startup")
+async def warm_up_face_workers():
+    """With FACE_WARMUP, load the face models and gallery before serving requests"""
+    if not settings.FACE_WARMUP or not face_service.face_library_available():
+        return
+    start = time.perf_counter()
+    db = SessionLocal()
+    try:
+        workers = await face_service.warm_up(db)
+    finally:
+        db.close()
+    print(f"Face workers warmed up ({workers} processes) in {time.perf_counter() - start:.1f}s")
+
+
+@app.on_event("shutdown")
+def shutdown_face_executor():
+    face_service.executor.shutdown()
+
+
 @app.get("/", tags=["Health"])
 def root():
     return {"status": "Backend running", "docs": "/docs"}
+
+
+@app.get("/health/face-cache", tags=["Health"])
+def face_cache_stats():
+    return face_service.encoding_cache.stats()
+
+
+@app.get("/health/face-batching", tags=["Health"])
+def face_batching_stats():
+    return face_service.match_batcher.stats()
+
+
+@app.get("/metrics", tags=["Health"], response_class=PlainTextResponse)
+def metrics():
+    """Face pipeline stage latencies, outcomes and queue depths for Prometheus"""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Enum
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Date, Enum, Index, event, func
 from sqlalchemy.orm import relationship
 from datetime import datetime
 import enum
@@ -16,12 +16,34 @@ class Attendance(Base):
     student_id = Column(Integer, ForeignKey("students.id"), nullable=False)
     subject = Column(String)
     class_date = Column(DateTime, default=datetime.utcnow)
+    class_day = Column(Date, nullable=False)  # class_date's day; part of the uniqueness rule
     status = Column(Enum(AttendanceStatus), default=AttendanceStatus.PRESENT)
     marked_by = Column(Integer, ForeignKey("users.id"))  # Teacher who marked attendance
     marked_at = Column(DateTime, default=datetime.utcnow)
     remarks = Column(String)
     confidence_score = Column(Integer)  # Face recognition confidence (0-100)
+    idempotency_key = Column(String, unique=True)  # Client-supplied key; retries return this row
     
     # Relationships
     student = relationship("Student", back_populates="attendance_records")
     teacher = relationship("User", foreign_keys=[marked_by])
+    
+    # One record per student, subject and class day (a missing subject counts as one subject)
+    __table_args__ = (
+        Index(
+            "uq_attendance_student_subject_day",
+            "student_id", func.coalesce(subject, ""), "class_day",
+            unique=True
+        ),
+        # Per-student history, per-subject class lists and daily reports, filtered by date range
+        Index("ix_attendance_student_class_date", "student_id", "class_date"),
+        Index("ix_attendance_subject_class_date", "subject", "class_date"),
+        Index("ix_attendance_class_date", "class_date"),
+    )
+
+@event.listens_for(Attendance, "before_insert")
+def _set_class_day(mapper, connection, target):
+    """Fill class_date and class_day from a single timestamp"""
+    if target.class_date is None:
+        target.class_date = datetime.utcnow()
+    target.class_day = target.class_date.date()
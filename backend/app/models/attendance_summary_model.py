@@ -0,0 +1,105 @@
+from collections import defaultdict
+from sqlalchemy import Column, Integer, String, ForeignKey, Enum, event, inspect
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from app.database import Base
+from app.models.attendance_model import Attendance, AttendanceStatus
+
+class AttendanceSummary(Base):
+    """Running count of attendance rows per student, subject and status
+
+    Kept in step with the attendance table by the flush listeners below, in
+    the same transaction as the change. A missing subject is stored as ''.
+    """
+    __tablename__ = "attendance_summary"
+
+    student_id = Column(Integer, ForeignKey("students.id", ondelete="CASCADE"), primary_key=True)
+    subject = Column(String, primary_key=True, default="")
+    status = Column(Enum(AttendanceStatus), primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
+def _load_replaced_value(target, value, oldvalue, initiator):
+    """Nothing to do; registered with active_history so the old value is loaded"""
+
+# Assigning one of these on an expired row (e.g. after a commit) would not
+# load the value it replaces, and _original could not tell which counter
+# the row leaves
+for _attribute in (Attendance.student_id, Attendance.subject, Attendance.status):
+    event.listen(_attribute, "set", _load_replaced_value, active_history=True)
+
+def _original(record: Attendance, attribute: str):
+    """Value of an attribute as it was loaded from the database"""
+    history = inspect(record).attrs[attribute].history
+    if history.deleted:
+        return history.deleted[0]
+    return getattr(record, attribute)
+
+def _key(student_id, subject, status):
+    if student_id is None or status is None:
+        return None
+    return student_id, subject or "", AttendanceStatus(status)
+
+def apply_deltas(connection, deltas):
+    """Add each {(student_id, subject, status): delta} to its counter"""
+    table = AttendanceSummary.__table__
+    rows = [
+        {"student_id": student_id, "subject": subject, "status": status, "count": delta}
+        for (student_id, subject, status), delta in deltas.items() if delta
+    ]
+    if not rows:
+        return
+
+    dialects = {"postgresql": postgresql, "sqlite": sqlite}
+    dialect = dialects.get(connection.dialect.name)
+    if dialect is not None:
+        statement = dialect.insert(table)
+        statement = statement.on_conflict_do_update(
+            index_elements=[table.c.student_id, table.c.subject, table.c.status],
+            set_={"count": table.c.count + statement.excluded["count"]}
+        )
+        connection.execute(statement, rows)
+        return
+
+    for row in rows:
+        updated = connection.execute(
+            table.update().where(
+                table.c.student_id == row["student_id"],
+                table.c.subject == row["subject"],
+                table.c.status == row["status"]
+            ).values(count=table.c.count + row["count"])
+        )
+        if updated.rowcount == 0:
+            connection.execute(table.insert().values(**row))
+
+@event.listens_for(Session, "before_flush")
+def _collect_removed(session, flush_context, instances):
+    """Count deleted and re-keyed attendance rows while their old values are loaded"""
+    deltas = defaultdict(int)
+    for record in session.deleted:
+        if isinstance(record, Attendance):
+            key = _key(*(_original(record, name) for name in ("student_id", "subject", "status")))
+            if key is not None:
+                deltas[key] -= 1
+
+    for record in session.dirty:
+        if isinstance(record, Attendance) and session.is_modified(record):
+            old = _key(*(_original(record, name) for name in ("student_id", "subject", "status")))
+            new = _key(record.student_id, record.subject, record.status)
+            if old != new:
+                if old is not None:
+                    deltas[old] -= 1
+                if new is not None:
+                    deltas[new] += 1
+    session.info["attendance_summary_deltas"] = deltas
+
+@event.listens_for(Session, "after_flush")
+def _apply_summary(session, flush_context):
+    """Apply the flush's counter changes on its connection, so they commit or roll back with it"""
+    deltas = session.info.pop("attendance_summary_deltas", None) or defaultdict(int)
+    # New rows are counted after the insert, when column defaults (status) are filled in
+    for record in session.new:
+        if isinstance(record, Attendance):
+            key = _key(record.student_id, record.subject, record.status)
+            if key is not None:
+                deltas[key] += 1
+    apply_deltas(session.connection(), deltas)
@@ -0,0 +1,17 @@
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, LargeBinary
+from sqlalchemy.orm import relationship
+from datetime import datetime
+from app.database import Base
+
+class FaceTemplate(Base):
+    """Additional face encoding for a student (lighting, glasses, older photo)"""
+    __tablename__ = "face_templates"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    student_id = Column(Integer, ForeignKey("students.id", ondelete="CASCADE"), nullable=False, index=True)
+    face_encoding = Column(LargeBinary, nullable=False)  # Same format as Student.face_encoding
+    label = Column(String)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    
+    # Relationships
+    student = relationship("Student", back_populates="face_templates")
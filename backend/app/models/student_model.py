@@ -21,3 +21,4 @@ class Student(Base):
     # Relationships
     user = relationship("User", back_populates="student")
     attendance_records = relationship("Attendance", back_populates="student")
+    face_templates = relationship("FaceTemplate", back_populates="student", cascade="all, delete-orphan")
@@ -1,33 +1,135 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
+import asyncio
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Header, Query, Response, WebSocket, WebSocketDisconnect
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy import or_, tuple_
 from sqlalchemy.orm import Session
 from typing import List
 from datetime import datetime, date
 from app.database import get_db
-from app.schemas.attendance_schema import AttendanceCreate, AttendanceResponse, AttendanceWithDetails
+from app.schemas.attendance_schema import AttendanceCreate, AttendanceBulkCreate, AttendanceUpdate, AttendanceResponse, AttendanceWithDetails
 from app.models.attendance_model import Attendance
-from app.services import face_service, attendance_service
+from app.models.student_model import Student
+from app.config import settings
+from app.services import face_service, attendance_service, face_metrics
+from app.services.live_service import LiveSession
+from app.utils.pagination import decode_cursor, set_next_cursor
 
 router = APIRouter()
 
+def _get_record(db: Session, attendance_id: int):
+    return db.query(Attendance).filter(Attendance.id == attendance_id).first()
+
+def _conflict(record: Attendance):
+    """409 for a mark whose conflicting row vanished; clears cached ids so a retry starts fresh"""
+    attendance_service.forget_attendance(record)
+    return HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail="Attendance record changed while marking; retry the request"
+    )
+
 @router.post("/", response_model=AttendanceResponse, status_code=status.HTTP_201_CREATED)
-def mark_attendance(attendance: AttendanceCreate, db: Session = Depends(get_db)):
-    """Mark attendance for a student"""
-    db_attendance = Attendance(**attendance.dict())
-    db.add(db_attendance)
-    db.commit()
-    db.refresh(db_attendance)
-    return db_attendance
+def mark_attendance(
+    attendance: AttendanceCreate,
+    response: Response,
+    idempotency_key: str = Header(None),
+    db: Session = Depends(get_db)
+):
+    """Mark attendance for a student
+    
+    A student is marked at most once per subject and day; repeating the mark
+    (or retrying with the same Idempotency-Key header) returns the stored
+    record with status 200.
+    """
+    record = attendance_service.find_idempotent(db, idempotency_key)
+    if record is not None:
+        response.status_code = status.HTTP_200_OK
+        return record
+    
+    db_attendance = Attendance(**attendance.dict(), idempotency_key=idempotency_key)
+    [(attendance_id, created)] = attendance_service.save_attendance(db, [db_attendance])
+    record = _get_record(db, attendance_id) if attendance_id is not None else None
+    if record is None:
+        raise _conflict(db_attendance)
+    if not created:
+        response.status_code = status.HTTP_200_OK
+    return record
+
+@router.post("/bulk", status_code=status.HTTP_201_CREATED)
+def mark_attendance_bulk(bulk: AttendanceBulkCreate, db: Session = Depends(get_db)):
+    """Mark attendance for many students in one transaction
+    
+    Each record names a student by id or roll number. Students are looked
+    up with a single query; records for unknown students are skipped and
+    reported back, and students already marked for the subject today are
+    reported as duplicates.
+    """
+    ids = {item.student_id for item in bulk.records if item.student_id is not None}
+    rolls = {item.student_roll for item in bulk.records if item.student_id is None and item.student_roll}
+    students = db.query(Student.id, Student.student_id).filter(
+        or_(Student.id.in_(ids), Student.student_id.in_(rolls))
+    ).all() if ids or rolls else []
+    by_id = {row.id: row.student_id for row in students}
+    by_roll = {row.student_id: row.id for row in students}
+    
+    records, created, unknown = [], [], []
+    for item in bulk.records:
+        student_id = item.student_id if item.student_id in by_id else by_roll.get(item.student_roll)
+        if student_id is None:
+            unknown.append(item.student_roll if item.student_id is None else item.student_id)
+            continue
+        records.append(Attendance(
+            student_id=student_id,
+            subject=bulk.subject,
+            status=bulk.status,
+            marked_by=bulk.marked_by,
+            confidence_score=item.confidence_score,
+            remarks=item.remarks
+        ))
+        created.append({"student_id": student_id, "student_roll": by_id[student_id]})
+    
+    for entry, (attendance_id, is_new) in zip(created, attendance_service.save_attendance(db, records)):
+        entry["attendance_id"] = attendance_id
+        entry["duplicate"] = not is_new
+    
+    new_count = sum(1 for entry in created if not entry["duplicate"])
+    return {
+        "message": f"Attendance marked for {new_count} of {len(bulk.records)} students",
+        "created": created,
+        "unknown": unknown
+    }
 
 @router.post("/mark-by-face")
+@face_metrics.timed_endpoint("mark_by_face")
 async def mark_attendance_by_face(
     file: UploadFile = File(...),
     subject: str = None,
     marked_by: int = None,
+    department: str = None,
+    year: int = None,
+    section: str = None,
+    idempotency_key: str = Header(None),
     db: Session = Depends(get_db)
 ):
-    """Mark attendance using face recognition"""
+    """Mark attendance using face recognition
+    
+    Optional department/year/section restrict matching to that class. A
+    retry with the same Idempotency-Key header returns the first result
+    without running recognition again.
+    """
+    record = await run_in_threadpool(attendance_service.find_idempotent, db, idempotency_key)
+    if record is not None:
+        return {
+            "message": "Attendance already marked",
+            "student_id": record.student_id,
+            "confidence": (record.confidence_score or 0) / 100,
+            "attendance_id": record.id,
+            "duplicate": True
+        }
+    
     # Recognize the face
-    result = await face_service.recognize_face(file, db)
+    result = await face_service.recognize_face(
+        file, db, scope=face_service.make_scope(department, year, section)
+    )
     
     if not result["success"]:
         raise HTTPException(status_code=400, detail=result["message"])
@@ -43,42 +145,186 @@ async def mark_attendance_by_face(
         confidence_score=int(confidence * 100)
     )
     
-    db_attendance = Attendance(**attendance_data.dict())
-    db.add(db_attendance)
-    db.commit()
-    db.refresh(db_attendance)
+    db_attendance = Attendance(**attendance_data.dict(), idempotency_key=idempotency_key)
+    [(attendance_id, created)] = await run_in_threadpool(
+        attendance_service.save_attendance, db, [db_attendance]
+    )
+    if attendance_id is None:
+        raise _conflict(db_attendance)
     
     return {
-        "message": "Attendance marked successfully",
+        "message": "Attendance marked successfully" if created else "Attendance already marked",
         "student_id": student_id,
         "confidence": confidence,
-        "attendance_id": db_attendance.id
+        "attendance_id": attendance_id,
+        "duplicate": not created
     }
 
+@router.post("/mark-class-by-face")
+@face_metrics.timed_endpoint("mark_class_by_face")
+async def mark_class_attendance_by_face(
+    file: UploadFile = File(...),
+    subject: str = None,
+    marked_by: int = None,
+    department: str = None,
+    year: int = None,
+    section: str = None,
+    db: Session = Depends(get_db)
+):
+    """Mark attendance for every recognized face in a classroom photo"""
+    result = await face_service.recognize_faces(
+        file, db, scope=face_service.make_scope(department, year, section)
+    )
+    
+    if not result["success"]:
+        raise HTTPException(status_code=400, detail=result["message"])
+    
+    faces = result["faces"]
+    matched = [face for face in faces if face["student_id"] is not None]
+    
+    # All rows go in with a single transaction
+    records = [
+        Attendance(
+            student_id=face["student_id"],
+            subject=subject,
+            marked_by=marked_by,
+            confidence_score=int(face["confidence"] * 100)
+        )
+        for face in matched
+    ]
+    saved = await run_in_threadpool(attendance_service.save_attendance, db, records)
+    for face, (attendance_id, created) in zip(matched, saved):
+        face["attendance_id"] = attendance_id
+        face["duplicate"] = not created
+    
+    duplicates = sum(1 for face in matched if face["duplicate"])
+    return {
+        "message": f"Attendance marked for {len(matched) - duplicates} of {len(faces)} faces ({duplicates} already marked)",
+        "faces_detected": len(faces),
+        "matched": matched,
+        "unmatched": [face for face in faces if face["student_id"] is None]
+    }
+
+async def _receive_frames(websocket: WebSocket, session: LiveSession):
+    """Feed binary frames from the client into the session until it disconnects"""
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            frame = message.get("bytes")
+            if not frame:
+                continue
+            if len(frame) > settings.FACE_LIVE_MAX_FRAME_BYTES:
+                session.frames_dropped += 1
+                continue
+            session.push(frame)
+    finally:
+        session.close()
+
+@router.websocket("/live")
+async def live_recognition(
+    websocket: WebSocket,
+    subject: str = None,
+    marked_by: int = None,
+    department: str = None,
+    year: int = None,
+    section: str = None,
+    db: Session = Depends(get_db)
+):
+    """Continuous recognition for a camera kiosk
+    
+    The client sends JPEG/PNG frames as binary messages. For every processed
+    frame the server replies with a "frame" event listing the faces seen,
+    plus a "marked" event for each student newly marked present. Frames that
+    arrive while one is being processed replace each other, and students are
+    marked at most once per connection.
+    """
+    await websocket.accept()
+    if not face_service.face_library_available():
+        await websocket.send_json({"type": "error", "detail": "face_recognition library is not installed"})
+        await websocket.close()
+        return
+    
+    session = LiveSession(db, subject, marked_by, face_service.make_scope(department, year, section))
+    receiver = asyncio.create_task(_receive_frames(websocket, session))
+    try:
+        while True:
+            frame = await session.next_frame()
+            if frame is None:
+                break
+            try:
+                events = await session.process(frame)
+            except HTTPException as e:
+                # Executor is saturated: skip this frame, the next one replaces it
+                events = [{"type": "busy", "detail": e.detail}]
+            except Exception as e:
+                print(f"Error in live recognition: {str(e)}")
+                events = [{"type": "error", "detail": "Could not process frame"}]
+            for event in events:
+                await websocket.send_json(event)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        receiver.cancel()
+
 @router.get("/", response_model=List[AttendanceResponse])
 def get_attendance_records(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    cursor: str = None,
     student_id: int = None,
     start_date: date = None,
     end_date: date = None,
     db: Session = Depends(get_db)
 ):
-    """Get attendance records with optional filters"""
+    """Get attendance records with optional filters, ordered by class date
+    
+    A full page carries an X-Next-Cursor header; pass it back as cursor to
+    get the rows after it at the same cost at any depth (skip is ignored).
+    """
     query = db.query(Attendance)
     
     if student_id:
         query = query.filter(Attendance.student_id == student_id)
     
+    # Whole days, as half-open ranges on class_date so its indexes apply
     if start_date:
-        query = query.filter(Attendance.class_date >= start_date)
+        query = query.filter(Attendance.class_date >= attendance_service.day_range(start_date)[0])
     
     if end_date:
-        query = query.filter(Attendance.class_date <= end_date)
+        query = query.filter(Attendance.class_date < attendance_service.day_range(end_date)[1])
     
-    records = query.offset(skip).limit(limit).all()
+    query = query.order_by(Attendance.class_date, Attendance.id)
+    if cursor:
+        query = query.filter(
+            tuple_(Attendance.class_date, Attendance.id) > tuple_(*decode_cursor(cursor, datetime.fromisoformat, int))
+        )
+    else:
+        query = query.offset(skip)
+    
+    records = query.limit(limit).all()
+    set_next_cursor(response, records, limit, lambda record: (record.class_date, record.id))
     return records
 
+@router.get("/stats")
+def get_attendance_stats_batch(
+    student_ids: List[int] = Query(None),
+    department: str = None,
+    year: int = None,
+    section: str = None,
+    db: Session = Depends(get_db)
+):
+    """Attendance statistics for a list of students or a whole section in one call
+    
+    Pass student_ids (repeatable) and/or department, year and section.
+    """
+    if not student_ids and department is None and year is None and section is None:
+        raise HTTPException(status_code=400, detail="Give student_ids or a department, year or section")
+    students = attendance_service.get_students_stats(db, student_ids or None, department, year, section)
+    return {"students": students}
+
 @router.get("/{attendance_id}", response_model=AttendanceResponse)
 def get_attendance(attendance_id: int, db: Session = Depends(get_db)):
     """Get attendance record by ID"""
@@ -87,6 +333,19 @@ def get_attendance(attendance_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Attendance record not found")
     return attendance
 
+@router.put("/{attendance_id}", response_model=AttendanceResponse)
+def update_attendance(attendance_id: int, attendance_update: AttendanceUpdate, db: Session = Depends(get_db)):
+    """Change the status or remarks of an attendance record"""
+    attendance = _get_record(db, attendance_id)
+    if not attendance:
+        raise HTTPException(status_code=404, detail="Attendance record not found")
+    
+    for field, value in attendance_update.dict(exclude_unset=True).items():
+        setattr(attendance, field, value)
+    db.commit()
+    db.refresh(attendance)
+    return attendance
+
 @router.get("/student/{student_id}/stats")
 def get_student_attendance_stats(student_id: int, db: Session = Depends(get_db)):
     """Get attendance statistics for a student"""
@@ -101,4 +360,5 @@ def delete_attendance(attendance_id: int, db: Session = Depends(get_db)):
     
     db.delete(attendance)
     db.commit()
+    attendance_service.forget_attendance(attendance)
     return None
@@ -1,10 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Response
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from typing import List
 from app.database import get_db
-from app.schemas.student_schema import StudentCreate, StudentResponse, StudentUpdate, StudentWithUser
-from app.services import face_service
+from app.config import settings
+from app.schemas.student_schema import StudentCreate, StudentResponse, StudentUpdate, StudentWithUser, FaceTemplateResponse
+from app.services import face_service, enrollment_service, face_metrics
 from app.models.student_model import Student
+from app.models.face_template_model import FaceTemplate
+from app.utils.pagination import decode_cursor, set_next_cursor
 
 router = APIRouter()
 
@@ -26,9 +30,20 @@ def create_student(student: StudentCreate, db: Session = Depends(get_db)):
     return db_student
 
 @router.get("/", response_model=List[StudentWithUser])
-def get_all_students(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    """Get all students"""
-    students = db.query(Student).offset(skip).limit(limit).all()
+def get_all_students(response: Response, skip: int = 0, limit: int = 100, cursor: str = None,
+                     db: Session = Depends(get_db)):
+    """Get all students, ordered by id
+    
+    A full page carries an X-Next-Cursor header; pass it back as cursor to
+    get the students after it (skip is ignored).
+    """
+    query = db.query(Student).order_by(Student.id)
+    if cursor:
+        query = query.filter(Student.id > decode_cursor(cursor, int)[0])
+    else:
+        query = query.offset(skip)
+    students = query.limit(limit).all()
+    set_next_cursor(response, students, limit, lambda student: (student.id,))
     result = []
     for student in students:
         student_data = StudentWithUser(
@@ -68,12 +83,47 @@ def update_student(student_id: int, student_update: StudentUpdate, db: Session =
     
     db.commit()
     db.refresh(student)
+    face_service.update_gallery(student)
     return student
 
+@router.post("/bulk-upload-faces")
+@face_metrics.timed_endpoint("bulk_upload_faces")
+async def bulk_upload_faces(
+    archive: UploadFile = File(None),
+    files: List[UploadFile] = File(None),
+    db: Session = Depends(get_db)
+):
+    """Enroll many student faces from a ZIP archive or a multipart batch
+    
+    Each image is matched to a student by its filename (roll number) or by
+    a manifest.csv inside the archive with filename,student_id columns.
+    """
+    if archive is None and not files:
+        raise HTTPException(status_code=400, detail="Upload a ZIP archive or one or more image files")
+    
+    report = await enrollment_service.bulk_enroll(db, archive=archive, files=files)
+    enrolled = sum(1 for entry in report if entry["status"] == "enrolled")
+    return {
+        "message": f"Enrolled {enrolled} of {len(report)} images",
+        "enrolled": enrolled,
+        "total": len(report),
+        "results": report
+    }
+
+def _get_student(db: Session, student_id: int):
+    return db.query(Student).filter(Student.id == student_id).first()
+
+def _save_face_encoding(db: Session, student: Student, encoding: bytes):
+    student.face_encoding = encoding
+    db.commit()
+    face_service.update_gallery(student)
+
 @router.post("/{student_id}/upload-face")
+@face_metrics.timed_endpoint("upload_face")
 async def upload_face_image(student_id: int, file: UploadFile = File(...), db: Session = Depends(get_db)):
     """Upload and encode student face image for recognition"""
-    student = db.query(Student).filter(Student.id == student_id).first()
+    # Database calls run in the threadpool so the event loop stays free
+    student = await run_in_threadpool(_get_student, db, student_id)
     if not student:
         raise HTTPException(status_code=404, detail="Student not found")
     
@@ -82,11 +132,71 @@ async def upload_face_image(student_id: int, file: UploadFile = File(...), db: S
     if encoding is None:
         raise HTTPException(status_code=400, detail="No face detected in image")
     
-    student.face_encoding = encoding
-    db.commit()
+    await run_in_threadpool(_save_face_encoding, db, student, encoding)
     
     return {"message": "Face encoding uploaded successfully"}
 
+@router.get("/{student_id}/face-templates", response_model=List[FaceTemplateResponse])
+def get_face_templates(student_id: int, db: Session = Depends(get_db)):
+    """List a student's extra face templates"""
+    if not _get_student(db, student_id):
+        raise HTTPException(status_code=404, detail="Student not found")
+    return db.query(FaceTemplate).filter(FaceTemplate.student_id == student_id).order_by(FaceTemplate.id).all()
+
+def _count_face_templates(db: Session, student_id: int):
+    return db.query(FaceTemplate).filter(FaceTemplate.student_id == student_id).count()
+
+def _save_face_template(db: Session, student: Student, encoding: bytes, label: str = None):
+    template = FaceTemplate(student_id=student.id, face_encoding=encoding, label=label)
+    db.add(template)
+    db.commit()
+    db.refresh(template)
+    face_service.add_to_gallery(student.id, encoding, face_service.student_scope(student), template.id)
+    return template
+
+@router.post("/{student_id}/face-templates", response_model=FaceTemplateResponse, status_code=status.HTTP_201_CREATED)
+@face_metrics.timed_endpoint("add_face_template")
+async def add_face_template(
+    student_id: int,
+    file: UploadFile = File(...),
+    label: str = None,
+    db: Session = Depends(get_db)
+):
+    """Add another face template for a student, e.g. with glasses or different lighting
+    
+    Recognition matches against the closest of a student's templates.
+    """
+    student = await run_in_threadpool(_get_student, db, student_id)
+    if not student:
+        raise HTTPException(status_code=404, detail="Student not found")
+    
+    count = await run_in_threadpool(_count_face_templates, db, student_id)
+    if count >= settings.FACE_MAX_TEMPLATES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Student already has {count} face templates (limit {settings.FACE_MAX_TEMPLATES})"
+        )
+    
+    encoding = await face_service.encode_face(file)
+    if encoding is None:
+        raise HTTPException(status_code=400, detail="No face detected in image")
+    
+    return await run_in_threadpool(_save_face_template, db, student, encoding, label)
+
+@router.delete("/{student_id}/face-templates/{template_id}", status_code=status.HTTP_204_NO_CONTENT)
+def delete_face_template(student_id: int, template_id: int, db: Session = Depends(get_db)):
+    """Delete one of a student's face templates"""
+    template = db.query(FaceTemplate).filter(
+        FaceTemplate.id == template_id, FaceTemplate.student_id == student_id
+    ).first()
+    if not template:
+        raise HTTPException(status_code=404, detail="Face template not found")
+    
+    db.delete(template)
+    db.commit()
+    face_service.remove_template_from_gallery(student_id, template_id)
+    return None
+
 @router.delete("/{student_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_student(student_id: int, db: Session = Depends(get_db)):
     """Delete a student"""
@@ -96,4 +206,5 @@ def delete_student(student_id: int, db: Session = Depends(get_db)):
     
     db.delete(student)
     db.commit()
+    face_service.remove_from_gallery(student_id)
     return None
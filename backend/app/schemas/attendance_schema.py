@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 from app.models.attendance_model import AttendanceStatus
 
@@ -13,6 +13,19 @@ class AttendanceCreate(AttendanceBase):
     remarks: Optional[str] = None
     confidence_score: Optional[int] = None
 
+class AttendanceBulkItem(BaseModel):
+    """One student in a bulk submission, identified by id or roll number"""
+    student_id: Optional[int] = None
+    student_roll: Optional[str] = None
+    confidence_score: Optional[int] = None
+    remarks: Optional[str] = None
+
+class AttendanceBulkCreate(BaseModel):
+    subject: Optional[str] = None
+    marked_by: int
+    status: AttendanceStatus = AttendanceStatus.PRESENT
+    records: List[AttendanceBulkItem]
+
 class AttendanceUpdate(BaseModel):
     status: Optional[AttendanceStatus] = None
     remarks: Optional[str] = None
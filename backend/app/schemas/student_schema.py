@@ -32,3 +32,12 @@ class StudentWithUser(StudentResponse):
     full_name: Optional[str] = None
     email: str
     username: str
+
+class FaceTemplateResponse(BaseModel):
+    id: int
+    student_id: int
+    label: Optional[str] = None
+    created_at: datetime
+    
+    class Config:
+        from_attributes = True
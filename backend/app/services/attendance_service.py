@@ -1,46 +1,192 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import func, or_, and_, text
+from sqlalchemy.exc import IntegrityError
+from app.config import settings
 from app.models.attendance_model import Attendance, AttendanceStatus
+from app.models.attendance_summary_model import AttendanceSummary
+from app.models.student_model import Student
+from app.services.recent_marks import RecentlyMarkedIndex
+from app.services import face_metrics
+from app.utils.metrics import registry, Counter
 from datetime import datetime, timedelta
 
-def get_student_stats(db: Session, student_id: int):
-    """Get attendance statistics for a student"""
-    # Total attendance records
-    total = db.query(Attendance).filter(Attendance.student_id == student_id).count()
-    
-    # Present count
-    present = db.query(Attendance).filter(
-        Attendance.student_id == student_id,
-        Attendance.status == AttendanceStatus.PRESENT
-    ).count()
-    
-    # Absent count
-    absent = db.query(Attendance).filter(
-        Attendance.student_id == student_id,
-        Attendance.status == AttendanceStatus.ABSENT
-    ).count()
-    
-    # Late count
-    late = db.query(Attendance).filter(
-        Attendance.student_id == student_id,
-        Attendance.status == AttendanceStatus.LATE
-    ).count()
-    
-    # Calculate percentage (present + late both count as attended)
-    attended = present + late
-    attendance_percentage = (attended / total * 100) if total > 0 else 0
-    
-    # Build subject-wise breakdown
-    all_records = db.query(Attendance).filter(Attendance.student_id == student_id).all()
+# Attendance written recently by this process, checked before any insert
+recent_marks = RecentlyMarkedIndex(settings.ATTENDANCE_DEDUPE_CACHE_SIZE, settings.ATTENDANCE_DEDUPE_TTL_SECONDS)
+for _name in ("hits", "misses"):
+    registry.register(Counter(
+        f"attendance_dedupe_{_name}_total", f"Recently-marked index {_name}",
+        callback=lambda name=_name: recent_marks.stats()[name]
+    ))
+
+
+def _mark_key(record: Attendance):
+    if record.class_date is None:
+        record.class_date = datetime.utcnow()
+    return recent_marks.key(record.student_id, record.subject, record.class_date.date())
+
+
+def find_idempotent(db: Session, idempotency_key: str):
+    """Attendance row previously stored under an idempotency key, or None
+    
+    The recently-marked index is per process, so it can still hold the id of
+    a row another worker has deleted (whose id may since have been reused);
+    such a stale entry is dropped and the key is looked up in the database
+    instead.
+    """
+    if not idempotency_key:
+        return None
+    cache_key = recent_marks.idempotency_key(idempotency_key)
+    attendance_id = recent_marks.get(cache_key)
+    if attendance_id is not None:
+        record = db.query(Attendance).filter(Attendance.id == attendance_id).first()
+        if record is not None and record.idempotency_key == idempotency_key:
+            return record
+        recent_marks.discard(cache_key)
+    record = db.query(Attendance).filter(Attendance.idempotency_key == idempotency_key).first()
+    if record is not None:
+        recent_marks.put(cache_key, record.id)
+    return record
+
+
+def _existing_marks(db: Session, keys, ids=()):
+    """Look up stored rows for (student, subject, day) keys, and rows by id, with one query"""
+    conditions = [
+        and_(
+            Attendance.student_id == student_id,
+            func.coalesce(Attendance.subject, "") == subject,
+            Attendance.class_day == class_day
+        )
+        for student_id, subject, class_day in keys
+    ]
+    if ids:
+        conditions.append(Attendance.id.in_(ids))
+    rows = db.query(
+        Attendance.id, Attendance.student_id, Attendance.subject, Attendance.class_day
+    ).filter(or_(*conditions)).all()
+    return {recent_marks.key(row.student_id, row.subject, row.class_day): row.id for row in rows}
+
+
+def save_attendance(db: Session, records):
+    """Insert attendance rows, skipping any that would duplicate a stored mark
+    
+    A record duplicates another if it has the same student, subject and
+    class day. Duplicates are answered from the recently-marked index
+    (whose ids are confirmed still to exist) and one lookup query, and
+    finally by the unique constraint if another worker inserted the same
+    mark concurrently.
+    
+    Returns one (attendance_id, created) pair per record, in order;
+    attendance_id is None if the conflicting row could not be found (it was
+    deleted meanwhile). Blocking; async routes call this through run_in_threadpool.
+    """
+    with face_metrics.stage("db_write"):
+        return _save_attendance(db, records)
+
+
+def _save_attendance(db: Session, records):
+    results = [None] * len(records)
+    keys = [_mark_key(record) for record in records]
+    
+    pending = {}
+    cached = {}
+    for index, key in enumerate(keys):
+        if key in pending or key in cached:
+            continue
+        attendance_id = recent_marks.get(key)
+        if attendance_id is not None:
+            cached[key] = (index, attendance_id)
+        else:
+            pending[key] = index
+    
+    # The index is per process, so a cached row may since have been deleted
+    # (or re-keyed) elsewhere; cached ids are checked in the same query
+    existing = {}
+    if pending or cached:
+        existing = _existing_marks(db, list(pending), [attendance_id for _, attendance_id in cached.values()])
+    for key, (index, attendance_id) in cached.items():
+        if existing.get(key) == attendance_id:
+            results[index] = (attendance_id, False)
+        else:
+            recent_marks.discard(key)
+            pending[key] = index
+    for key, attendance_id in existing.items():
+        if key in pending and key not in cached:
+            recent_marks.put(key, attendance_id)
+            results[pending.pop(key)] = (attendance_id, False)
+    
+    if pending:
+        inserted = {}
+        try:
+            db.add_all([records[index] for index in pending.values()])
+            db.flush()
+            inserted = {key: records[index].id for key, index in pending.items()}
+        except IntegrityError:
+            # Lost a race with another worker: retry row by row
+            db.rollback()
+            for key, index in pending.items():
+                record = records[index]
+                record.id = None
+                try:
+                    with db.begin_nested():
+                        db.add(record)
+                    inserted[key] = record.id
+                except IntegrityError:
+                    pass
+        idempotency_keys = {key: records[index].idempotency_key for key, index in pending.items()}
+        db.commit()
+        
+        missing = [key for key in pending if key not in inserted]
+        existing = _existing_marks(db, missing) if missing else {}
+        # A reused or concurrently sent Idempotency-Key fails on its own unique
+        # index; the row stored under that key is the answer for this record
+        unresolved = {idempotency_keys[key]: key for key in missing if key not in existing and idempotency_keys[key]}
+        if unresolved:
+            for row in db.query(Attendance.id, Attendance.idempotency_key).filter(
+                Attendance.idempotency_key.in_(unresolved)
+            ):
+                existing[unresolved[row.idempotency_key]] = row.id
+        for key, index in pending.items():
+            attendance_id = inserted.get(key)
+            if attendance_id is not None:
+                results[index] = (attendance_id, True)
+                recent_marks.put(key, attendance_id)
+                if idempotency_keys[key]:
+                    recent_marks.put(recent_marks.idempotency_key(idempotency_keys[key]), attendance_id)
+            else:
+                attendance_id = existing.get(key)
+                results[index] = (attendance_id, False)
+                if attendance_id is not None:
+                    recent_marks.put(key, attendance_id)
+    
+    # Duplicates within the batch resolve to the first occurrence
+    for index, key in enumerate(keys):
+        if results[index] is None:
+            first = keys.index(key)
+            results[index] = (results[first][0], False)
+    return results
+
+
+def forget_attendance(record: Attendance):
+    """Drop a deleted row (or a record that was never stored) from the recently-marked index"""
+    recent_marks.discard(_mark_key(record))
+    if record.idempotency_key:
+        recent_marks.discard(recent_marks.idempotency_key(record.idempotency_key))
+
+
+def _build_stats(counts):
+    """Stats dict from (subject, status, count) rows of one student"""
+    totals = {status: 0 for status in AttendanceStatus}
     subject_map = {}
-    for r in all_records:
-        subj = r.subject or "General"
-        if subj not in subject_map:
-            subject_map[subj] = {"total": 0, "present": 0}
-        subject_map[subj]["total"] += 1
-        if r.status in (AttendanceStatus.PRESENT, AttendanceStatus.LATE):
-            subject_map[subj]["present"] += 1
+    for subject, status, count in counts:
+        totals[status] += count
+        data = subject_map.setdefault(subject or "General", {"total": 0, "present": 0})
+        data["total"] += count
+        if status in (AttendanceStatus.PRESENT, AttendanceStatus.LATE):
+            data["present"] += count
     
+    total = sum(totals.values())
+    # Present and late both count as attended
+    attended = totals[AttendanceStatus.PRESENT] + totals[AttendanceStatus.LATE]
     subjects = [
         {
             "subject": subj,
@@ -48,23 +194,147 @@ def get_student_stats(db: Session, student_id: int):
             "present": data["present"],
             "percentage": round((data["present"] / data["total"] * 100), 1) if data["total"] > 0 else 0
         }
-        for subj, data in subject_map.items()
+        for subj, data in sorted(subject_map.items())
     ]
     
     return {
         "total_classes": total,
-        "present": present,
-        "absent": absent,
-        "late": late,
-        "percentage": round(attendance_percentage, 2),
+        "present": totals[AttendanceStatus.PRESENT],
+        "absent": totals[AttendanceStatus.ABSENT],
+        "late": totals[AttendanceStatus.LATE],
+        "percentage": round(attended / total * 100, 2) if total > 0 else 0,
         "subjects": subjects
     }
 
+def get_students_stats(db: Session, student_ids=None, department: str = None, year: int = None,
+                       section: str = None):
+    """Attendance statistics for many students from the attendance summary table
+    
+    Students are selected by id and/or section; students without any
+    attendance are included with zero counts. Returns a list of stats dicts
+    with student_id and student_roll, ordered by student id.
+    """
+    query = db.query(
+        Student.id, Student.student_id, AttendanceSummary.subject, AttendanceSummary.status, AttendanceSummary.count
+    ).outerjoin(
+        AttendanceSummary,
+        and_(AttendanceSummary.student_id == Student.id, AttendanceSummary.count > 0)
+    )
+    
+    if student_ids is not None:
+        query = query.filter(Student.id.in_(student_ids))
+    if department is not None:
+        query = query.filter(Student.department == department)
+    if year is not None:
+        query = query.filter(Student.year == year)
+    if section is not None:
+        query = query.filter(Student.section == section)
+    
+    students = {}
+    for student_id, student_roll, subject, status, count in query.all():
+        entry = students.setdefault(student_id, (student_roll, []))
+        if status is not None:
+            entry[1].append((subject, status, count))
+    return [
+        {"student_id": student_id, "student_roll": student_roll, **_build_stats(counts)}
+        for student_id, (student_roll, counts) in sorted(students.items())
+    ]
+
+def get_student_stats(db: Session, student_id: int):
+    """Get attendance statistics for a student from the attendance summary table"""
+    counts = db.query(AttendanceSummary.subject, AttendanceSummary.status, AttendanceSummary.count).filter(
+        AttendanceSummary.student_id == student_id,
+        AttendanceSummary.count > 0
+    ).all()
+    return _build_stats(counts)
+
+def _summary_source(db: Session):
+    """(student_id, subject, status, count) recomputed from the attendance rows"""
+    subject = func.coalesce(Attendance.subject, "")
+    return db.query(
+        Attendance.student_id, subject, Attendance.status, func.count(Attendance.id)
+    ).filter(Attendance.status.isnot(None)).group_by(Attendance.student_id, subject, Attendance.status)
+
+def _lock_for_rebuild(db: Session):
+    if db.bind.dialect.name == "postgresql":
+        # Hold off writers, and other rebuilds, until commit so no mark lands
+        # between the count and the swap
+        db.execute(text("LOCK TABLE attendance, attendance_summary IN SHARE ROW EXCLUSIVE MODE"))
+
+def _summary_missing(db: Session):
+    # Every attendance row leaves a counter row behind, so attendance rows
+    # without any counters mean the summary was never built
+    return (
+        db.query(AttendanceSummary.student_id).first() is None
+        and db.query(Attendance.id).first() is not None
+    )
+
+def _rebuild_summary(db: Session):
+    db.query(AttendanceSummary).delete(synchronize_session=False)
+    rows = [
+        {"student_id": student_id, "subject": subject, "status": status, "count": count}
+        for student_id, subject, status, count in _summary_source(db)
+    ]
+    if rows:
+        db.execute(AttendanceSummary.__table__.insert(), rows)
+    db.commit()
+    return len(rows)
+
+def rebuild_attendance_summary(db: Session):
+    """Replace the summary counters with counts from the attendance rows; returns the row count"""
+    _lock_for_rebuild(db)
+    return _rebuild_summary(db)
+
+def ensure_attendance_summary(db: Session):
+    """Build the summary counters if this database has never had them
+    
+    Databases created before the summary table get it empty from create_all;
+    without this, stats would read zero until a manual rebuild. Returns the
+    number of counters built, or None if the summary was already in place.
+    """
+    if not _summary_missing(db):
+        db.rollback()
+        return None
+    _lock_for_rebuild(db)
+    # Another worker may have built it while this one waited for the lock
+    if not _summary_missing(db):
+        db.rollback()
+        return None
+    return _rebuild_summary(db)
+
+def check_attendance_summary(db: Session):
+    """Compare the summary counters with the attendance rows
+    
+    Returns a list of (student_id, subject, status, expected, stored) for
+    every counter that differs; empty when they agree.
+    """
+    expected = {(row[0], row[1], row[2]): row[3] for row in _summary_source(db)}
+    stored = {
+        (row.student_id, row.subject, row.status): row.count
+        for row in db.query(AttendanceSummary).filter(AttendanceSummary.count != 0)
+    }
+    return [
+        (*key, expected.get(key, 0), stored.get(key, 0))
+        for key in sorted(expected.keys() | stored.keys(), key=lambda key: (key[0], key[1], key[2].value))
+        if expected.get(key, 0) != stored.get(key, 0)
+    ]
+
+
+def day_range(day):
+    """[start, end) datetimes of a calendar day
+    
+    Filtering class_date with a range rather than func.date(class_date)
+    lets the database use the (student_id/subject, class_date) indexes.
+    """
+    start = datetime.combine(day, datetime.min.time())
+    return start, start + timedelta(days=1)
 
 def get_class_attendance(db: Session, class_date: datetime, subject: str = None):
     """Get attendance for a specific class"""
+    start, end = day_range(class_date.date())
     query = db.query(Attendance).filter(
-        func.date(Attendance.class_date) == class_date.date()
+        Attendance.class_date >= start,
+        Attendance.class_date < end
     )
     
     if subject:
@@ -88,8 +358,10 @@ def get_class_attendance(db: Session, class_date: datetime, subject: str = None)
 
 def get_daily_report(db: Session, date: datetime):
     """Get daily attendance report"""
+    start, end = day_range(date.date())
     records = db.query(Attendance).filter(
-        func.date(Attendance.class_date) == date.date()
+        Attendance.class_date >= start,
+        Attendance.class_date < end
     ).all()
     
     # Group by subject
@@ -0,0 +1,170 @@
+import asyncio
+import csv
+import io
+import os
+import zipfile
+from typing import List
+from fastapi import UploadFile, HTTPException
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.models.student_model import Student
+from app.services import face_service
+from app.utils.face_utils import serialize_face_encoding
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp'}
+MANIFEST_NAME = "manifest.csv"
+
+
+def _read_manifest(archive: zipfile.ZipFile):
+    """Map image filenames to student roll numbers from manifest.csv, if present"""
+    names = {os.path.basename(name).lower(): name for name in archive.namelist()}
+    if MANIFEST_NAME not in names:
+        return None
+    with archive.open(names[MANIFEST_NAME]) as f:
+        reader = csv.DictReader(io.TextIOWrapper(f, encoding="utf-8-sig"))
+        return {
+            row["filename"].strip(): row["student_id"].strip()
+            for row in reader
+            if row.get("filename") and row.get("student_id")
+        }
+
+
+def _archive_entries(archive: zipfile.ZipFile):
+    """List (filename, roll, member) for every image in the archive"""
+    manifest = _read_manifest(archive)
+    entries = []
+    for info in archive.infolist():
+        filename = os.path.basename(info.filename)
+        if info.is_dir() or filename.startswith('.'):
+            continue
+        if os.path.splitext(filename)[1].lower() not in IMAGE_EXTENSIONS:
+            continue
+        if manifest is not None:
+            roll = manifest.get(info.filename) or manifest.get(filename)
+        else:
+            roll = os.path.splitext(filename)[0]
+        entries.append((filename, roll, info))
+    return entries
+
+
+def _load_students(db: Session, rolls):
+    """(id, scope) of each student keyed by roll number, fetched with one query"""
+    rolls = sorted({roll for roll in rolls if roll})
+    if not rolls:
+        return {}
+    rows = db.query(
+        Student.id, Student.student_id, Student.department, Student.year, Student.section
+    ).filter(Student.student_id.in_(rolls)).all()
+    return {row.student_id: (row.id, (row.department, row.year, row.section)) for row in rows}
+
+
+def _save_batch(db: Session, batch):
+    """Write one batch of ((id, scope), encoding bytes) in a single transaction"""
+    db.execute(update(Student), [
+        {"id": student_id, "face_encoding": encoding} for (student_id, _), encoding in batch
+    ])
+    db.commit()
+    for (student_id, scope), encoding in batch:
+        face_service.add_to_gallery(student_id, encoding, scope)
+
+
+async def bulk_enroll(db: Session, archive: UploadFile = None, files: List[UploadFile] = None):
+    """Encode a ZIP archive or multipart batch of student photos
+
+    Images are matched to students by filename (``<roll number>.jpg``) or,
+    for archives, by a manifest.csv with ``filename,student_id`` columns.
+    Archive members are extracted one at a time, encoded across the face
+    executor and written in batches of FACE_BULK_BATCH_SIZE.
+
+    Returns one report entry per image.
+    """
+    if not face_service.face_library_available():
+        raise HTTPException(status_code=503, detail="face_recognition library is not installed")
+
+    zip_file = None
+    if archive is not None:
+        try:
+            # UploadFile spools to disk, so members are read on demand
+            zip_file = zipfile.ZipFile(archive.file)
+        except zipfile.BadZipFile:
+            raise HTTPException(status_code=400, detail="Uploaded archive is not a valid ZIP file")
+        entries = _archive_entries(zip_file)
+    else:
+        entries = [
+            (upload.filename, os.path.splitext(os.path.basename(upload.filename or ""))[0], upload)
+            for upload in files or []
+        ]
+
+    if len(entries) > settings.FACE_BULK_MAX_FILES:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Too many images: {len(entries)} (limit {settings.FACE_BULK_MAX_FILES})"
+        )
+
+    students = await run_in_threadpool(_load_students, db, [roll for _, roll, _ in entries])
+    report = [None] * len(entries)
+    pending_batch = []
+    window = asyncio.Semaphore(max(1, face_service.executor.workers))
+    lock = asyncio.Lock()
+
+    async def flush():
+        batch = pending_batch[:]
+        pending_batch.clear()
+        if batch:
+            await run_in_threadpool(_save_batch, db, [(target, encoding) for target, encoding, _ in batch])
+            for _, _, index in batch:
+                report[index]["status"] = "enrolled"
+
+    async def encode(index, data, target):
+        try:
+            faces = await face_service.run_encoder(face_service.encode_image_bytes, data, queued=True)
+        except Exception as e:
+            report[index].update(status="error", detail=str(e))
+            return
+        finally:
+            window.release()
+        if not faces:
+            report[index]["status"] = "no_face"
+            return
+        if len(faces) > 1:
+            report[index]["detail"] = f"{len(faces)} faces detected, used the first"
+        encoding = serialize_face_encoding(faces[0][1], settings.FACE_ENCODING_DTYPE)
+        async with lock:
+            pending_batch.append((target, encoding, index))
+            if len(pending_batch) >= settings.FACE_BULK_BATCH_SIZE:
+                await flush()
+
+    tasks = []
+    for index, (filename, roll, source) in enumerate(entries):
+        report[index] = {"filename": filename, "student_id": roll, "status": None, "detail": None}
+        target = students.get(roll)
+        if target is None:
+            report[index].update(status="unknown_student", detail="No student with this roll number")
+            continue
+        size = source.file_size if zip_file is not None else source.size
+        if size is not None and size > settings.FACE_BULK_MAX_IMAGE_BYTES:
+            report[index].update(status="error", detail="Image is too large")
+            continue
+
+        # Only `window` images are held in memory at any time
+        await window.acquire()
+        try:
+            if zip_file is not None:
+                data = await run_in_threadpool(zip_file.read, source)
+            else:
+                data = await source.read()
+        except Exception as e:
+            window.release()
+            report[index].update(status="error", detail=str(e))
+            continue
+        tasks.append(asyncio.create_task(encode(index, data, target)))
+
+    await asyncio.gather(*tasks)
+    async with lock:
+        await flush()
+
+    if zip_file is not None:
+        zip_file.close()
+    return report
@@ -0,0 +1,98 @@
+import asyncio
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from fastapi import HTTPException, status
+
+# Seconds a worker waits in start() for its siblings to finish initializing
+START_TIMEOUT_SECONDS = 300
+
+# Per-worker barrier shared by the pool's workers, set by _start_worker
+_workers_started = None
+
+
+def _start_worker(initializer, started):
+    global _workers_started
+    _workers_started = started
+    if initializer is not None:
+        initializer()
+
+
+def _wait_for_workers():
+    """start()'s job: hold this worker until every worker has taken one"""
+    _workers_started.wait(START_TIMEOUT_SECONDS)
+
+
+class FacePipelineExecutor:
+    """Runs CPU-bound face detection and encoding off the event loop
+
+    Work goes to a process pool (or a thread pool when ``workers`` is 0), and
+    at most ``max_pending`` jobs may be running or queued at once. Further
+    submissions fail fast with 503 so an overloaded worker sheds load
+    instead of growing an unbounded queue.
+
+    ``initializer``, if given, runs once in each worker as it starts, before
+    the worker takes any job.
+    """
+
+    def __init__(self, workers: int = 2, max_pending: int = 8, initializer=None):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.initializer = initializer
+        self.pending = 0
+        self._pool = None
+
+    def _get_pool(self):
+        if self._pool is None:
+            if self.workers > 0:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers, initializer=_start_worker,
+                    initargs=(self.initializer, multiprocessing.Barrier(self.workers))
+                )
+            else:
+                self._pool = ThreadPoolExecutor(
+                    max_workers=1, thread_name_prefix="face", initializer=_start_worker,
+                    initargs=(self.initializer, threading.Barrier(1))
+                )
+        return self._pool
+
+    async def start(self):
+        """Start every worker and wait until each has run the initializer
+
+        Each worker takes one job that waits for all the others, so no
+        worker can finish early and take a sibling's job while that sibling
+        is still initializing. Returns the number of workers (1 in thread
+        mode).
+        """
+        count = max(1, self.workers)
+        await asyncio.gather(*(self.run_queued(_wait_for_workers) for _ in range(count)))
+        return count
+
+    async def run(self, fn, *args):
+        """Run fn(*args) in the pool, or raise 503 if too much work is queued"""
+        # Only touched from the event loop thread, so no lock is needed
+        if self.pending >= self.max_pending:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Face recognition is busy, please retry shortly",
+                headers={"Retry-After": "1"},
+            )
+        return await self.run_queued(fn, *args)
+
+    async def run_queued(self, fn, *args):
+        """Run fn(*args) in the pool without the max_pending check
+
+        For batch jobs that bound their own concurrency; the work still
+        counts towards ``pending`` so interactive requests see the load.
+        """
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_pool(), fn, *args)
+        finally:
+            self.pending -= 1
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
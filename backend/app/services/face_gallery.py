@@ -0,0 +1,414 @@
+import tempfile
+import threading
+import time
+import numpy as np
+from app.services.face_index import ExactIndex
+
+ENCODING_SIZE = 128
+
+# Quantized scans convert this many rows at a time to float32 for BLAS
+SCAN_CHUNK_ROWS = 16384
+# Initial int8 range per dimension until a load fits it to the data; dlib
+# encoding components stay well inside +-0.5
+DEFAULT_INT8_RANGE = 0.5
+
+# Template id of a student's primary encoding (Student.face_encoding); extra
+# templates use their FaceTemplate id, which starts at 1.
+PRIMARY_TEMPLATE = 0
+
+
+def _template_key(key):
+    """Normalize a student id or (student_id, template_id) to a tuple"""
+    if isinstance(key, tuple):
+        return int(key[0]), int(key[1])
+    return int(key), PRIMARY_TEMPLATE
+
+
+class FaceGallery:
+    """In-memory matrix of enrolled face encodings for vectorized 1:N matching
+
+    Encodings live in one contiguous (capacity x 128) array with parallel
+    arrays of student ids and template ids. A student may have several
+    templates (rows); distances are reduced to the best template per
+    student. Appends go into spare capacity and removals leave a tombstone
+    (id -1) that is compacted away later, so readers can take a snapshot of
+    the arrays without holding the lock while they compute.
+
+    An optional index (see face_index) narrows each search to candidate rows
+    before exact distances are computed.
+
+    With ``quantization`` "int8" (with a per-dimension scale) the rows are scanned in that compact form and only each probe's
+    ``rerank`` nearest rows get exact distances, so the match decision
+    still uses full-precision encodings. The exact rows then live in a
+    memory-mapped spill file (in ``spill_dir``) that the kernel can page
+    out; only the quantized codes need to stay resident.
+
+    Each student can also carry a scope, a (department, year, section)
+    tuple. Students are partitioned into shards by scope, and a scoped search
+    compares probes only against the shards that match the filter.
+    """
+
+    def __init__(self, dim: int = ENCODING_SIZE, dtype=np.float32, initial_capacity: int = 64, index=None,
+                 quantization: str = None, rerank: int = 8, spill_dir: str = None):
+        if quantization not in (None, "none", "int8"):
+            raise ValueError(f"Unknown face gallery quantization: {quantization} (use none or int8)")
+        self.dim = dim
+        self.index = index or ExactIndex()
+        self.dtype = np.dtype(dtype)
+        self.quantization = None if quantization == "none" else quantization
+        self.rerank = max(1, rerank)
+        self.spill_dir = spill_dir or None
+        self._lock = threading.RLock()
+        self._initial_capacity = initial_capacity
+        self.loaded_at = None
+        self._reset()
+
+    def _reset(self):
+        self._encodings, self._codes, self._sq_norms, self._ids, self._template_ids = (
+            self._allocate(self._initial_capacity)
+        )
+        self._scale = np.full(self.dim, DEFAULT_INT8_RANGE / 127, dtype=np.float32)
+        self._templates = {}   # student id -> {template id -> row index}
+        self._size = 0         # rows in use, including tombstones
+        self._tombstones = 0
+        self._scope_of = {}    # student id -> scope
+        self._shards = {}      # scope -> set of student ids
+        self._shard_rows = {}  # scope -> cached row array
+
+    @property
+    def loaded(self):
+        return self.loaded_at is not None
+
+    def __len__(self):
+        """Number of students with at least one template"""
+        return len(self._templates)
+
+    @property
+    def template_count(self):
+        return self._size - self._tombstones
+
+    @property
+    def nbytes(self):
+        """Memory held by the row arrays, including spare capacity
+        
+        A quantized gallery counts its codes; its exact rows are in the
+        spill file.
+        """
+        rows = self._encodings if self._codes is None else self._codes
+        return rows.nbytes + self._sq_norms.nbytes + self._ids.nbytes + self._template_ids.nbytes
+
+    def _allocate(self, capacity):
+        """Empty (encodings, codes, sq_norms, ids, template_ids) arrays"""
+        codes = None
+        if self.quantization is None:
+            encodings = np.zeros((capacity, self.dim), dtype=self.dtype)
+        else:
+            # Unlinked on creation; the mapping keeps it alive until dropped
+            with tempfile.TemporaryFile(dir=self.spill_dir) as spill:
+                encodings = np.memmap(spill, dtype=self.dtype, mode="w+", shape=(capacity, self.dim))
+            codes = np.zeros((capacity, self.dim), dtype=np.int8)
+        sq_norms = np.zeros(capacity, dtype=self.dtype)
+        ids = np.full(capacity, -1, dtype=np.int64)
+        template_ids = np.zeros(capacity, dtype=np.int64)
+        return encodings, codes, sq_norms, ids, template_ids
+
+    def _quantize(self, encodings):
+        return np.clip(np.rint(encodings / self._scale), -127, 127).astype(np.int8)
+
+    def _quantize_rows(self, stop):
+        """Fit the int8 scale to rows [0, stop) and fill their codes"""
+        if stop:
+            peak = np.zeros(self.dim, dtype=np.float32)
+            for start in range(0, stop, SCAN_CHUNK_ROWS):
+                chunk = self._encodings[start:min(stop, start + SCAN_CHUNK_ROWS)]
+                np.maximum(peak, np.abs(chunk).max(axis=0), out=peak)
+            self._scale = np.maximum(peak, 1e-6) / 127
+        for start in range(0, stop, SCAN_CHUNK_ROWS):
+            end = min(stop, start + SCAN_CHUNK_ROWS)
+            self._codes[start:end] = self._quantize(self._encodings[start:end])
+
+    def load(self, items, scopes=None):
+        """Replace the gallery contents with (key, encoding) pairs
+
+        A key is a student id (their primary template) or a
+        (student_id, template_id) tuple. ``scopes`` optionally maps student
+        ids to their scope tuple.
+        """
+        items = list(items)
+        with self._lock:
+            self._scope_of, self._shards, self._shard_rows = {}, {}, {}
+            for student_id, scope in (scopes or {}).items():
+                self._set_scope(student_id, scope)
+            capacity = max(self._initial_capacity, len(items))
+            self._encodings, self._codes, _, self._ids, self._template_ids = self._allocate(capacity)
+            self._templates = {}
+            self._size = 0
+            self._tombstones = 0
+            for key, encoding in items:
+                student_id, template_id = _template_key(key)
+                row = self._templates.setdefault(student_id, {}).get(template_id)
+                if row is None:
+                    row = self._size
+                    self._size += 1
+                self._encodings[row] = encoding
+                self._ids[row] = student_id
+                self._template_ids[row] = template_id
+                self._templates[student_id][template_id] = row
+            self._sq_norms = np.einsum("ij,ij->i", self._encodings, self._encodings)
+            if self._codes is not None:
+                self._quantize_rows(self._size)
+            self._reindex()
+            self.loaded_at = time.monotonic()
+
+    def clear(self):
+        """Drop all encodings and mark the gallery as not loaded"""
+        with self._lock:
+            self._reset()
+            self.index.reset()
+            self.loaded_at = None
+
+    def upsert(self, student_id: int, encoding, scope=None, template_id: int = PRIMARY_TEMPLATE):
+        """Add or replace one template (and optionally the scope) for a student"""
+        encoding = np.asarray(encoding, dtype=self.dtype).reshape(self.dim)
+        with self._lock:
+            if scope is not None:
+                self._set_scope(student_id, scope)
+            # Never overwrite a live row in place: concurrent readers may be
+            # looking at it. Retire the old row and append a fresh one.
+            self._retire(student_id, template_id)
+            if self._size == len(self._ids):
+                self._grow()
+            row = self._size
+            self._encodings[row] = encoding
+            if self._codes is not None:
+                self._codes[row] = self._quantize(encoding)
+            self._sq_norms[row] = encoding @ encoding
+            self._ids[row] = student_id
+            self._template_ids[row] = template_id
+            self._templates.setdefault(student_id, {})[template_id] = row
+            self._size += 1
+            self._shard_rows.pop(self._scope_of.get(student_id), None)
+            if self.index.needs_training(self.template_count):
+                self._reindex()
+            else:
+                self.index.add([row], encoding[None, :])
+            # Re-enrolment leaves the old row as a tombstone
+            self._maybe_compact()
+
+    def remove(self, student_id: int):
+        """Remove all of a student's templates if present"""
+        with self._lock:
+            for template_id in list(self._templates.get(student_id, ())):
+                self._retire(student_id, template_id)
+            self._set_scope(student_id, None)
+            self._maybe_compact()
+
+    def remove_template(self, student_id: int, template_id: int):
+        """Remove one template, keeping the student's others"""
+        with self._lock:
+            self._retire(student_id, template_id)
+            self._shard_rows.pop(self._scope_of.get(student_id), None)
+            self._maybe_compact()
+
+    def set_scope(self, student_id: int, scope):
+        """Move a student to another shard, e.g. after a section change"""
+        with self._lock:
+            self._set_scope(student_id, scope)
+
+    def _set_scope(self, student_id, scope):
+        old = self._scope_of.pop(student_id, None)
+        if old is not None:
+            self._shards[old].discard(student_id)
+            if not self._shards[old]:
+                del self._shards[old]
+            self._shard_rows.pop(old, None)
+        if scope is not None:
+            self._scope_of[student_id] = scope
+            self._shards.setdefault(scope, set()).add(student_id)
+            self._shard_rows.pop(scope, None)
+
+    def _scope_rows(self, scope_filter):
+        """Rows of every shard matching a (department, year, section) filter
+
+        None in any position of the filter matches every value.
+        """
+        arrays = []
+        for scope, student_ids in self._shards.items():
+            if any(want is not None and want != have for want, have in zip(scope_filter, scope)):
+                continue
+            rows = self._shard_rows.get(scope)
+            if rows is None:
+                rows = np.array(
+                    sorted(
+                        row for sid in student_ids
+                        for row in self._templates.get(sid, {}).values()
+                    ),
+                    dtype=np.int64
+                )
+                self._shard_rows[scope] = rows
+            arrays.append(rows)
+        return np.concatenate(arrays) if arrays else np.empty(0, dtype=np.int64)
+
+    def _retire(self, student_id, template_id):
+        templates = self._templates.get(student_id)
+        row = templates.pop(template_id, None) if templates else None
+        if row is not None:
+            self._ids[row] = -1
+            self._tombstones += 1
+            if not templates:
+                del self._templates[student_id]
+
+    def _maybe_compact(self):
+        if self._tombstones > max(16, self.template_count // 4):
+            self._compact()
+
+    def _grow(self):
+        capacity = max(self._initial_capacity, len(self._ids) * 2)
+        encodings, codes, sq_norms, ids, template_ids = self._allocate(capacity)
+        encodings[:self._size] = self._encodings[:self._size]
+        if codes is not None:
+            codes[:self._size] = self._codes[:self._size]
+        sq_norms[:self._size] = self._sq_norms[:self._size]
+        ids[:self._size] = self._ids[:self._size]
+        template_ids[:self._size] = self._template_ids[:self._size]
+        self._encodings, self._codes, self._sq_norms, self._ids = encodings, codes, sq_norms, ids
+        self._template_ids = template_ids
+
+    def _compact(self):
+        live = np.flatnonzero(self._ids[:self._size] >= 0)
+        capacity = max(self._initial_capacity, len(live) * 2)
+        encodings, codes, sq_norms, ids, template_ids = self._allocate(capacity)
+        encodings[:len(live)] = self._encodings[live]
+        if codes is not None:
+            codes[:len(live)] = self._codes[live]
+        sq_norms[:len(live)] = self._sq_norms[live]
+        ids[:len(live)] = self._ids[live]
+        template_ids[:len(live)] = self._template_ids[live]
+        self._encodings, self._codes, self._sq_norms, self._ids = encodings, codes, sq_norms, ids
+        self._template_ids = template_ids
+        self._templates = {}
+        for row in range(len(live)):
+            self._templates.setdefault(int(ids[row]), {})[int(template_ids[row])] = row
+        self._size = len(live)
+        self._tombstones = 0
+        self._shard_rows = {}
+        self._reindex()
+
+    def _reindex(self):
+        """Rebuild the index lists from the current rows, training it if due"""
+        encodings = self._encodings[:self._size]
+        if self.index.needs_training(self.template_count):
+            self.index.train(encodings[self._ids[:self._size] >= 0])
+        else:
+            self.index.reset()
+        self.index.add(np.arange(self._size), encodings)
+
+    def _candidates(self, probes, scope=None):
+        """Encodings, squared norms and ids of the rows worth comparing to probes
+
+        Also returns whether any student has more than one template, in
+        which case distances must be reduced per student.
+        """
+        with self._lock:
+            size = self._size
+            multi = self.template_count > len(self._templates)
+            encodings, sq_norms, ids = self._encodings[:size], self._sq_norms[:size], self._ids[:size]
+            codes = None if self._codes is None else self._codes[:size]
+            scale = self._scale
+            if scope is not None:
+                # A shard is small enough to scan exactly
+                rows = self._scope_rows(scope)
+            else:
+                rows = self.index.candidate_rows(probes) if size else None
+        if codes is not None:
+            rows = self._nearest_quantized(probes, codes, sq_norms, ids, rows, scale)
+        if rows is None:
+            return encodings, sq_norms, ids, multi
+        return encodings[rows], sq_norms[rows], ids[rows], multi
+
+    def _nearest_quantized(self, probes, codes, sq_norms, ids, rows, scale):
+        """Rows among ``rows`` (None = all) nearest to any probe by quantized distance
+        
+        Each probe contributes its ``rerank`` nearest live rows; the union is
+        returned sorted, for exact distances to be computed on.
+        """
+        if rows is not None:
+            codes, sq_norms, ids = codes[rows], sq_norms[rows], ids[rows]
+        if len(ids) == 0:
+            return np.empty(0, dtype=np.int64)
+        # Folding the int8 scale into the probes saves dequantizing the codes
+        scaled = np.asarray(probes * scale, dtype=np.float32)
+
+        k = min(self.rerank, len(ids))
+        best_scores, best_positions = [], []
+        for start in range(0, len(ids), SCAN_CHUNK_ROWS):
+            stop = start + SCAN_CHUNK_ROWS
+            scores = sq_norms[None, start:stop] - 2 * (scaled @ codes[start:stop].astype(np.float32).T)
+            scores[:, ids[start:stop] < 0] = np.inf
+            take = min(k, scores.shape[1])
+            positions = np.argpartition(scores, take - 1, axis=1)[:, :take]
+            best_scores.append(np.take_along_axis(scores, positions, axis=1))
+            best_positions.append(positions + start)
+        scores, positions = np.hstack(best_scores), np.hstack(best_positions)
+        keep = np.argpartition(scores, k - 1, axis=1)[:, :k]
+        nearest = np.take_along_axis(positions, keep, axis=1)[np.isfinite(np.take_along_axis(scores, keep, axis=1))]
+        nearest = np.unique(nearest)
+        return nearest if rows is None else rows[nearest]
+
+    def match(self, encoding, scope=None):
+        """Return (student_id, distance) of the closest template, or None if empty
+
+        ``scope`` restricts the search to students in matching shards.
+        """
+        return self.match_many(np.asarray(encoding).reshape(1, self.dim), scope)[0]
+
+    def match_many(self, probes, scope=None):
+        """Closest template for each probe, as match() does, in one pass
+
+        Returns a list with (student_id, distance) or None per probe. Only
+        the nearest row is needed, so unlike distances() nothing is reduced
+        per student.
+        """
+        probes = np.asarray(probes, dtype=self.dtype).reshape(-1, self.dim)
+        encodings, sq_norms, ids, _ = self._candidates(probes, scope)
+        if len(ids) == 0:
+            return [None] * len(probes)
+
+        # ||g - p||^2 = ||g||^2 - 2 g.p + ||p||^2; the last term is constant
+        # for ranking, so one matrix product finds each probe's nearest row.
+        scores = sq_norms[None, :] - 2 * (probes @ encodings.T)
+        scores[:, ids < 0] = np.inf
+        results = []
+        for probe, best in zip(probes, np.argmin(scores, axis=1)):
+            if ids[best] < 0:
+                results.append(None)
+            else:
+                results.append((int(ids[best]), float(np.linalg.norm(encodings[best] - probe))))
+        return results
+
+    def distances(self, probes, scope=None):
+        """Distances from each probe to every enrolled student
+
+        Returns (student_ids, matrix) where matrix has one row per probe and
+        one column per entry of student_ids, holding the distance to that
+        student's closest template. With an approximate index only the
+        candidate students for these probes are included, and with a scope
+        only students in matching shards.
+        """
+        probes = np.asarray(probes, dtype=self.dtype).reshape(-1, self.dim)
+        encodings, sq_norms, ids, multi = self._candidates(probes, scope)
+        live = ids >= 0
+
+        squared = sq_norms[None, :] - 2 * (probes @ encodings.T)
+        squared += np.einsum("ij,ij->i", probes, probes)[:, None]
+        np.maximum(squared, 0, out=squared)
+        ids, squared = ids[live], squared[:, live]
+
+        if multi and len(ids):
+            # Sort columns by student, then take the minimum of each run
+            order = np.argsort(ids, kind="stable")
+            ids = ids[order]
+            starts = np.flatnonzero(np.r_[True, ids[1:] != ids[:-1]])
+            squared = np.minimum.reduceat(squared[:, order], starts, axis=1)
+            ids = ids[starts]
+        return ids, np.sqrt(squared)
@@ -0,0 +1,143 @@
+import numpy as np
+
+
+class ExactIndex:
+    """No index: every gallery row is a candidate for every probe"""
+
+    trained = True
+
+    def needs_training(self, size: int) -> bool:
+        return False
+
+    def train(self, encodings):
+        pass
+
+    def reset(self):
+        pass
+
+    def add(self, rows, encodings):
+        pass
+
+    def candidate_rows(self, probes):
+        """Rows to compare against, or None for all of them"""
+        return None
+
+
+class IVFIndex:
+    """Inverted-file index: k-means centroids with a list of gallery rows each
+
+    A probe is compared only against rows in the ``nprobe`` lists whose
+    centroids are closest to it, and those candidates are then ranked by
+    exact distance. Raising ``nprobe`` trades latency for recall. Until the
+    gallery reaches ``min_size`` rows the index stays untrained and search
+    falls back to a full scan.
+    """
+
+    def __init__(self, nlist: int = 0, nprobe: int = 8, min_size: int = 10000,
+                 train_iterations: int = 15, seed: int = 0):
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.min_size = min_size
+        self.train_iterations = train_iterations
+        self.seed = seed
+        self.centroids = None
+        self.trained_size = 0
+        self.reset()
+
+    @property
+    def trained(self):
+        return self.centroids is not None
+
+    def needs_training(self, size: int) -> bool:
+        """True if the index should be (re)trained for a gallery of this size"""
+        if size < self.min_size:
+            return False
+        return not self.trained or size > 4 * self.trained_size
+
+    def reset(self):
+        """Empty the inverted lists but keep the centroids"""
+        count = 0 if self.centroids is None else len(self.centroids)
+        self._lists = [[] for _ in range(count)]
+        self._arrays = [None] * count
+
+    def train(self, encodings):
+        """Fit centroids with k-means on a sample of the encodings"""
+        encodings = np.asarray(encodings, dtype=np.float32)
+        nlist = self.nlist or int(np.sqrt(len(encodings)))
+        nlist = max(1, min(nlist, len(encodings)))
+        rng = np.random.default_rng(self.seed)
+
+        # Standard IVF practice: a few dozen points per centroid is plenty
+        sample_size = min(len(encodings), nlist * 64)
+        sample = encodings[rng.choice(len(encodings), sample_size, replace=False)]
+        centroids = sample[rng.choice(sample_size, nlist, replace=False)].copy()
+
+        for _ in range(self.train_iterations):
+            assignment = _nearest_centroids(sample, centroids, 1)[:, 0]
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, sample)
+            counts = np.bincount(assignment, minlength=nlist)
+            nonempty = counts > 0
+            centroids[nonempty] = sums[nonempty] / counts[nonempty, None]
+            # Re-seed empty clusters from random sample points
+            empty = np.flatnonzero(~nonempty)
+            if len(empty):
+                centroids[empty] = sample[rng.choice(sample_size, len(empty), replace=False)]
+
+        self.centroids = centroids
+        self.trained_size = len(encodings)
+        self.reset()
+
+    def add(self, rows, encodings):
+        """Assign gallery rows to their nearest centroid's list"""
+        if not self.trained or len(rows) == 0:
+            return
+        rows = np.asarray(rows, dtype=np.int64)
+        assignment = _nearest_centroids(encodings, self.centroids, 1)[:, 0]
+        order = np.argsort(assignment, kind="stable")
+        list_ids, starts = np.unique(assignment[order], return_index=True)
+        for list_id, group in zip(list_ids, np.split(rows[order], starts[1:])):
+            self._lists[list_id].extend(group.tolist())
+            self._arrays[list_id] = None
+
+    def _list_array(self, list_id):
+        array = self._arrays[list_id]
+        if array is None:
+            array = np.array(self._lists[list_id], dtype=np.int64)
+            self._arrays[list_id] = array
+        return array
+
+    def candidate_rows(self, probes):
+        """Sorted rows from the lists nearest to any probe"""
+        if not self.trained:
+            return None
+        nprobe = min(self.nprobe, len(self.centroids))
+        probe_lists = np.unique(_nearest_centroids(probes, self.centroids, nprobe))
+        arrays = [self._list_array(list_id) for list_id in probe_lists]
+        # Each row lives in exactly one list, so no de-duplication is needed;
+        # sorting keeps the later gather from the gallery cache-friendly.
+        return np.sort(np.concatenate(arrays)) if arrays else np.empty(0, dtype=np.int64)
+
+
+def _nearest_centroids(points, centroids, k, chunk_size: int = 8192):
+    """Indices of the k nearest centroids for each point, computed in chunks"""
+    points = np.asarray(points, dtype=np.float32).reshape(-1, centroids.shape[1])
+    centroid_norms = np.einsum("ij,ij->i", centroids, centroids)
+    result = np.empty((len(points), k), dtype=np.int64)
+    for start in range(0, len(points), chunk_size):
+        chunk = points[start:start + chunk_size]
+        scores = centroid_norms[None, :] - 2 * (chunk @ centroids.T)
+        if k == 1:
+            result[start:start + chunk_size, 0] = np.argmin(scores, axis=1)
+        else:
+            result[start:start + chunk_size] = np.argpartition(scores, k - 1, axis=1)[:, :k]
+    return result
+
+
+def create_index(index_type: str = "exact", nlist: int = 0, nprobe: int = 8, min_size: int = 10000):
+    """Build the index named by FACE_INDEX_TYPE"""
+    if index_type == "exact":
+        return ExactIndex()
+    if index_type == "ivf":
+        return IVFIndex(nlist=nlist, nprobe=nprobe, min_size=min_size)
+    raise ValueError(f"Unknown face index type: {index_type}")
@@ -0,0 +1,72 @@
+import asyncio
+import functools
+import time
+from contextlib import contextmanager
+from app.utils.metrics import registry
+
+STAGE_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+REQUEST_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def observe_stage(stage: str, seconds: float):
+    """Record the duration of one face pipeline stage
+
+    Stages: decode, detect, encode, queue (waiting for a face worker),
+    gallery_load, match and db_write.
+    """
+    registry.histogram(
+        "face_stage_seconds", STAGE_BUCKETS, "Time spent in each face pipeline stage", stage=stage
+    ).observe(seconds)
+
+
+def observe_stages(timings: dict):
+    for stage, seconds in timings.items():
+        observe_stage(stage, seconds)
+
+
+@contextmanager
+def stage(name: str):
+    """Time a block as one pipeline stage"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(name, time.perf_counter() - start)
+
+
+def count_outcome(outcome: str, amount: int = 1):
+    """Count recognized faces by outcome: matched, unrecognized, no_face or error"""
+    registry.counter(
+        "face_recognitions_total", "Faces processed by recognition, by outcome", outcome=outcome
+    ).inc(amount)
+
+
+def timed_endpoint(endpoint: str):
+    """Decorator counting calls of a route and their total latency"""
+    requests = registry.counter("face_requests_total", "Requests to face endpoints", endpoint=endpoint)
+    seconds = registry.histogram(
+        "face_request_seconds", REQUEST_BUCKETS, "Latency of face endpoints", endpoint=endpoint
+    )
+
+    def decorator(fn):
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return await fn(*args, **kwargs)
+                finally:
+                    requests.inc()
+                    seconds.observe(time.perf_counter() - start)
+        else:
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    requests.inc()
+                    seconds.observe(time.perf_counter() - start)
+        return wrapper
+
+    return decorator
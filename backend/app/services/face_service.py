@@ -1,96 +1,527 @@
-from fastapi import UploadFile
+from fastapi import UploadFile, HTTPException
+from starlette.concurrency import run_in_threadpool
 import numpy as np
 from sqlalchemy.orm import Session
 from app.models.student_model import Student
+from app.models.face_template_model import FaceTemplate
 from app.config import settings
-import pickle
+from app.services.face_gallery import FaceGallery, PRIMARY_TEMPLATE
+from app.services.face_index import create_index
+from app.services.face_executor import FacePipelineExecutor
+from app.services.encoding_cache import EncodingCache
+from app.services.match_batcher import MatchBatcher
+from app.services import face_metrics
+from app.utils.metrics import registry, Counter, Gauge
+from app.utils.face_utils import (
+    serialize_face_encoding,
+    deserialize_face_encoding,
+    downscale_for_detection,
+    scale_face_locations,
+    box_iou,
+)
+from app.utils.image_ingest import decode_image, read_upload, ImageTooLarge
+import importlib.util
+import threading
+import time
+
+# face_recognition imports dlib and loads its models, which takes seconds and
+# a few hundred MB, so it is imported on first use by load_face_library (in
+# the face workers) rather than with this module. It may not be installed.
+face_recognition = None
+_face_library_installed = None
+
+
+def face_library_available() -> bool:
+    """Whether face_recognition is installed, checked without importing it"""
+    global _face_library_installed
+    if face_recognition is not None:
+        return True
+    if _face_library_installed is None:
+        _face_library_installed = importlib.util.find_spec("face_recognition") is not None
+    return _face_library_installed
+
+
+def load_face_library():
+    """Import face_recognition (and its models) on first use in this process"""
+    global face_recognition
+    if face_recognition is None:
+        import face_recognition as library
+        face_recognition = library
+    return face_recognition
+
+
+def _warm_up_worker():
+    """Load the models and run them once on a blank image; the face workers' initializer"""
+    library = load_face_library()
+    blank = np.zeros((64, 64, 3), dtype=np.uint8)
+    library.face_locations(blank)
+    library.face_encodings(blank, [(0, 63, 63, 0)])
+
+
+# Process-wide gallery of enrolled encodings, built once from the database and
+# kept in sync by the student routes.
+gallery = FaceGallery(
+    index=create_index(
+        settings.FACE_INDEX_TYPE,
+        nlist=settings.FACE_INDEX_NLIST,
+        nprobe=settings.FACE_INDEX_NPROBE,
+        min_size=settings.FACE_INDEX_MIN_SIZE,
+    ),
+    quantization=settings.FACE_GALLERY_QUANTIZATION,
+    rerank=settings.FACE_GALLERY_RERANK,
+    spill_dir=settings.FACE_GALLERY_SPILL_DIR,
+)
+_gallery_load_lock = threading.Lock()
+# Gallery changes made while a load is reading the database. The load may
+# have read the rows before those changes committed, so they are replayed
+# on top of it; None when no load is running.
+_updates_during_load = None
+_updates_lock = threading.Lock()
+
+# Detection and encoding run here, never on the event loop. With
+# FACE_WARMUP every worker loads the models as it starts.
+executor = FacePipelineExecutor(
+    settings.FACE_WORKERS, settings.FACE_MAX_PENDING,
+    initializer=_warm_up_worker if settings.FACE_WARMUP and face_library_available() else None
+)
+
+# Detection results for recently seen images, so client retries are free
+encoding_cache = EncodingCache(settings.FACE_CACHE_SIZE, settings.FACE_CACHE_TTL_SECONDS)
+
+# Concurrent single-face matches share gallery passes
+match_batcher = MatchBatcher(gallery, settings.FACE_BATCH_WINDOW_MS / 1000, settings.FACE_BATCH_MAX_SIZE)
+
+# Read from the objects above at scrape time
+registry.register(Gauge("face_gallery_students", lambda: len(gallery), "Students in the loaded face gallery"))
+registry.register(Gauge("face_gallery_templates", lambda: gallery.template_count, "Face templates in the loaded gallery"))
+registry.register(Gauge("face_executor_pending", lambda: executor.pending, "Face jobs queued or running"))
+for _name in ("hits", "misses", "evictions"):
+    registry.register(Counter(
+        f"face_encoding_cache_{_name}_total", f"Encoding cache {_name}",
+        callback=lambda name=_name: encoding_cache.stats()[name]
+    ))
+registry.register(match_batcher.queue_wait)
+registry.register(match_batcher.batch_size)
+
+
+async def warm_up(db: Session):
+    """Start every face worker, which loads the models, and build the gallery
+    
+    Returns the number of worker processes started (1 in thread mode).
+    """
+    workers = await executor.start()
+    await run_in_threadpool(get_gallery, db)
+    return workers
+
+
+def student_scope(student: Student):
+    """The (department, year, section) shard a student is matched in"""
+    return (student.department, student.year, student.section)
+
+
+def make_scope(department: str = None, year: int = None, section: str = None):
+    """Build a gallery scope filter; None if no filter was given"""
+    if department is None and year is None and section is None:
+        return None
+    return (department, year, section)
+
+
+def _gallery_is_stale() -> bool:
+    refresh = settings.FACE_GALLERY_REFRESH_SECONDS
+    return refresh > 0 and time.monotonic() - gallery.loaded_at > refresh
+
+
+def get_gallery(db: Session) -> FaceGallery:
+    """Return the face gallery, loading it from the database on first use
+    
+    Each student's primary encoding and extra face templates become rows of
+    the gallery keyed by (student id, template id).
+    """
+    if gallery.loaded and not _gallery_is_stale():
+        return gallery
+
+    global _updates_during_load
+    with _gallery_load_lock:
+        if not gallery.loaded or _gallery_is_stale():
+            with _updates_lock:
+                _updates_during_load = []
+            try:
+                _load_gallery(db)
+                with _updates_lock:
+                    for update in _updates_during_load:
+                        update()
+            finally:
+                with _updates_lock:
+                    _updates_during_load = None
+    return gallery
+
+
+def _load_gallery(db: Session):
+    start = time.perf_counter()
+    rows = db.query(
+        Student.id, Student.face_encoding, Student.department, Student.year, Student.section
+    ).filter(Student.face_encoding.isnot(None)).all()
+    template_rows = db.query(
+        FaceTemplate.id, FaceTemplate.student_id, FaceTemplate.face_encoding,
+        Student.department, Student.year, Student.section
+    ).join(Student, FaceTemplate.student_id == Student.id).all()
+    
+    items = [
+        ((row.id, PRIMARY_TEMPLATE), deserialize_face_encoding(row.face_encoding)) for row in rows
+    ] + [
+        ((row.student_id, row.id), deserialize_face_encoding(row.face_encoding)) for row in template_rows
+    ]
+    scopes = {row.id: (row.department, row.year, row.section) for row in rows}
+    scopes.update(
+        (row.student_id, (row.department, row.year, row.section)) for row in template_rows
+    )
+    gallery.load(items, scopes=scopes)
+    face_metrics.observe_stage("gallery_load", time.perf_counter() - start)
+
+
+def _apply_update(update):
+    """Apply a gallery change now if loaded, and again after a load in progress"""
+    with _updates_lock:
+        if _updates_during_load is not None:
+            _updates_during_load.append(update)
+        if gallery.loaded:
+            update()
+
+
+def update_gallery(student: Student):
+    """Add or replace a student's encoding and scope in the loaded gallery"""
+    if student.face_encoding is None:
+        scope = student_scope(student)
+        _apply_update(lambda: gallery.set_scope(student.id, scope))
+    else:
+        add_to_gallery(student.id, student.face_encoding, student_scope(student))
+
+
+def add_to_gallery(student_id: int, encoding_bytes: bytes, scope=None, template_id: int = PRIMARY_TEMPLATE):
+    """Add or replace one stored encoding (primary or template) in the loaded gallery"""
+    encoding = deserialize_face_encoding(encoding_bytes)
+    _apply_update(lambda: gallery.upsert(student_id, encoding, scope, template_id))
+
+
+def remove_from_gallery(student_id: int):
+    """Drop all of a student's encodings from the loaded gallery"""
+    _apply_update(lambda: gallery.remove(student_id))
+
+
+def remove_template_from_gallery(student_id: int, template_id: int):
+    """Drop one face template from the loaded gallery"""
+    _apply_update(lambda: gallery.remove_template(student_id, template_id))
+
+
+def detect_and_encode_faces(image_array, timings: dict = None):
+    """Detect every face in an image; returns (face_locations, face_encodings)
+    
+    Detection runs on a copy downscaled to FACE_DETECTION_MAX_SIZE. The boxes
+    are mapped back so encodings are computed from crops of ``image_array``
+    at its decoded resolution (large JPEGs are decoded near
+    FACE_DECODE_MAX_SIZE, not at full size).
+    Stage durations are added to ``timings`` if given.
+    """
+    timings = {} if timings is None else timings
+    library = load_face_library()
+    start = time.perf_counter()
+    small, scale = downscale_for_detection(image_array, settings.FACE_DETECTION_MAX_SIZE)
+    face_locations = library.face_locations(
+        small, number_of_times_to_upsample=settings.FACE_DETECTION_UPSAMPLE
+    )
+    timings["detect"] = time.perf_counter() - start
+    
+    if len(face_locations) == 0:
+        return [], []
+    
+    start = time.perf_counter()
+    face_locations = scale_face_locations(face_locations, scale, image_array.shape)
+    face_encodings = library.face_encodings(image_array, face_locations)
+    timings["encode"] = time.perf_counter() - start
+    return face_locations, face_encodings
+
+
+def _decode(contents: bytes, timings: dict):
+    """Decode an upload within the ingest limits; returns (image_array, scale, original_shape)"""
+    start = time.perf_counter()
+    image_array, scale = decode_image(contents, settings.FACE_MAX_IMAGE_PIXELS, settings.FACE_DECODE_MAX_SIZE)
+    timings["decode"] = time.perf_counter() - start
+    original_shape = (round(image_array.shape[0] / scale), round(image_array.shape[1] / scale))
+    return image_array, scale, original_shape
+
+
+def encode_image_bytes(contents: bytes):
+    """Decode an image and encode every face in it; runs inside the face executor
+    
+    Returns ([(location, encoding)], stage timings in seconds). Locations
+    are in the coordinates of the uploaded image, even if it was decoded at
+    reduced scale.
+    """
+    timings = {}
+    image_array, scale, original_shape = _decode(contents, timings)
+    face_locations, face_encodings = detect_and_encode_faces(image_array, timings)
+    face_locations = scale_face_locations(face_locations, scale, original_shape)
+    return list(zip(face_locations, face_encodings)), timings
+
+
+def encode_new_faces(contents: bytes, known_boxes, iou_threshold: float = 0.3):
+    """Detect every face but encode only those not overlapping a known box
+    
+    Runs inside the face executor for live sessions, where faces that are
+    already tracked do not need a fresh encoding. Returns a list of
+    (location, encoding or None, index into known_boxes or None) and the
+    stage timings.
+    """
+    timings = {}
+    library = load_face_library()
+    image_array, decode_scale, original_shape = _decode(contents, timings)
+    start = time.perf_counter()
+    small, scale = downscale_for_detection(image_array, settings.FACE_DETECTION_MAX_SIZE)
+    decoded_locations = scale_face_locations(
+        library.face_locations(small, number_of_times_to_upsample=settings.FACE_DETECTION_UPSAMPLE),
+        scale, image_array.shape
+    )
+    timings["detect"] = time.perf_counter() - start
+    
+    # Tracks and results use uploaded-image coordinates; encoding uses the decoded array
+    face_locations = scale_face_locations(decoded_locations, decode_scale, original_shape)
+    faces, new_locations = [], []
+    for location, decoded in zip(face_locations, decoded_locations):
+        overlaps = [box_iou(location, box) for box in known_boxes]
+        best = int(np.argmax(overlaps)) if overlaps else None
+        if best is not None and overlaps[best] >= iou_threshold:
+            faces.append((location, None, best))
+        else:
+            faces.append((location, None, None))
+            new_locations.append(decoded)
+    
+    if new_locations:
+        start = time.perf_counter()
+        encodings = iter(library.face_encodings(image_array, new_locations))
+        faces = [
+            (location, next(encodings) if known is None else None, known)
+            for location, _, known in faces
+        ]
+        timings["encode"] = time.perf_counter() - start
+    return faces, timings
+
+
+async def run_encoder(fn, *args, queued: bool = False):
+    """Run an encoder that returns (result, timings) on the face executor
+    
+    Records its stages plus the time spent waiting for a worker ("queue")
+    and returns only the result. ``queued`` waits for a slot instead of
+    failing fast under backpressure.
+    """
+    start = time.perf_counter()
+    run = executor.run_queued if queued else executor.run
+    result, timings = await run(fn, *args)
+    timings["queue"] = max(0.0, time.perf_counter() - start - sum(timings.values()))
+    face_metrics.observe_stages(timings)
+    return result
 
-# Lazy import – face_recognition may not be installed
-try:
-    import face_recognition
-except ImportError:
-    face_recognition = None
 
 async def encode_face(file: UploadFile):
     """Encode face from uploaded image"""
-    if face_recognition is None:
+    faces = await encode_faces(file)
+    
+    if not faces:
+        return None
+    
+    # Serialize encoding to bytes (use first face if multiple detected)
+    return serialize_face_encoding(faces[0][1], settings.FACE_ENCODING_DTYPE)
+
+async def encode_faces(file: UploadFile):
+    """Encode every face in an uploaded image; returns [(location, encoding)] or None on error"""
+    if not face_library_available():
         raise ImportError("face_recognition library is not installed")
     try:
-        # Read image file
-        contents = await file.read()
-        
-        # Convert to numpy array
-        import io
-        from PIL import Image
-        image = Image.open(io.BytesIO(contents))
-        image_array = np.array(image)
-        
-        # Find face locations
-        face_locations = face_recognition.face_locations(image_array)
-        
-        if len(face_locations) == 0:
-            return None
-        
-        # Get face encoding (use first face if multiple detected)
-        face_encodings = face_recognition.face_encodings(image_array, face_locations)
-        
-        if len(face_encodings) == 0:
-            return None
-        
-        # Serialize encoding to bytes
-        encoding_bytes = pickle.dumps(face_encodings[0])
-        return encoding_bytes
+        contents = await read_upload(file, settings.FACE_MAX_UPLOAD_BYTES)
         
+        cache_key = encoding_cache.key(
+            contents, settings.FACE_DETECTION_MAX_SIZE, settings.FACE_DETECTION_UPSAMPLE,
+            settings.FACE_DECODE_MAX_SIZE
+        )
+        faces = encoding_cache.get(cache_key)
+        if faces is None:
+            faces = await run_encoder(encode_image_bytes, contents)
+            for _, encoding in faces:
+                encoding.setflags(write=False)  # shared by later cache hits
+            encoding_cache.put(cache_key, faces)
+        return list(faces)
+    except HTTPException:
+        raise
+    except ImageTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except Exception as e:
-        print(f"Error encoding face: {str(e)}")
+        print(f"Error encoding faces: {str(e)}")
         return None
 
-async def recognize_face(file: UploadFile, db: Session):
-    """Recognize face from uploaded image"""
-    if face_recognition is None:
+def assign_faces(distances, tolerance: float):
+    """Pair faces (rows) with students (columns) one-to-one, closest pairs first
+    
+    Returns a dict mapping face index to column index. Faces left without a
+    student within tolerance are omitted.
+    """
+    face_rows, student_cols = np.nonzero(distances <= tolerance)
+    order = np.argsort(distances[face_rows, student_cols], kind="stable")
+    
+    assigned = {}
+    taken = set()
+    for k in order:
+        face, col = int(face_rows[k]), int(student_cols[k])
+        if face in assigned or col in taken:
+            continue
+        assigned[face] = col
+        taken.add(col)
+    return assigned
+
+def match_faces(face_gallery: FaceGallery, probes, scope=None):
+    """Match probe encodings one-to-one against the gallery
+    
+    Returns a dict mapping probe index to (student_id, distance). With a
+    scope, only that shard is searched unless FACE_SCOPE_FALLBACK_GLOBAL is
+    set, in which case probes left unmatched get a second, global pass.
+    """
+    tolerance = settings.FACE_RECOGNITION_TOLERANCE
+    student_ids, distances = face_gallery.distances(probes, scope=scope)
+    matches = {
+        face: (int(student_ids[col]), float(distances[face, col]))
+        for face, col in assign_faces(distances, tolerance).items()
+    }
+    
+    if scope is None or not settings.FACE_SCOPE_FALLBACK_GLOBAL or len(matches) == len(probes):
+        return matches
+    
+    remaining = [face for face in range(len(probes)) if face not in matches]
+    student_ids, distances = face_gallery.distances(probes[remaining])
+    taken = [student_id for student_id, _ in matches.values()]
+    distances[:, np.isin(student_ids, taken)] = np.inf
+    for row, col in assign_faces(distances, tolerance).items():
+        matches[remaining[row]] = (int(student_ids[col]), float(distances[row, col]))
+    return matches
+
+async def recognize_face(file: UploadFile, db: Session, scope=None):
+    """Recognize face from uploaded image
+    
+    ``scope`` is a (department, year, section) filter from make_scope.
+    """
+    if not face_library_available():
         return {"success": False, "message": "face_recognition library is not installed"}
     try:
         # Encode the uploaded face
-        uploaded_encoding_bytes = await encode_face(file)
+        faces = await encode_faces(file)
         
-        if uploaded_encoding_bytes is None:
+        if not faces:
+            face_metrics.count_outcome("no_face")
             return {"success": False, "message": "No face detected in image"}
         
-        uploaded_encoding = pickle.loads(uploaded_encoding_bytes)
-        
-        # Get all students with face encodings
-        students = db.query(Student).filter(Student.face_encoding.isnot(None)).all()
-        
-        if not students:
-            return {"success": False, "message": "No registered faces in database"}
+        uploaded_encoding = faces[0][1]
         
-        best_match = None
-        best_distance = float('inf')
+        # Gallery loading touches the database, so it runs in the threadpool
+        await run_in_threadpool(get_gallery, db)
         
-        # Compare with all registered faces
-        for student in students:
-            stored_encoding = pickle.loads(student.face_encoding)
-            
-            # Calculate face distance
-            distance = face_recognition.face_distance([stored_encoding], uploaded_encoding)[0]
-            
-            if distance < best_distance:
-                best_distance = distance
-                best_match = student
+        # Matched together with other requests arriving at the same moment
+        with face_metrics.stage("match"):
+            match = await match_batcher.match(uploaded_encoding, scope)
+            if scope is not None and settings.FACE_SCOPE_FALLBACK_GLOBAL and (
+                match is None or match[1] > settings.FACE_RECOGNITION_TOLERANCE
+            ):
+                match = await match_batcher.match(uploaded_encoding)
         
-        # Check if match is within tolerance
-        if best_distance <= settings.FACE_RECOGNITION_TOLERANCE:
-            confidence = 1 - best_distance
-            return {
-                "success": True,
-                "student_id": best_match.id,
-                "student_roll": best_match.student_id,
-                "confidence": confidence,
-                "message": "Face recognized successfully"
-            }
-        else:
-            return {"success": False, "message": "Face not recognized"}
+        result = await run_in_threadpool(_match_result, db, match)
+        face_metrics.count_outcome("matched" if result["success"] else "unrecognized")
+        return result
             
+    except HTTPException:
+        raise
     except Exception as e:
+        face_metrics.count_outcome("error")
         print(f"Error recognizing face: {str(e)}")
         return {"success": False, "message": f"Error: {str(e)}"}
+
+def _match_result(db: Session, match):
+    """Turn a gallery (student_id, distance) match into a recognition result"""
+    if match is None:
+        return {"success": False, "message": "No registered faces in database"}
+    
+    best_student_id, best_distance = match
+    
+    # Check if match is within tolerance
+    if best_distance > settings.FACE_RECOGNITION_TOLERANCE:
+        return {"success": False, "message": "Face not recognized"}
+    
+    best_match = db.query(Student).filter(Student.id == best_student_id).first()
+    if best_match is None:
+        # Deleted by another worker since this gallery was loaded
+        remove_from_gallery(best_student_id)
+        return {"success": False, "message": "Face not recognized"}
+    
+    confidence = 1 - best_distance
+    return {
+        "success": True,
+        "student_id": best_match.id,
+        "student_roll": best_match.student_id,
+        "confidence": confidence,
+        "message": "Face recognized successfully"
+    }
+
+async def recognize_faces(file: UploadFile, db: Session, scope=None):
+    """Recognize every face in a group photo against the gallery"""
+    if not face_library_available():
+        return {"success": False, "message": "face_recognition library is not installed"}
+    try:
+        faces = await encode_faces(file)
+        
+        if faces is None:
+            return {"success": False, "message": "Could not process image"}
+        if len(faces) == 0:
+            face_metrics.count_outcome("no_face")
+            return {"success": False, "message": "No face detected in image"}
+        
+        return await run_in_threadpool(_recognize_encodings, db, faces, scope)
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        face_metrics.count_outcome("error")
+        print(f"Error recognizing faces: {str(e)}")
+        return {"success": False, "message": f"Error: {str(e)}"}
+
+def _recognize_encodings(db: Session, faces, scope=None):
+    """Match every (location, encoding) pair and look up the students"""
+    face_gallery = get_gallery(db)
+    if len(face_gallery) == 0:
+        return {"success": False, "message": "No registered faces in database"}
+    
+    # One probes x gallery distance matrix for the whole photo
+    probes = np.array([encoding for _, encoding in faces])
+    with face_metrics.stage("match"):
+        matches = match_faces(face_gallery, probes, scope)
+    matched_ids = [student_id for student_id, _ in matches.values()]
+    students = {
+        student.id: student
+        for student in db.query(Student).filter(Student.id.in_(matched_ids)).all()
+    } if matched_ids else {}
+    
+    results = []
+    for index, ((top, right, bottom, left), _) in enumerate(faces):
+        face = {
+            "face_index": index,
+            "box": {"top": top, "right": right, "bottom": bottom, "left": left},
+            "student_id": None,
+            "student_roll": None,
+            "confidence": None,
+        }
+        student_id, distance = matches.get(index, (None, None))
+        student = students.get(student_id)
+        if student is not None:
+            face["student_id"] = student.id
+            face["student_roll"] = student.student_id
+            face["confidence"] = 1 - distance
+        results.append(face)
+    
+    matched = sum(1 for face in results if face["student_id"] is not None)
+    face_metrics.count_outcome("matched", matched)
+    face_metrics.count_outcome("unrecognized", len(results) - matched)
+    return {"success": True, "faces": results}
@@ -0,0 +1,164 @@
+import asyncio
+import numpy as np
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.models.attendance_model import Attendance
+from app.models.student_model import Student
+from app.services import face_service, attendance_service
+
+
+class LiveSession:
+    """State of one kiosk's WebSocket recognition stream
+
+    Frames go into a single slot: if a new frame arrives before the previous
+    one was picked up, the older frame is dropped, so a slow pipeline always
+    works on the most recent picture. Recognized faces become tracks that
+    follow the face by box overlap from frame to frame; tracked faces are not
+    encoded again, and students marked earlier in the session are reported
+    without writing a second attendance row.
+    """
+
+    def __init__(self, db: Session, subject: str = None, marked_by: int = None, scope=None):
+        self.db = db
+        self.subject = subject
+        self.marked_by = marked_by
+        self.scope = scope
+        self.tracks = []   # {"box", "student_id", "student_roll", "missed"}
+        self.marked = {}   # student id -> attendance id
+        self.frames_received = 0
+        self.frames_processed = 0
+        self.frames_dropped = 0
+        self._latest = None
+        self._closed = False
+        self._ready = asyncio.Event()
+
+    def push(self, frame: bytes):
+        """Offer a frame; replaces (and drops) any frame not yet processed"""
+        self.frames_received += 1
+        if self._latest is not None:
+            self.frames_dropped += 1
+        self._latest = frame
+        self._ready.set()
+
+    def close(self):
+        self._closed = True
+        self._ready.set()
+
+    async def next_frame(self):
+        """Wait for the latest frame; None once the client has gone"""
+        await self._ready.wait()
+        self._ready.clear()
+        frame, self._latest = self._latest, None
+        return None if self._closed else frame
+
+    async def process(self, contents: bytes):
+        """Recognize one frame; returns the events to send to the client"""
+        tracked = self.tracks
+        faces = await face_service.run_encoder(
+            face_service.encode_new_faces, contents, [track["box"] for track in tracked]
+        )
+        self.frames_processed += 1
+
+        seen = set()
+        for location, _, known in faces:
+            if known is not None:
+                tracked[known]["box"] = location
+                tracked[known]["missed"] = 0
+                seen.add(known)
+        for index, track in enumerate(tracked):
+            if index not in seen:
+                track["missed"] += 1
+        self.tracks = [track for track in tracked if track["missed"] <= settings.FACE_LIVE_TRACK_TTL]
+
+        new_faces = [(location, encoding) for location, encoding, _ in faces if encoding is not None]
+        results = []
+        if new_faces:
+            results = await run_in_threadpool(self._recognize, [encoding for _, encoding in new_faces])
+
+        events, frame_faces = [], []
+        for location, _, known in faces:
+            if known is not None:
+                track = tracked[known]
+                frame_faces.append(self._face(location, track["student_id"], track["student_roll"], "tracked"))
+
+        for (location, _), (student_id, student_roll, confidence, attendance_id) in zip(new_faces, results):
+            if student_id is None:
+                frame_faces.append(self._face(location, None, None, "unknown"))
+                continue
+
+            # A re-detected student replaces their stale track
+            self.tracks = [track for track in self.tracks if track["student_id"] != student_id]
+            self.tracks.append({"box": location, "student_id": student_id, "student_roll": student_roll, "missed": 0})
+
+            status = "marked" if attendance_id is not None else "already_marked"
+            frame_faces.append(self._face(location, student_id, student_roll, status, confidence))
+            if attendance_id is not None:
+                events.append({
+                    "type": "marked",
+                    "student_id": student_id,
+                    "student_roll": student_roll,
+                    "confidence": confidence,
+                    "attendance_id": attendance_id,
+                })
+
+        events.insert(0, {
+            "type": "frame",
+            "faces": frame_faces,
+            "frames_received": self.frames_received,
+            "frames_dropped": self.frames_dropped,
+        })
+        return events
+
+    @staticmethod
+    def _face(location, student_id, student_roll, status, confidence=None):
+        top, right, bottom, left = location
+        return {
+            "box": {"top": top, "right": right, "bottom": bottom, "left": left},
+            "student_id": student_id,
+            "student_roll": student_roll,
+            "status": status,
+            "confidence": confidence,
+        }
+
+    def _recognize(self, encodings):
+        """Match new faces and mark students not yet marked in this session
+
+        Blocking; runs in the threadpool. Returns one
+        (student_id, student_roll, confidence, attendance_id) per encoding,
+        with attendance_id None for students marked earlier (in this session
+        or, for the same subject and day, anywhere else).
+        """
+        face_gallery = face_service.get_gallery(self.db)
+        matches = face_service.match_faces(face_gallery, np.array(encodings), self.scope)
+        distances = dict(matches.values())
+        rolls = dict(
+            self.db.query(Student.id, Student.student_id).filter(Student.id.in_(list(distances))).all()
+        ) if distances else {}
+
+        records = {}
+        for student_id, distance in distances.items():
+            if student_id in rolls and student_id not in self.marked:
+                records[student_id] = Attendance(
+                    student_id=student_id,
+                    subject=self.subject,
+                    marked_by=self.marked_by,
+                    confidence_score=int((1 - distance) * 100),
+                    remarks="Live recognition",
+                )
+        new_ids = {}
+        if records:
+            saved = attendance_service.save_attendance(self.db, list(records.values()))
+            for student_id, (attendance_id, created) in zip(records, saved):
+                self.marked[student_id] = attendance_id
+                if created:
+                    new_ids[student_id] = attendance_id
+
+        results = []
+        for index in range(len(encodings)):
+            student_id, distance = matches.get(index, (None, None))
+            if student_id not in rolls:
+                results.append((None, None, None, None))
+                continue
+            results.append((student_id, rolls[student_id], 1 - distance, new_ids.get(student_id)))
+        return results
@@ -0,0 +1,98 @@
+import asyncio
+import time
+import numpy as np
+from starlette.concurrency import run_in_threadpool
+from app.services.face_gallery import FaceGallery
+from app.utils.metrics import Histogram
+
+QUEUE_WAIT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1)
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+
+
+class MatchBatcher:
+    """Coalesces concurrent 1:N gallery matches into one gallery pass
+
+    Probes arriving within ``window_seconds`` of the first pending probe (or
+    until ``max_batch`` are waiting) are matched together: one
+    probes x gallery product per scope, computed in the threadpool, after
+    which each caller's future is resolved with its own nearest student.
+    A window of 0 disables batching.
+    """
+
+    def __init__(self, face_gallery: FaceGallery, window_seconds: float = 0.005, max_batch: int = 32):
+        self.gallery = face_gallery
+        self.window_seconds = window_seconds
+        self.max_batch = max(1, max_batch)
+        self._pending = []  # (probe, scope, future, enqueued_at)
+        self._timer = None
+        self._tasks = set()
+        self.queue_wait = Histogram(
+            "face_match_queue_wait_seconds", QUEUE_WAIT_BUCKETS, "Time a probe waited for its batch"
+        )
+        self.batch_size = Histogram(
+            "face_match_batch_size", BATCH_SIZE_BUCKETS, "Probes matched per gallery pass"
+        )
+
+    async def match(self, encoding, scope=None):
+        """Return (student_id, distance) of the closest student, or None if none"""
+        if self.window_seconds <= 0:
+            self.batch_size.observe(1)
+            return await run_in_threadpool(self.gallery.match, encoding, scope)
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((np.asarray(encoding), scope, future, time.perf_counter()))
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window_seconds, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.ensure_future(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch):
+        started = time.perf_counter()
+        for _, _, _, enqueued_at in batch:
+            self.queue_wait.observe(started - enqueued_at)
+        self.batch_size.observe(len(batch))
+
+        try:
+            results = await run_in_threadpool(self._compute, [(probe, scope) for probe, scope, _, _ in batch])
+        except Exception as e:
+            for _, _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, _, future, _), result in zip(batch, results):
+            if not future.done():  # the caller may have gone away
+                future.set_result(result)
+
+    def _compute(self, items):
+        """Nearest student per probe, with one gallery pass per distinct scope"""
+        results = [None] * len(items)
+        groups = {}
+        for index, (_, scope) in enumerate(items):
+            groups.setdefault(scope, []).append(index)
+
+        for scope, indices in groups.items():
+            probes = np.stack([items[index][0] for index in indices])
+            for index, result in zip(indices, self.gallery.match_many(probes, scope=scope)):
+                results[index] = result
+        return results
+
+    def stats(self):
+        return {
+            "window_ms": self.window_seconds * 1000,
+            "max_batch": self.max_batch,
+            "queue_wait_seconds": self.queue_wait.snapshot(),
+            "batch_size": self.batch_size.snapshot(),
+        }
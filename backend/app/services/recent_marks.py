@@ -0,0 +1,74 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class RecentlyMarkedIndex:
+    """In-process index of attendance rows written recently
+
+    Maps (student id, subject, class day) and client idempotency keys to the
+    attendance id already stored, so repeated marks are answered without a
+    database round trip. Entries expire after ``ttl_seconds`` and the least
+    recently used entry is evicted beyond ``max_entries``; ``max_entries`` 0
+    disables the index. Each worker process has its own index, so the
+    database unique constraint remains the authority.
+    """
+
+    def __init__(self, max_entries: int = 100000, ttl_seconds: float = 3600):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()  # key -> (expires_at, attendance id)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(student_id: int, subject, class_day):
+        """The uniqueness rule of an attendance row"""
+        return (student_id, subject or "", class_day)
+
+    @staticmethod
+    def idempotency_key(key: str):
+        return ("idempotency", key)
+
+    def get(self, key):
+        """Return the stored attendance id, or None"""
+        if self.max_entries <= 0:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, attendance_id: int):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, attendance_id)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def discard(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
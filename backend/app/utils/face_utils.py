@@ -1,26 +1,71 @@
 import numpy as np
 from PIL import Image
 import io
+import pickle
+import struct
+from app.utils.image_ingest import decode_image
 
-def preprocess_image(image_bytes: bytes):
+# Binary face encoding format: an 8-byte header followed by the raw
+# little-endian floats, so readers can use np.frombuffer without copying.
+#   magic (4s) | version (B) | dtype code (B) | dimensions (H)
+ENCODING_MAGIC = b"FENC"
+ENCODING_VERSION = 1
+ENCODING_HEADER = struct.Struct("<4sBBH")
+ENCODING_DTYPES = {1: np.dtype("<f4"), 2: np.dtype("<f8")}
+ENCODING_DTYPE_CODES = {"float32": 1, "float64": 2}
+
+def load_image_array(image_bytes: bytes):
+    """Decode image bytes into a full-resolution, upright RGB numpy array"""
+    return decode_image(image_bytes)[0]
+
+def downscale_for_detection(image_array, max_size: int = 1024):
+    """Shrink an image so its longest side is at most max_size
+    
+    Returns (array, scale) where scale maps original coordinates to the
+    returned array. Images already small enough (or max_size 0) come back
+    unchanged with scale 1.0.
+    """
+    height, width = image_array.shape[:2]
+    if max_size <= 0 or max(height, width) <= max_size:
+        return image_array, 1.0
+    
+    scale = max_size / max(height, width)
+    new_size = (max(1, round(width * scale)), max(1, round(height * scale)))
+    image = Image.fromarray(image_array).resize(new_size, Image.Resampling.BILINEAR)
+    return np.array(image), scale
+
+def scale_face_locations(face_locations, scale: float, image_shape):
+    """Map (top, right, bottom, left) boxes found on a downscaled copy back to the original"""
+    if scale == 1.0:
+        return list(face_locations)
+    
+    height, width = image_shape[:2]
+    return [
+        (
+            max(0, int(top / scale)),
+            min(width, int(round(right / scale))),
+            min(height, int(round(bottom / scale))),
+            max(0, int(left / scale)),
+        )
+        for top, right, bottom, left in face_locations
+    ]
+
+def box_iou(a, b) -> float:
+    """Intersection over union of two (top, right, bottom, left) boxes"""
+    top, right = max(a[0], b[0]), min(a[1], b[1])
+    bottom, left = min(a[2], b[2]), max(a[3], b[3])
+    inter = max(0, right - left) * max(0, bottom - top)
+    if inter == 0:
+        return 0.0
+    area_a = (a[1] - a[3]) * (a[2] - a[0])
+    area_b = (b[1] - b[3]) * (b[2] - b[0])
+    return inter / float(area_a + area_b - inter)
+
+def preprocess_image(image_bytes: bytes, max_size: int = 1024):
     """Preprocess image for face recognition"""
     try:
-        # Convert bytes to PIL Image
-        image = Image.open(io.BytesIO(image_bytes))
-        
-        # Convert to RGB if necessary
-        if image.mode != 'RGB':
-            image = image.convert('RGB')
-        
-        # Resize if image is too large (for performance)
-        max_size = 1024
-        if max(image.size) > max_size:
-            ratio = max_size / max(image.size)
-            new_size = tuple(int(dim * ratio) for dim in image.size)
-            image = image.resize(new_size, Image.Resampling.LANCZOS)
-        
-        # Convert to numpy array
-        image_array = np.array(image)
+        # Convert bytes to an RGB array, then resize if image is too large (for performance)
+        image_array, _ = downscale_for_detection(load_image_array(image_bytes), max_size)
         return image_array
         
     except Exception as e:
@@ -49,3 +94,46 @@ def calculate_match_confidence(distance: float, tolerance: float = 0.6):
     # Convert distance to confidence (0-1 scale)
     confidence = 1 - (distance / tolerance)
     return round(confidence, 4)
+
+def serialize_face_encoding(encoding, dtype: str = "float32") -> bytes:
+    """Serialize a face encoding to the versioned raw-float format"""
+    code = ENCODING_DTYPE_CODES.get(dtype)
+    if code is None:
+        raise ValueError(f"Unsupported face encoding dtype: {dtype}")
+    
+    values = np.ascontiguousarray(encoding, dtype=ENCODING_DTYPES[code]).ravel()
+    header = ENCODING_HEADER.pack(ENCODING_MAGIC, ENCODING_VERSION, code, values.size)
+    return header + values.tobytes()
+
+def is_legacy_face_encoding(data: bytes) -> bool:
+    """True if the bytes are a pickled ndarray from before the raw format"""
+    return bytes(data[:len(ENCODING_MAGIC)]) != ENCODING_MAGIC
+
+class _NumpyUnpickler(pickle.Unpickler):
+    """Unpickler that only reconstructs plain numpy arrays"""
+    
+    ALLOWED = {
+        ("numpy.core.multiarray", "_reconstruct"),
+        ("numpy._core.multiarray", "_reconstruct"),
+        ("numpy", "ndarray"),
+        ("numpy", "dtype"),
+    }
+    
+    def find_class(self, module, name):
+        if (module, name) not in self.ALLOWED:
+            raise pickle.UnpicklingError(f"Refusing to load {module}.{name} from face encoding")
+        return super().find_class(module, name)
+
+def deserialize_face_encoding(data: bytes):
+    """Read a face encoding stored in either the raw or the legacy pickle format
+    
+    Raw encodings are returned as a read-only view over ``data``.
+    """
+    if is_legacy_face_encoding(data):
+        return np.asarray(_NumpyUnpickler(io.BytesIO(data)).load())
+    
+    magic, version, code, dims = ENCODING_HEADER.unpack_from(data)
+    if version != ENCODING_VERSION or code not in ENCODING_DTYPES:
+        raise ValueError(f"Unsupported face encoding format (version {version}, dtype {code})")
+    
+    return np.frombuffer(data, dtype=ENCODING_DTYPES[code], count=dims, offset=ENCODING_HEADER.size)
@@ -0,0 +1,64 @@
+import io
+import math
+import os
+import numpy as np
+from fastapi import UploadFile, HTTPException, status
+from PIL import Image, ImageOps
+
+
+class ImageTooLarge(ValueError):
+    """An image has more pixels than the configured limit"""
+
+
+def _upload_size(file: UploadFile):
+    if file.size is not None:
+        return file.size
+    position = file.file.tell()
+    file.file.seek(0, os.SEEK_END)
+    size = file.file.tell()
+    file.file.seek(position)
+    return size
+
+
+async def read_upload(file: UploadFile, max_bytes: int) -> bytes:
+    """Read an uploaded image, rejecting it with 413 if it exceeds max_bytes
+
+    Starlette spools multipart uploads to a temporary file, so the size is
+    checked before the image is pulled into memory, and it is read once.
+    """
+    too_large = HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"Image is too large (limit {max_bytes} bytes)"
+    )
+    if max_bytes > 0 and _upload_size(file) > max_bytes:
+        raise too_large
+
+    contents = await file.read(max_bytes + 1 if max_bytes > 0 else -1)
+    if max_bytes > 0 and len(contents) > max_bytes:
+        raise too_large
+    return contents
+
+
+def decode_image(image_bytes: bytes, max_pixels: int = 0, max_size: int = 0):
+    """Decode image bytes into one contiguous, upright RGB array
+
+    The header is checked against ``max_pixels`` before anything is decoded.
+    JPEGs larger than ``max_size`` are decoded directly at 1/2, 1/4 or 1/8
+    scale (PIL draft mode) while their longest side stays at least
+    ``max_size``. EXIF orientation is applied. Returns (array, scale) where
+    scale maps original image coordinates to the array (1.0 = full size).
+    """
+    image = Image.open(io.BytesIO(image_bytes))
+    width, height = image.size
+    if max_pixels > 0 and width * height > max_pixels:
+        raise ImageTooLarge(f"Image has {width * height} pixels (limit {max_pixels})")
+
+    if max_size > 0 and image.format == "JPEG" and max(width, height) > max_size:
+        ratio = max_size / max(width, height)
+        image.draft("RGB", (math.ceil(width * ratio), math.ceil(height * ratio)))
+    scale = image.size[0] / width
+
+    image = ImageOps.exif_transpose(image)
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    return np.ascontiguousarray(np.asarray(image)), scale
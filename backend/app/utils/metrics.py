@@ -0,0 +1,151 @@
+import bisect
+import threading
+
+
+def _format_labels(labels, extra=None):
+    items = list(labels) + (list(extra) if extra else [])
+    if not items:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in items) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    """Cumulative bucket histogram, in the style of a Prometheus histogram
+
+    ``buckets`` are the upper bounds of each bucket; an implicit +Inf bucket
+    catches everything larger. Safe to observe from several threads.
+    """
+
+    type = "histogram"
+
+    def __init__(self, name: str, buckets, description: str = "", labels=None):
+        self.name = name
+        self.description = description
+        self.labels = tuple(sorted((labels or {}).items()))
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+
+    @property
+    def count(self):
+        return sum(self._counts)
+
+    def snapshot(self):
+        """Cumulative counts per upper bound, plus total count and sum"""
+        with self._lock:
+            counts, total = list(self._counts), self._sum
+        cumulative, running = {}, 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            running += count
+            cumulative["+Inf" if bound == float("inf") else str(bound)] = running
+        return {"buckets": cumulative, "count": running, "sum": round(total, 6)}
+
+    def samples(self):
+        snapshot = self.snapshot()
+        for bound, count in snapshot["buckets"].items():
+            yield self.name + "_bucket" + _format_labels(self.labels, [("le", bound)]), count
+        yield self.name + "_sum" + _format_labels(self.labels), snapshot["sum"]
+        yield self.name + "_count" + _format_labels(self.labels), snapshot["count"]
+
+
+class Counter:
+    """Monotonic count, optionally read from a callback at scrape time"""
+
+    type = "counter"
+
+    def __init__(self, name: str, description: str = "", labels=None, callback=None):
+        self.name = name
+        self.description = description
+        self.labels = tuple(sorted((labels or {}).items()))
+        self.callback = callback
+        self._value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1):
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self):
+        return self.callback() if self.callback is not None else self._value
+
+    def samples(self):
+        yield self.name + _format_labels(self.labels), self.value
+
+
+class Gauge:
+    """Current value read from a callback at scrape time, so it costs nothing until scraped"""
+
+    type = "gauge"
+
+    def __init__(self, name: str, callback, description: str = "", labels=None):
+        self.name = name
+        self.description = description
+        self.labels = tuple(sorted((labels or {}).items()))
+        self.callback = callback
+
+    def samples(self):
+        yield self.name + _format_labels(self.labels), self.callback()
+
+
+class MetricsRegistry:
+    """Named metrics rendered together in the Prometheus text format
+
+    Metrics with the same name and different labels form one family.
+    ``histogram`` and ``counter`` return the existing metric for a name and
+    label set, so callers can look them up where they are used.
+    """
+
+    def __init__(self):
+        self._metrics = {}  # (name, labels) -> metric
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            return self._metrics.setdefault((metric.name, metric.labels), metric)
+
+    def histogram(self, name: str, buckets, description: str = "", **labels):
+        key = (name, tuple(sorted(labels.items())))
+        metric = self._metrics.get(key)
+        if metric is None:
+            metric = self.register(Histogram(name, buckets, description, labels))
+        return metric
+
+    def counter(self, name: str, description: str = "", **labels):
+        key = (name, tuple(sorted(labels.items())))
+        metric = self._metrics.get(key)
+        if metric is None:
+            metric = self.register(Counter(name, description, labels))
+        return metric
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format (version 0.0.4)"""
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda metric: (metric.name, metric.labels))
+        lines, current = [], None
+        for metric in metrics:
+            if metric.name != current:
+                current = metric.name
+                if metric.description:
+                    lines.append(f"# HELP {metric.name} {metric.description}")
+                lines.append(f"# TYPE {metric.name} {metric.type}")
+            for sample, value in metric.samples():
+                lines.append(f"{sample} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+# Process-wide registry served at /metrics
+registry = MetricsRegistry()
@@ -0,0 +1,207 @@
+"""
+Benchmark attendance report queries before and after the date-range indexes.
+
+Fills a synthetic attendance table (default 2M rows: 5,000 students, 20
+subjects, one academic year, inserted in date order as marks arrive) and
+times three queries, median over --repeat runs:
+
+  daily_report      every mark of one day (get_daily_report)
+  class_attendance  one subject on one day (get_class_attendance)
+  student_history   one student over 30 days (GET /attendance/?student_id=...)
+
+"before" is the old code against the table without the date-range indexes:
+func.date(class_date) == day, and an inclusive end date. "after" is the
+current code, with half-open class_date ranges, against the indexed table.
+The query plan of each is printed: EXPLAIN QUERY PLAN on SQLite, EXPLAIN
+ANALYZE on PostgreSQL.
+
+Runs use a throwaway SQLite database unless --database-url is given; that
+database's attendance, students and users tables are dropped and refilled.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_attendance_queries --rows 2000000 --repeat 5
+"""
+
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+import numpy as np
+from sqlalchemy import create_engine, func, text
+from sqlalchemy.orm import Session
+from sqlalchemy.schema import CreateIndex
+from app.database import Base
+from app.models.attendance_model import Attendance, AttendanceStatus
+from app.models.student_model import Student
+from app.models.user_model import User
+from app.models import face_template_model  # noqa: F401 - register related mappers
+from app.services.attendance_service import day_range
+
+NEW_INDEXES = ("ix_attendance_student_class_date", "ix_attendance_subject_class_date", "ix_attendance_class_date")
+FIRST_DAY = datetime(2024, 1, 1)
+STATUSES = [AttendanceStatus.PRESENT, AttendanceStatus.PRESENT, AttendanceStatus.PRESENT,
+            AttendanceStatus.LATE, AttendanceStatus.ABSENT]
+
+
+def fill(engine, rows: int, students: int, subjects: int, days: int, batch: int = 50000):
+    """Create the tables and insert `rows` unique (student, subject, day) marks"""
+    tables = [User.__table__, Student.__table__, Attendance.__table__]
+    Base.metadata.drop_all(engine, tables=tables)
+    Base.metadata.create_all(engine, tables=tables)
+    space = days * subjects * students
+    if rows > space:
+        raise SystemExit(f"At most {space} unique marks fit {students} students, {subjects} subjects, {days} days")
+
+    rng = np.random.default_rng(0)
+    marks = np.unique(rng.integers(0, space, size=int(rows * 1.1)))
+    marks = np.sort(rng.choice(marks, size=rows, replace=False))  # day-major, so inserts follow the calendar
+    day, rest = np.divmod(marks, subjects * students)
+    subject, student = np.divmod(rest, students)
+    seconds = rng.integers(8 * 3600, 17 * 3600, size=rows)
+    status = rng.integers(0, len(STATUSES), size=rows)
+
+    with engine.begin() as connection:
+        connection.execute(User.__table__.insert(), [
+            {"id": 1, "email": "bench@example.com", "username": "bench", "hashed_password": "-"}
+        ])
+        connection.execute(Student.__table__.insert(), [
+            {"id": i + 1, "student_id": f"R{i + 1:06d}"} for i in range(students)
+        ])
+
+    start = time.perf_counter()
+    for offset in range(0, rows, batch):
+        chunk = []
+        for i in range(offset, min(offset + batch, rows)):
+            class_date = FIRST_DAY + timedelta(days=int(day[i]), seconds=int(seconds[i]))
+            chunk.append({
+                "student_id": int(student[i]) + 1,
+                "subject": f"Subject {int(subject[i]) + 1}",
+                "class_date": class_date,
+                "class_day": class_date.date(),
+                "status": STATUSES[status[i]],
+                "marked_by": 1,
+                "marked_at": class_date,
+            })
+        with engine.begin() as connection:
+            connection.execute(Attendance.__table__.insert(), chunk)
+    return time.perf_counter() - start
+
+
+def set_indexes(engine, present: bool):
+    """Create or drop the date-range indexes, then refresh planner statistics"""
+    with engine.begin() as connection:
+        for index in Attendance.__table__.indexes:
+            if index.name in NEW_INDEXES:
+                if present:
+                    connection.execute(CreateIndex(index, if_not_exists=True))
+                else:
+                    connection.execute(text(f"DROP INDEX IF EXISTS {index.name}"))
+        connection.execute(text("ANALYZE attendance"))
+
+
+def before_queries(db: Session, day: datetime, subject: str, student_id: int):
+    """The report queries as they were written before the date-range indexes"""
+    end_date = (day + timedelta(days=29)).date()
+    return {
+        "daily_report": db.query(Attendance).filter(func.date(Attendance.class_date) == day.date()),
+        "class_attendance": db.query(Attendance).filter(
+            func.date(Attendance.class_date) == day.date(), Attendance.subject == subject
+        ),
+        "student_history": db.query(Attendance).filter(
+            Attendance.student_id == student_id,
+            Attendance.class_date >= day.date(),
+            Attendance.class_date <= end_date
+        ),
+    }
+
+
+def after_queries(db: Session, day: datetime, subject: str, student_id: int):
+    """The same queries as attendance_service and the list route build them now"""
+    start, end = day_range(day.date())
+    history_end = day_range((day + timedelta(days=29)).date())[1]
+    return {
+        "daily_report": db.query(Attendance).filter(Attendance.class_date >= start, Attendance.class_date < end),
+        "class_attendance": db.query(Attendance).filter(
+            Attendance.class_date >= start, Attendance.class_date < end, Attendance.subject == subject
+        ),
+        "student_history": db.query(Attendance).filter(
+            Attendance.student_id == student_id,
+            Attendance.class_date >= start,
+            Attendance.class_date < history_end
+        ),
+    }
+
+
+def explain(db: Session, query):
+    """Query plan lines for an ORM query"""
+    connection = db.connection()
+    # Named parameters so the statement can be prefixed and sent as text
+    dialect = type(connection.dialect)(paramstyle="named")
+    compiled = query.statement.compile(dialect=dialect)
+    prefix = "EXPLAIN ANALYZE " if connection.dialect.name == "postgresql" else "EXPLAIN QUERY PLAN "
+    rows = connection.execute(text(prefix + str(compiled)), compiled.params).all()
+    return [row[-1] for row in rows]
+
+
+def measure(engine, build, args):
+    day = FIRST_DAY + timedelta(days=args.days // 2)
+    results = {}
+    with Session(engine) as db:
+        for name, query in build(db, day, "Subject 3", 42).items():
+            query.all()  # warm the page cache
+            timings = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                count = len(query.all())
+                timings.append((time.perf_counter() - start) * 1000)
+                db.expunge_all()
+            results[name] = {
+                "rows": count,
+                "median_ms": round(statistics.median(timings), 2),
+                "plan": explain(db, query),
+            }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Attendance report queries before and after the date-range indexes")
+    parser.add_argument("--rows", type=int, default=2000000)
+    parser.add_argument("--students", type=int, default=5000)
+    parser.add_argument("--subjects", type=int, default=20)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--database-url", help="Database to fill (default: a temporary SQLite file)")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_engine(args.database_url or f"sqlite:///{os.path.join(directory, 'bench.db')}")
+        fill_s = fill(engine, args.rows, args.students, args.subjects, args.days)
+        set_indexes(engine, present=False)
+        before = measure(engine, before_queries, args)
+        start = time.perf_counter()
+        set_indexes(engine, present=True)
+        index_s = time.perf_counter() - start
+        after = measure(engine, after_queries, args)
+        engine.dispose()
+
+    results = {"rows": args.rows, "fill_s": round(fill_s, 1), "index_s": round(index_s, 1),
+               "before": before, "after": after}
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{args.rows:,} attendance rows (filled in {fill_s:.1f}s, indexes built in {index_s:.1f}s)")
+    for name in before:
+        print(f"\n{name}: {before[name]['rows']} rows, "
+              f"before {before[name]['median_ms']:.2f}ms, after {after[name]['median_ms']:.2f}ms")
+        for label, result in (("before", before[name]), ("after", after[name])):
+            for line in result["plan"]:
+                print(f"  {label:6s} {line}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+Benchmark the downscale-then-detect face pipeline on a folder of photos.
+
+For each detection size the script times detection (on the downscaled copy)
+and encoding (on the full-resolution image) and compares the result with a
+full-resolution baseline. Accuracy is reported as face recall against the
+baseline and the mean distance between baseline and downscaled encodings.
+For reference, FACE_RECOGNITION_TOLERANCE is 0.6.
+
+Requires the face_recognition library.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_detection_scale <image_dir> --sizes 0 1600 1024 640
+"""
+
+import argparse
+import json
+import os
+import time
+import numpy as np
+import face_recognition
+from app.utils.face_utils import load_image_array, downscale_for_detection, scale_face_locations
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp'}
+
+
+def run_pipeline(image_array, max_size: int, upsample: int):
+    """Detect on a downscaled copy and encode at full resolution, with timings"""
+    start = time.perf_counter()
+    small, scale = downscale_for_detection(image_array, max_size)
+    locations = face_recognition.face_locations(small, number_of_times_to_upsample=upsample)
+    locations = scale_face_locations(locations, scale, image_array.shape)
+    detect_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    encodings = face_recognition.face_encodings(image_array, locations) if locations else []
+    encode_s = time.perf_counter() - start
+    return locations, encodings, detect_s, encode_s
+
+
+def box_iou(a, b):
+    top, right = max(a[0], b[0]), min(a[1], b[1])
+    bottom, left = min(a[2], b[2]), max(a[3], b[3])
+    inter = max(0, right - left) * max(0, bottom - top)
+    area_a = (a[1] - a[3]) * (a[2] - a[0])
+    area_b = (b[1] - b[3]) * (b[2] - b[0])
+    return inter / float(area_a + area_b - inter) if inter else 0.0
+
+
+def compare(baseline, candidate):
+    """Return (faces matched to a baseline face, encoding distances of those matches)"""
+    base_locations, base_encodings = baseline
+    locations, encodings = candidate
+    matched, drifts = 0, []
+    for base_box, base_encoding in zip(base_locations, base_encodings):
+        overlaps = [box_iou(base_box, box) for box in locations]
+        if overlaps and max(overlaps) >= 0.5:
+            matched += 1
+            best = int(np.argmax(overlaps))
+            drifts.append(float(np.linalg.norm(encodings[best] - base_encoding)))
+    return matched, drifts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Downscale-then-detect latency/accuracy benchmark")
+    parser.add_argument("image_dir")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1600, 1024, 800, 640],
+                        help="Detection sizes to compare (0 = full resolution)")
+    parser.add_argument("--upsample", type=int, default=1)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    paths = sorted(
+        os.path.join(args.image_dir, name) for name in os.listdir(args.image_dir)
+        if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS
+    )
+    if not paths:
+        raise SystemExit(f"No images found in {args.image_dir}")
+
+    images = []
+    for path in paths:
+        with open(path, 'rb') as f:
+            images.append(load_image_array(f.read()))
+
+    baselines = []
+    totals = {size: {"detect_s": 0.0, "encode_s": 0.0, "faces": 0, "matched": 0, "drifts": []} for size in [0] + args.sizes}
+    for image_array in images:
+        locations, encodings, detect_s, encode_s = run_pipeline(image_array, 0, args.upsample)
+        baselines.append((locations, encodings))
+        totals[0]["detect_s"] += detect_s
+        totals[0]["encode_s"] += encode_s
+        totals[0]["faces"] += len(locations)
+        totals[0]["matched"] += len(locations)
+
+    for size in args.sizes:
+        for image_array, baseline in zip(images, baselines):
+            locations, encodings, detect_s, encode_s = run_pipeline(image_array, size, args.upsample)
+            matched, drifts = compare(baseline, (locations, encodings))
+            totals[size]["detect_s"] += detect_s
+            totals[size]["encode_s"] += encode_s
+            totals[size]["faces"] += len(locations)
+            totals[size]["matched"] += matched
+            totals[size]["drifts"].extend(drifts)
+
+    baseline_faces = totals[0]["faces"]
+    results = []
+    for size, total in totals.items():
+        drifts = total["drifts"]
+        results.append({
+            "max_size": size,
+            "images": len(images),
+            "detect_ms_per_image": round(total["detect_s"] / len(images) * 1000, 2),
+            "encode_ms_per_image": round(total["encode_s"] / len(images) * 1000, 2),
+            "faces_detected": total["faces"],
+            "recall_vs_full_res": round(total["matched"] / baseline_faces, 4) if baseline_faces else None,
+            "mean_encoding_drift": round(float(np.mean(drifts)), 4) if drifts else 0.0,
+            "max_encoding_drift": round(float(np.max(drifts)), 4) if drifts else 0.0,
+        })
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{len(images)} images, {baseline_faces} faces at full resolution\n")
+    print(f"{'max_size':>9} {'detect ms':>10} {'encode ms':>10} {'faces':>6} {'recall':>7} {'drift':>7} {'max':>7}")
+    for r in results:
+        label = "full" if r["max_size"] == 0 else str(r["max_size"])
+        recall = r["recall_vs_full_res"] if r["recall_vs_full_res"] is not None else float("nan")
+        print(
+            f"{label:>9} {r['detect_ms_per_image']:>10.1f} {r['encode_ms_per_image']:>10.1f} "
+            f"{r['faces_detected']:>6d} {recall:>7.3f} {r['mean_encoding_drift']:>7.4f} {r['max_encoding_drift']:>7.4f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
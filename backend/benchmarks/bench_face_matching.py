@@ -0,0 +1,351 @@
+"""
+Benchmark 1:N face matching on synthetic galleries.
+
+For each gallery size the script generates clustered 128-d encodings (see
+bench_face_index) and measures the matching step of both recognizers:
+
+  backend     face_service's gallery: load time (deserializing stored
+              encodings into the gallery), single-probe latency, class-photo
+              latency (match_faces), MatchBatcher throughput under concurrent
+              requests, rank-1 accuracy and memory
+  recognize   face_service.recognize_face end to end with the detector
+              stubbed out (--stub-dlib only)
+  ai          FaceRecognizer from ai/recognize.py: gallery.npy load,
+              first (cold) match, per-probe latency, throughput and memory
+
+Results are written as JSON with the commit and environment, and --compare
+prints the change of every metric against an earlier results file.
+
+--stub-dlib replaces the face_recognition library (and OpenCV, if it is
+missing) with stubs, so the suite runs where dlib is not installed. Matching
+never calls dlib, so its numbers are unaffected by the stub.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_face_matching --sizes 100 10000 100000 1000000 --output base.json
+    python -m benchmarks.bench_face_matching --stub-dlib --compare base.json
+"""
+
+import argparse
+import asyncio
+import contextlib
+import importlib.util
+import io
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import types
+from datetime import datetime
+import numpy as np
+from app.config import settings
+from app.services.face_gallery import PRIMARY_TEMPLATE
+from app.utils.face_utils import serialize_face_encoding, deserialize_face_encoding
+from benchmarks.bench_face_index import synthetic_encodings, synthetic_probes, summarize
+
+AI_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "ai")
+CLASS_PHOTO_FACES = 30
+
+
+def install_stubs():
+    """Stand-ins for face_recognition (and cv2 if absent)
+
+    The stub "detects" one face per image and returns the encoding set in
+    its ``probe`` attribute.
+    """
+    stub = types.ModuleType("face_recognition")
+    stub.probe = None
+    stub.face_locations = lambda image, **kwargs: [(0, 10, 10, 0)]
+    stub.face_encodings = lambda image, locations: [stub.probe for _ in locations]
+    sys.modules["face_recognition"] = stub
+    if importlib.util.find_spec("cv2") is None:
+        sys.modules["cv2"] = types.ModuleType("cv2")
+    return stub
+
+
+def max_rss_mb():
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def environment(args):
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "stub_dlib": args.stub_dlib,
+        "face_index_type": settings.FACE_INDEX_TYPE,
+        "queries": args.queries,
+        "concurrency": args.concurrency,
+    }
+
+
+def latencies_ms(fn, probes):
+    """Call fn(probe) for every probe; returns (results, latencies in ms)"""
+    results, latencies = [], np.empty(len(probes))
+    for i, probe in enumerate(probes):
+        start = time.perf_counter()
+        results.append(fn(probe))
+        latencies[i] = (time.perf_counter() - start) * 1000
+    return results, latencies
+
+
+async def batched_throughput(batcher, probes, concurrency: int):
+    """Probes per second through the MatchBatcher with ``concurrency`` callers"""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(probe):
+        async with semaphore:
+            return await batcher.match(probe)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(probe) for probe in probes))
+    return len(probes) / (time.perf_counter() - start)
+
+
+def bench_backend(encodings, probes, sources, concurrency: int):
+    from app.services import face_service
+    from app.services.match_batcher import MatchBatcher
+
+    # Stored as in the students table; serializing is setup, not measured
+    stored = [serialize_face_encoding(encoding, settings.FACE_ENCODING_DTYPE) for encoding in encodings]
+    gallery = face_service.gallery
+    gallery.clear()
+
+    start = time.perf_counter()
+    gallery.load(
+        ((student_id, PRIMARY_TEMPLATE), deserialize_face_encoding(data))
+        for student_id, data in enumerate(stored, 1)
+    )
+    load_s = time.perf_counter() - start
+    del stored
+
+    matches, single = latencies_ms(gallery.match, probes)
+    correct = np.mean([match is not None and match[0] == source + 1 for match, source in zip(matches, sources)])
+
+    photos = [probes[i:i + CLASS_PHOTO_FACES] for i in range(0, len(probes), CLASS_PHOTO_FACES)]
+    _, photo = latencies_ms(lambda batch: face_service.match_faces(gallery, batch), photos)
+
+    unbatched = MatchBatcher(gallery, 0)
+    batcher = MatchBatcher(gallery, settings.FACE_BATCH_WINDOW_MS / 1000, settings.FACE_BATCH_MAX_SIZE)
+    return {
+        "load_s": round(load_s, 4),
+        "match": summarize(single),
+        "class_photo": {"faces": CLASS_PHOTO_FACES, **summarize(photo)},
+        "throughput": {
+            "sequential_per_s": round(1000 / float(single.mean()), 1),
+            "unbatched_per_s": round(asyncio.run(batched_throughput(unbatched, probes, concurrency)), 1),
+            "batched_per_s": round(asyncio.run(batched_throughput(batcher, probes, concurrency)), 1),
+        },
+        "rank1_accuracy": round(float(correct), 4),
+        "memory": {"gallery_mb": round(gallery.nbytes / 2 ** 20, 1), "max_rss_mb": max_rss_mb()},
+    }
+
+
+def bench_recognize(stub, probes, sources):
+    """recognize_face end to end over the gallery loaded by bench_backend"""
+    from PIL import Image
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from sqlalchemy.pool import StaticPool
+    from starlette.datastructures import UploadFile
+    from app.database import Base
+    from app.models import user_model, attendance_model, face_template_model  # noqa: F401 - create their tables
+    from app.models.student_model import Student
+    from app.services import face_service
+    from app.services.encoding_cache import EncodingCache
+    from app.services.face_executor import FacePipelineExecutor
+
+    face_service.face_recognition = stub
+    face_service.executor = FacePipelineExecutor(0, len(probes) + 1)  # threads see the stub
+    face_service.encoding_cache = EncodingCache(0)  # every probe uses the same image bytes
+    settings.FACE_GALLERY_REFRESH_SECONDS = 0  # keep the synthetic gallery loaded
+
+    # Only the students the probes can match need rows
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    db.add_all([Student(id=int(source) + 1, student_id=f"S{int(source) + 1}") for source in set(sources)])
+    db.commit()
+
+    buffer = io.BytesIO()
+    Image.new("RGB", (64, 64)).save(buffer, "PNG")
+    image = buffer.getvalue()
+
+    async def run():
+        latencies = np.empty(len(probes))
+        for i, probe in enumerate(probes):
+            stub.probe = probe
+            start = time.perf_counter()
+            result = await face_service.recognize_face(UploadFile(file=io.BytesIO(image), filename="probe.png"), db)
+            latencies[i] = (time.perf_counter() - start) * 1000
+            if not result["success"]:
+                raise RuntimeError(result["message"])
+        return latencies
+
+    try:
+        latencies = asyncio.run(run())
+    finally:
+        face_service.executor.shutdown()
+        db.close()
+    return {**summarize(latencies), "per_s": round(1000 / float(latencies.mean()), 1)}
+
+
+def load_face_recognizer():
+    """FaceRecognizer from ai/recognize.py, or None if its imports are missing"""
+    if AI_DIR not in sys.path:
+        sys.path.append(AI_DIR)  # recognize.py imports its sibling face_encoding.py
+    spec = importlib.util.spec_from_file_location("ai_recognize", os.path.join(AI_DIR, "recognize.py"))
+    module = importlib.util.module_from_spec(spec)
+    try:
+        spec.loader.exec_module(module)
+    except ImportError as e:
+        print(f"Skipping FaceRecognizer: {e} (use --stub-dlib)", file=sys.stderr)
+        return None
+    return module.FaceRecognizer
+
+
+def bench_ai(recognizer_class, encodings, probes):
+    with tempfile.TemporaryDirectory() as directory:
+        # The consolidated gallery layout written by ai/face_encoding.py
+        np.save(os.path.join(directory, "gallery.npy"), encodings)
+        with open(os.path.join(directory, "gallery_names.json"), "w") as f:
+            json.dump([f"S{i}" for i in range(len(encodings))], f)
+
+        recognizer = recognizer_class()
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            recognizer.load_encodings_from_directory(directory)
+        load_s = time.perf_counter() - start
+
+        # Touches every page of the memory map and computes the norms
+        start = time.perf_counter()
+        recognizer.match(probes[0])
+        first_ms = (time.perf_counter() - start) * 1000
+
+        _, latencies = latencies_ms(recognizer.match, probes)
+        result = {
+            "load_s": round(load_s, 4),
+            "first_match_ms": round(first_ms, 3),
+            "match": summarize(latencies),
+            "throughput": {"sequential_per_s": round(1000 / float(latencies.mean()), 1)},
+            "memory": {
+                "mapped_mb": round(recognizer.known_encodings.nbytes / 2 ** 20, 1),
+                "norms_mb": round(recognizer._squared_norms.nbytes / 2 ** 20, 1),
+                "max_rss_mb": max_rss_mb(),
+            },
+        }
+        del recognizer
+    return result
+
+
+def run(size: int, args, stub, recognizer_class):
+    encodings = synthetic_encodings(size)
+    probes, sources = synthetic_probes(encodings, args.queries)
+    result = {"size": size, "backend": bench_backend(encodings, probes, sources, args.concurrency)}
+    if stub is not None:
+        result["recognize"] = bench_recognize(stub, probes, sources)
+    if recognizer_class is not None:
+        result["ai"] = bench_ai(recognizer_class, encodings, probes)
+    return result
+
+
+def flatten(value, prefix=""):
+    """Dotted metric names mapped to numbers"""
+    if isinstance(value, dict):
+        items = {}
+        for key, child in value.items():
+            items.update(flatten(child, f"{prefix}.{key}" if prefix else key))
+        return items
+    return {prefix: value} if isinstance(value, (int, float)) and not isinstance(value, bool) else {}
+
+
+def compare(results, baseline_path):
+    """Print each metric next to the same metric in an earlier results file"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    old_by_size = {result["size"]: flatten(result) for result in baseline["results"]}
+    print(f"\nCompared with {baseline_path} (commit {baseline['environment'].get('commit')})")
+    for result in results:
+        old = old_by_size.get(result["size"])
+        if old is None:
+            continue
+        print(f"\nGallery size {result['size']:,}")
+        for name, value in flatten(result).items():
+            if name == "size" or name not in old:
+                continue
+            change = f"{(value - old[name]) / old[name] * 100:+7.1f}%" if old[name] else "      -"
+            print(f"  {name:40s} {old[name]:>12} -> {value:>12}  {change}")
+
+
+def print_results(results):
+    for result in results:
+        backend = result["backend"]
+        print(f"\nGallery size {result['size']:,}")
+        print(
+            f"  backend   load {backend['load_s']:8.3f}s  p50 {backend['match']['p50_ms']:8.3f}ms  "
+            f"p95 {backend['match']['p95_ms']:8.3f}ms  photo p50 {backend['class_photo']['p50_ms']:8.3f}ms  "
+            f"batched {backend['throughput']['batched_per_s']:9.1f}/s  "
+            f"unbatched {backend['throughput']['unbatched_per_s']:9.1f}/s  "
+            f"rank-1 {backend['rank1_accuracy']:.3f}  {backend['memory']['gallery_mb']:.1f} MB"
+        )
+        if "recognize" in result:
+            recognize = result["recognize"]
+            print(f"  recognize p50 {recognize['p50_ms']:8.3f}ms  p95 {recognize['p95_ms']:8.3f}ms  {recognize['per_s']:9.1f}/s")
+        if "ai" in result:
+            ai = result["ai"]
+            print(
+                f"  ai        load {ai['load_s']:8.3f}s  first {ai['first_match_ms']:8.3f}ms  "
+                f"p50 {ai['match']['p50_ms']:8.3f}ms  p95 {ai['match']['p95_ms']:8.3f}ms  "
+                f"{ai['throughput']['sequential_per_s']:9.1f}/s  {ai['memory']['mapped_mb']:.1f} MB mapped"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Face matching benchmark on synthetic galleries")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000, 100000, 1000000])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32, help="Concurrent callers for the throughput runs")
+    parser.add_argument("--stub-dlib", action="store_true",
+                        help="Stub face_recognition (and cv2 if missing); also times recognize_face end to end")
+    parser.add_argument("--skip-ai", action="store_true", help="Skip the ai/ FaceRecognizer")
+    parser.add_argument("--output", help="Write results to this JSON file")
+    parser.add_argument("--compare", metavar="BASELINE", help="Compare with an earlier --output file")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    stub = install_stubs() if args.stub_dlib else None
+    recognizer_class = None if args.skip_ai else load_face_recognizer()
+
+    results = []
+    for size in args.sizes:
+        print(f"Benchmarking gallery size {size:,}", file=sys.stderr)
+        results.append(run(size, args, stub, recognizer_class))
+    report = {"environment": environment(args), "results": results}
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_results(results)
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Benchmark the int8-quantized face gallery against the float32 one.
+
+Each size gets a clustered synthetic gallery (see bench_face_index) and two
+probe sets: enrolled faces (noisy copies of gallery entries) and impostors
+(fresh encodings from the same distribution, most of them near the
+tolerance). For every quantization and re-rank depth it reports:
+
+  resident_mb       memory of the in-RAM row arrays (exact rows of a
+                    quantized gallery live in its spill file)
+  load_s            gallery.load time
+  match p50/p95     single-probe gallery.match latency
+  batch_ms          one match_many() call for --batch probes, as MatchBatcher does
+  decision_changes  probes whose match decision (student within
+                    FACE_RECOGNITION_TOLERANCE, or none) differs from float32
+  max_distance_diff largest difference in the reported distance
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_face_quantization --sizes 10000 100000 1000000 --rerank 1 8
+"""
+
+import argparse
+import json
+import time
+import numpy as np
+from app.config import settings
+from app.services.face_gallery import FaceGallery
+from benchmarks.bench_face_index import synthetic_encodings, synthetic_probes, summarize
+
+
+def impostor_probes(count: int, seed: int = 2):
+    """Encodings of people not in the gallery, around the same cluster centres"""
+    # synthetic_encodings draws its centres first from seed 0
+    centres = np.random.default_rng(0).normal(0, 0.05, size=(256, 128)).astype(np.float32)
+    rng = np.random.default_rng(seed)
+    labels = rng.integers(0, len(centres), size=count)
+    return centres[labels] + rng.normal(0, 0.045, size=(count, 128)).astype(np.float32)
+
+
+def decisions(gallery: FaceGallery, probes, tolerance: float):
+    """(student id or -1, distance) per probe, as recognize_face decides"""
+    ids, distances = np.full(len(probes), -1), np.full(len(probes), np.inf)
+    for i, probe in enumerate(probes):
+        match = gallery.match(probe)
+        if match is not None:
+            distances[i] = match[1]
+            if match[1] <= tolerance:
+                ids[i] = match[0]
+    return ids, distances
+
+
+def run_one(encodings, probes, batch: int, quantization: str, rerank: int, spill_dir: str):
+    gallery = FaceGallery(quantization=quantization, rerank=rerank, spill_dir=spill_dir)
+    start = time.perf_counter()
+    gallery.load(zip(range(len(encodings)), encodings))
+    load_s = time.perf_counter() - start
+
+    latencies = np.empty(len(probes))
+    for i, probe in enumerate(probes):
+        begin = time.perf_counter()
+        gallery.match(probe)
+        latencies[i] = (time.perf_counter() - begin) * 1000
+
+    batches = [probes[i:i + batch] for i in range(0, len(probes), batch)]
+    batch_ms = np.empty(len(batches))
+    for i, chunk in enumerate(batches):
+        begin = time.perf_counter()
+        gallery.match_many(chunk)
+        batch_ms[i] = (time.perf_counter() - begin) * 1000
+
+    return gallery, {
+        "quantization": quantization or "none",
+        "rerank": rerank if quantization else None,
+        "resident_mb": round(gallery.nbytes / 2 ** 20, 2),
+        "load_s": round(load_s, 3),
+        "match": summarize(latencies),
+        "batch_ms": round(float(np.median(batch_ms)), 3),
+    }
+
+
+def run(size: int, args):
+    encodings = synthetic_encodings(size)
+    enrolled, _ = synthetic_probes(encodings, args.queries)
+    probes = np.vstack([enrolled, impostor_probes(args.queries)])
+    tolerance = settings.FACE_RECOGNITION_TOLERANCE
+
+    exact, baseline = run_one(encodings, probes, args.batch, None, 0, None)
+    exact_ids, exact_distances = decisions(exact, probes, tolerance)
+    baseline.update(decision_changes=0, max_distance_diff=0.0)
+    del exact
+    result = {"size": size, "probes": len(probes), "runs": [baseline]}
+
+    for quantization in args.quantization:
+        for rerank in args.rerank:
+            gallery, measured = run_one(encodings, probes, args.batch, quantization, rerank, args.spill_dir)
+            ids, distances = decisions(gallery, probes, tolerance)
+            finite = np.isfinite(exact_distances)
+            measured["decision_changes"] = int(np.sum(ids != exact_ids))
+            measured["max_distance_diff"] = round(float(np.max(np.abs(distances[finite] - exact_distances[finite]))), 6)
+            result["runs"].append(measured)
+            del gallery
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Quantized vs float32 face gallery benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--quantization", nargs="+", default=["int8"], choices=["int8"])
+    parser.add_argument("--rerank", type=int, nargs="+", default=[1, 8], help="Rows re-ranked exactly per probe")
+    parser.add_argument("--queries", type=int, default=200, help="Enrolled probes; as many impostors are added")
+    parser.add_argument("--batch", type=int, default=32, help="Probes per match_many() call")
+    parser.add_argument("--spill-dir", help="Directory for exact rows of quantized galleries (default: temp dir)")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    results = [run(size, args) for size in args.sizes]
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    for result in results:
+        print(f"\nGallery size {result['size']:,} ({result['probes']} probes, half impostors)")
+        for run_result in result["runs"]:
+            label = run_result["quantization"]
+            if run_result["rerank"]:
+                label += f" k={run_result['rerank']}"
+            print(
+                f"  {label:12s} {run_result['resident_mb']:9.2f} MB  load {run_result['load_s']:7.3f}s  "
+                f"p50 {run_result['match']['p50_ms']:8.3f}ms  p95 {run_result['match']['p95_ms']:8.3f}ms  "
+                f"batch {run_result['batch_ms']:8.3f}ms  decision changes {run_result['decision_changes']:3d}  "
+                f"max distance diff {run_result['max_distance_diff']:.6f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
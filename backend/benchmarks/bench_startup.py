@@ -0,0 +1,141 @@
+"""
+Benchmark API worker start-up with and without face warm-up.
+
+Each run starts a fresh Python process that imports app.main, runs the
+start-up handlers and then sends one API request (GET /students/) and two
+face requests (POST /attendance/mark-by-face). Reported per mode, as the
+median over --repeat runs:
+
+  import_s        importing app.main
+  startup_s       start-up handlers (the warm-up, with FACE_WARMUP)
+  first_api_ms    first non-face request
+  first_face_ms   first face request, which loads the models without warm-up
+  second_face_ms  the next face request, for comparison
+
+It also reports whether face_recognition was imported in the API process
+itself. With face worker processes it should not be.
+
+Runs use a throwaway SQLite database unless --database-url is given. Pass
+--image with a photo of a face to exercise detection; the default blank
+image only times detection that finds nothing. Requires the face_recognition
+library for meaningful face timings.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_startup --repeat 3 --image path/to/face.jpg
+"""
+
+import argparse
+import io
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+MODES = {"lazy": "false", "warmup": "true"}
+
+
+def child(image_path):
+    """One measured start-up; prints a JSON line"""
+    start = time.perf_counter()
+    import app.main
+    from fastapi.testclient import TestClient
+    imported = time.perf_counter()
+
+    if image_path:
+        with open(image_path, "rb") as f:
+            image = f.read()
+    else:
+        from PIL import Image
+        buffer = io.BytesIO()
+        Image.new("RGB", (640, 480)).save(buffer, "JPEG")
+        image = buffer.getvalue()
+
+    def timed(fn):
+        begin = time.perf_counter()
+        response = fn()
+        return round((time.perf_counter() - begin) * 1000, 2), response.status_code
+
+    def face_request():
+        return client.post("/attendance/mark-by-face?marked_by=1", files={"file": ("face.jpg", image)})
+
+    with TestClient(app.main.app) as client:  # runs the start-up handlers
+        ready = time.perf_counter()
+        first_api_ms, _ = timed(lambda: client.get("/students/"))
+        first_face_ms, face_status = timed(face_request)
+        second_face_ms, _ = timed(face_request)
+        face_library_in_api = "face_recognition" in sys.modules
+
+    print(json.dumps({
+        "import_s": round(imported - start, 3),
+        "startup_s": round(ready - imported, 3),
+        "first_api_ms": first_api_ms,
+        "first_face_ms": first_face_ms,
+        "second_face_ms": second_face_ms,
+        "face_status": face_status,
+        "face_library_in_api_process": face_library_in_api,
+    }))
+
+
+def run_once(mode: str, args, database_url: str):
+    env = dict(os.environ, FACE_WARMUP=MODES[mode], DATABASE_URL=database_url)
+    if args.workers is not None:
+        env["FACE_WORKERS"] = str(args.workers)
+    command = [sys.executable, "-m", "benchmarks.bench_startup", "--child"]
+    if args.image:
+        command += ["--image", os.path.abspath(args.image)]
+    start = time.perf_counter()
+    output = subprocess.run(command, env=env, capture_output=True, text=True, check=True).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    result["process_s"] = round(time.perf_counter() - start, 3)
+    return result
+
+
+def summarize(runs):
+    summary = {}
+    for key, value in runs[0].items():
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or key == "face_status":
+            summary[key] = value
+        else:
+            summary[key] = round(statistics.median(run[key] for run in runs), 3)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="API start-up benchmark: lazy face loading vs warm-up")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=None, help="FACE_WORKERS for the runs (default: from settings)")
+    parser.add_argument("--image", help="Photo sent to the face endpoint (default: a blank JPEG)")
+    parser.add_argument("--database-url", help="Database to start against (default: a temporary SQLite file)")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.image)
+        return
+
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        database_url = args.database_url or f"sqlite:///{os.path.join(directory, 'startup.db')}"
+        for mode in MODES:
+            results[mode] = summarize([run_once(mode, args, database_url) for _ in range(args.repeat)])
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    for mode, result in results.items():
+        print(
+            f"{mode:7s} import {result['import_s']:6.3f}s  start-up {result['startup_s']:6.3f}s  "
+            f"process {result['process_s']:6.3f}s  first API {result['first_api_ms']:8.2f}ms  "
+            f"first face {result['first_face_ms']:8.2f}ms  second face {result['second_face_ms']:8.2f}ms  "
+            f"(HTTP {result['face_status']}, face_recognition in API process: "
+            f"{'yes' if result['face_library_in_api_process'] else 'no'})"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Check or rebuild the attendance summary counters.
+
+Attendance statistics are read from the attendance_summary table, which the
+application keeps in step with every attendance insert, status change and
+delete. Changes made outside the ORM (raw SQL, bulk deletes) are not
+counted, so:
+
+  check    compares every counter with a count over the attendance rows
+           and lists the ones that differ (exit status 1 if any)
+  rebuild  recomputes all counters from the attendance rows in one
+           transaction (the API does this at start-up when the table is
+           empty but attendance is not)
+
+Usage (from the backend directory):
+    python -m scripts.attendance_summary check [--limit 50]
+    python -m scripts.attendance_summary rebuild
+"""
+
+import argparse
+import sys
+from app.database import Base, engine, SessionLocal
+from app.models.attendance_summary_model import AttendanceSummary
+from app.models import user_model, student_model, face_template_model  # noqa: F401 - register related mappers
+from app.services.attendance_service import check_attendance_summary, rebuild_attendance_summary
+
+
+def check(limit: int):
+    db = SessionLocal()
+    try:
+        mismatches = check_attendance_summary(db)
+    finally:
+        db.close()
+
+    for student_id, subject, status, expected, stored in mismatches[:limit]:
+        print(f"student {student_id} subject {subject or '-'!r} {status.value}: "
+              f"{expected} attendance rows, counter {stored}")
+    if len(mismatches) > limit:
+        print(f"... and {len(mismatches) - limit} more")
+    print(f"{len(mismatches)} counters differ" if mismatches else "Summary matches the attendance rows")
+    return not mismatches
+
+
+def rebuild():
+    db = SessionLocal()
+    try:
+        rows = rebuild_attendance_summary(db)
+    finally:
+        db.close()
+    print(f"Rebuilt {rows} summary counters")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check or rebuild the attendance summary counters")
+    parser.add_argument("command", choices=["check", "rebuild"])
+    parser.add_argument("--limit", type=int, default=50, help="Mismatches to list with check")
+    args = parser.parse_args()
+
+    # The table is new; databases created before it get it here
+    Base.metadata.create_all(bind=engine, tables=[AttendanceSummary.__table__])
+    if args.command == "rebuild":
+        rebuild()
+    elif not check(args.limit):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+Add the attendance uniqueness rule to an existing database.
+
+New databases get it from create_all. For tables created before it, this
+script:
+  1. adds the class_day and idempotency_key columns if they are missing,
+  2. fills class_day from class_date in id-ordered batches,
+  3. deletes duplicate marks, keeping the earliest row per
+     (student, subject, class day),
+  4. creates the unique indexes,
+  5. rebuilds the attendance summary counters if duplicates were deleted
+     (the bulk delete bypasses the listeners that keep them in step).
+Every step can be re-run safely. With --dry-run only the duplicates that
+would be deleted are counted.
+
+Usage (from the backend directory):
+    python -m scripts.migrate_attendance_dedupe [--batch-size 5000] [--dry-run]
+"""
+
+import argparse
+from sqlalchemy import inspect, text, func, bindparam
+from sqlalchemy.schema import CreateIndex
+from app.database import Base, engine, SessionLocal
+from app.models.attendance_model import Attendance
+from app.models.attendance_summary_model import AttendanceSummary
+from app.models import user_model, student_model, face_template_model  # noqa: F401 - register related mappers
+from app.services.attendance_service import rebuild_attendance_summary
+
+
+def add_columns():
+    """Add class_day and idempotency_key to an attendance table that lacks them"""
+    columns = {column["name"] for column in inspect(engine).get_columns("attendance")}
+    with engine.begin() as connection:
+        if "class_day" not in columns:
+            connection.execute(text("ALTER TABLE attendance ADD COLUMN class_day DATE"))
+            print("Added attendance.class_day")
+        if "idempotency_key" not in columns:
+            connection.execute(text("ALTER TABLE attendance ADD COLUMN idempotency_key VARCHAR"))
+            print("Added attendance.idempotency_key")
+
+
+def backfill_class_day(batch_size: int):
+    """Set class_day = date(class_date) where it is missing, one batch per transaction"""
+    filled = 0
+    last_id = 0
+    db = SessionLocal()
+    try:
+        while True:
+            rows = db.query(Attendance.id, Attendance.class_date).filter(
+                Attendance.id > last_id,
+                Attendance.class_day.is_(None)
+            ).order_by(Attendance.id).limit(batch_size).all()
+            if not rows:
+                break
+            table = Attendance.__table__
+            updates = [{"row_id": row.id, "day": row.class_date.date()} for row in rows if row.class_date]
+            if updates:
+                db.execute(
+                    table.update().where(table.c.id == bindparam("row_id")).values(class_day=bindparam("day")),
+                    updates
+                )
+            db.commit()
+            filled += len(rows)
+            last_id = rows[-1].id
+            print(f"Filled class_day up to attendance {last_id}")
+    finally:
+        db.close()
+    return filled
+
+
+def remove_duplicates(batch_size: int, dry_run: bool):
+    """Delete all but the earliest row of each (student, subject, class day)"""
+    db = SessionLocal()
+    try:
+        keep = db.query(func.min(Attendance.id)).group_by(
+            Attendance.student_id, func.coalesce(Attendance.subject, ""), Attendance.class_day
+        )
+        duplicates = [
+            row.id for row in db.query(Attendance.id).filter(~Attendance.id.in_(keep)).order_by(Attendance.id)
+        ]
+        if dry_run:
+            return len(duplicates)
+        for start in range(0, len(duplicates), batch_size):
+            batch = duplicates[start:start + batch_size]
+            db.query(Attendance).filter(Attendance.id.in_(batch)).delete(synchronize_session=False)
+            db.commit()
+            print(f"Deleted {start + len(batch)} of {len(duplicates)} duplicates")
+        return len(duplicates)
+    finally:
+        db.close()
+
+
+def create_indexes():
+    # IF NOT EXISTS rather than checkfirst: expression indexes are not reflected
+    with engine.begin() as connection:
+        for index in Attendance.__table__.indexes:
+            connection.execute(CreateIndex(index, if_not_exists=True))
+        # idempotency_key is unique=True on the model, which create_all turns
+        # into a constraint; an existing table gets a unique index instead
+        connection.execute(text(
+            "CREATE UNIQUE INDEX IF NOT EXISTS uq_attendance_idempotency_key ON attendance (idempotency_key)"
+        ))
+
+
+def rebuild_summary():
+    """Recount the attendance summary after rows were deleted outside the ORM"""
+    Base.metadata.create_all(bind=engine, tables=[AttendanceSummary.__table__])
+    db = SessionLocal()
+    try:
+        return rebuild_attendance_summary(db)
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Add the attendance uniqueness rule to an existing database")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--dry-run", action="store_true", help="Only count duplicates; change nothing")
+    args = parser.parse_args()
+
+    if args.dry_run:
+        columns = {column["name"] for column in inspect(engine).get_columns("attendance")}
+        if "class_day" not in columns:
+            print("attendance.class_day is missing; run without --dry-run to add it")
+            return
+        print(f"{remove_duplicates(args.batch_size, dry_run=True)} duplicate rows would be deleted")
+        return
+
+    add_columns()
+    filled = backfill_class_day(args.batch_size)
+    removed = remove_duplicates(args.batch_size, dry_run=False)
+    create_indexes()
+    if removed:
+        print(f"Rebuilt {rebuild_summary()} attendance summary counters")
+    print(f"Done: {filled} rows backfilled, {removed} duplicates deleted, unique indexes in place")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""
+Add the attendance date-range indexes to an existing database.
+
+New databases get them from create_all. For tables created before them, this
+script creates (student_id, class_date), (subject, class_date) and
+(class_date) indexes if they are missing, then refreshes the planner
+statistics. On PostgreSQL the indexes are built CONCURRENTLY, so marking
+attendance is not blocked while they build; if a build is interrupted,
+drop the INVALID index it leaves behind before re-running. Safe to re-run.
+
+Usage (from the backend directory):
+    python -m scripts.migrate_attendance_indexes
+"""
+
+import argparse
+import time
+from sqlalchemy import text
+from sqlalchemy.schema import CreateIndex
+from app.database import engine
+from app.models.attendance_model import Attendance
+from app.models import user_model, student_model, face_template_model  # noqa: F401 - register related mappers
+
+INDEXES = ("ix_attendance_student_class_date", "ix_attendance_subject_class_date", "ix_attendance_class_date")
+
+
+def create_indexes():
+    indexes = [index for index in Attendance.__table__.indexes if index.name in INDEXES]
+    postgres = engine.dialect.name == "postgresql"
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction block
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        for index in indexes:
+            start = time.perf_counter()
+            statement = str(CreateIndex(index, if_not_exists=True).compile(dialect=engine.dialect))
+            if postgres:
+                statement = statement.replace("CREATE INDEX", "CREATE INDEX CONCURRENTLY", 1)
+            connection.execute(text(statement))
+            print(f"{index.name} in place ({time.perf_counter() - start:.1f}s)")
+        connection.execute(text("ANALYZE attendance"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Add the attendance date-range indexes to an existing database")
+    parser.parse_args()
+    create_indexes()
+    print("Done: attendance date-range indexes in place")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Convert pickled face encodings to the raw-float storage format.
+
+Rows are processed in id order, one batch per transaction, so the migration
+can be interrupted and re-run safely: rows already in the new format are
+left alone. The API keeps reading both formats while this runs.
+
+Usage (from the backend directory):
+    python -m scripts.migrate_face_encodings [--batch-size 500] [--dtype float32] [--dry-run]
+"""
+
+import argparse
+from sqlalchemy import update
+from app.database import SessionLocal
+from app.models.student_model import Student
+from app.models import user_model, attendance_model, face_template_model  # noqa: F401 - register related mappers
+from app.config import settings
+from app.utils.face_utils import (
+    serialize_face_encoding,
+    deserialize_face_encoding,
+    is_legacy_face_encoding,
+)
+
+
+def migrate_face_encodings(batch_size: int = 500, dtype: str = "float32", dry_run: bool = False):
+    """Rewrite every legacy pickled encoding; returns (scanned, converted, failed)"""
+    scanned = converted = failed = 0
+    last_id = 0
+    db = SessionLocal()
+    try:
+        while True:
+            rows = db.query(Student.id, Student.face_encoding).filter(
+                Student.id > last_id,
+                Student.face_encoding.isnot(None)
+            ).order_by(Student.id).limit(batch_size).all()
+            if not rows:
+                break
+
+            updates = []
+            for student_id, data in rows:
+                scanned += 1
+                if not is_legacy_face_encoding(data):
+                    continue
+                try:
+                    encoding = deserialize_face_encoding(data)
+                except Exception as e:
+                    failed += 1
+                    print(f"Skipping student {student_id}: {str(e)}")
+                    continue
+                updates.append({"id": student_id, "face_encoding": serialize_face_encoding(encoding, dtype)})
+
+            if updates and not dry_run:
+                db.execute(update(Student), updates)
+                db.commit()
+            converted += len(updates)
+            last_id = rows[-1][0]
+            print(f"Processed up to student {last_id}: {converted} converted so far")
+    finally:
+        db.close()
+
+    return scanned, converted, failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert pickled face encodings to the raw-float format")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--dtype", choices=["float32", "float64"], default=settings.FACE_ENCODING_DTYPE)
+    parser.add_argument("--dry-run", action="store_true", help="Report what would change without writing")
+    args = parser.parse_args()
+
+    scanned, converted, failed = migrate_face_encodings(args.batch_size, args.dtype, args.dry_run)
+    action = "Would convert" if args.dry_run else "Converted"
+    print(f"Scanned {scanned} encodings. {action} {converted}, failed {failed}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+import os
+
+# Never touch the development database when app modules are imported
+os.environ["DATABASE_URL"] = "sqlite://"
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from app.database import Base
+from app.models import user_model, student_model, face_template_model, attendance_summary_model  # noqa: F401
+from app.models.student_model import Student
+from app.services import attendance_service
+
+
+@pytest.fixture
+def make_session():
+    """Session factory over one in-memory SQLite database, shared by every session"""
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    attendance_service.recent_marks.clear()
+    yield sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    attendance_service.recent_marks.clear()
+    engine.dispose()
+
+
+@pytest.fixture
+def db(make_session):
+    session = make_session()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def students(db):
+    """Ids of three students"""
+    rows = [Student(student_id=f"R{i}") for i in range(3)]
+    db.add_all(rows)
+    db.commit()
+    return [row.id for row in rows]
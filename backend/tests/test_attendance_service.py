@@ -0,0 +1,88 @@
+from datetime import datetime
+from app.models.attendance_model import Attendance
+from app.services import attendance_service
+from app.services.attendance_service import save_attendance, check_attendance_summary
+
+CLASS_DATE = datetime(2024, 3, 4, 9, 30)
+
+
+def mark(student_id, subject="Maths", class_date=CLASS_DATE, **fields):
+    return Attendance(student_id=student_id, subject=subject, class_date=class_date, **fields)
+
+
+def test_duplicate_mark_returns_the_stored_row(db, students):
+    [(first, created)] = save_attendance(db, [mark(students[0])])
+    assert created
+
+    # Answered from the recently-marked index, then from the database
+    assert save_attendance(db, [mark(students[0], class_date=datetime(2024, 3, 4, 14))]) == [(first, False)]
+    attendance_service.recent_marks.clear()
+    assert save_attendance(db, [mark(students[0])]) == [(first, False)]
+    assert db.query(Attendance).count() == 1
+
+
+def test_duplicates_within_a_batch_resolve_to_the_first(db, students):
+    results = save_attendance(db, [mark(students[0]), mark(students[1]), mark(students[0])])
+    assert [created for _, created in results] == [True, True, False]
+    assert results[2][0] == results[0][0]
+    assert db.query(Attendance).count() == 2
+
+
+def test_insert_race_with_another_worker(db, make_session, students, monkeypatch):
+    """Another worker commits the same mark between the lookup and the insert"""
+    other = make_session()
+    lookup = attendance_service._existing_marks
+
+    def lookup_then_race(session, keys, ids=()):
+        found = lookup(session, keys, ids)
+        if not hasattr(lookup_then_race, "raced"):
+            lookup_then_race.raced = True
+            other.add(mark(students[0]))
+            other.commit()
+        return found
+
+    monkeypatch.setattr(attendance_service, "_existing_marks", lookup_then_race)
+    results = save_attendance(db, [mark(students[0]), mark(students[1])])
+
+    winner = other.query(Attendance.id).filter(Attendance.student_id == students[0]).scalar()
+    assert results[0] == (winner, False)
+    assert results[1][1] is True
+    assert db.query(Attendance).count() == 2
+    # The failed insert left no counter behind
+    assert check_attendance_summary(db) == []
+    other.close()
+
+
+def test_reused_idempotency_key_returns_the_original_row(db, students):
+    [(first, _)] = save_attendance(db, [mark(students[0], idempotency_key="k1")])
+    attendance_service.recent_marks.clear()
+
+    assert save_attendance(db, [mark(students[1], idempotency_key="k1")]) == [(first, False)]
+    assert attendance_service.find_idempotent(db, "k1").id == first
+    assert db.query(Attendance).count() == 1
+
+
+def test_mark_again_after_delete_through_the_api(db, students):
+    [(first, _)] = save_attendance(db, [mark(students[0])])
+    record = db.get(Attendance, first)
+    db.delete(record)
+    db.commit()
+    attendance_service.forget_attendance(record)
+
+    [(second, created)] = save_attendance(db, [mark(students[0])])
+    assert created
+    assert db.get(Attendance, second) is not None
+
+
+def test_mark_again_after_another_worker_deletes_the_row(db, make_session, students):
+    """The recently-marked index is per process; a row deleted elsewhere is not a duplicate"""
+    [(first, _)] = save_attendance(db, [mark(students[0], idempotency_key="k1")])
+    other = make_session()
+    other.delete(other.get(Attendance, first))
+    other.commit()
+    other.close()
+
+    [(second, created)] = save_attendance(db, [mark(students[0])])
+    assert created
+    assert db.get(Attendance, second) is not None
+    assert attendance_service.find_idempotent(db, "k1") is None
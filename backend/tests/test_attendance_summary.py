@@ -0,0 +1,105 @@
+from datetime import datetime
+from app.models.attendance_model import Attendance, AttendanceStatus
+from app.models.attendance_summary_model import AttendanceSummary
+from app.services.attendance_service import (
+    check_attendance_summary,
+    ensure_attendance_summary,
+    get_student_stats,
+    rebuild_attendance_summary,
+)
+
+
+def counters(db):
+    """{(student_id, subject, status): count} of the non-zero counters"""
+    return {
+        (row.student_id, row.subject, row.status): row.count
+        for row in db.query(AttendanceSummary).filter(AttendanceSummary.count != 0)
+    }
+
+
+def add_marks(db, student_id):
+    records = [
+        Attendance(student_id=student_id, subject="Maths", class_date=datetime(2024, 3, day, 9), status=status)
+        for day, status in ((4, AttendanceStatus.PRESENT), (5, AttendanceStatus.ABSENT), (6, AttendanceStatus.PRESENT))
+    ]
+    records.append(Attendance(student_id=student_id, class_date=datetime(2024, 3, 4, 9)))  # status defaults to present
+    db.add_all(records)
+    db.commit()
+    return records
+
+
+def test_insert_counts_every_row(db, students):
+    add_marks(db, students[0])
+    assert counters(db) == {
+        (students[0], "Maths", AttendanceStatus.PRESENT): 2,
+        (students[0], "Maths", AttendanceStatus.ABSENT): 1,
+        (students[0], "", AttendanceStatus.PRESENT): 1,
+    }
+    stats = get_student_stats(db, students[0])
+    assert (stats["total_classes"], stats["present"], stats["absent"]) == (4, 3, 1)
+    assert check_attendance_summary(db) == []
+
+
+def test_update_moves_the_row_between_counters(db, students):
+    records = add_marks(db, students[0])
+    records[1].status = AttendanceStatus.LATE
+    records[2].subject = "Physics"
+    records[3].student_id = students[1]
+    db.commit()
+
+    assert counters(db) == {
+        (students[0], "Maths", AttendanceStatus.PRESENT): 1,
+        (students[0], "Maths", AttendanceStatus.LATE): 1,
+        (students[0], "Physics", AttendanceStatus.PRESENT): 1,
+        (students[1], "", AttendanceStatus.PRESENT): 1,
+    }
+    assert check_attendance_summary(db) == []
+
+
+def test_unchanged_update_leaves_counters_alone(db, students):
+    records = add_marks(db, students[0])
+    before = counters(db)
+    records[0].remarks = "on time"
+    records[1].status = AttendanceStatus.ABSENT
+    db.commit()
+    assert counters(db) == before
+
+
+def test_delete_decrements(db, students):
+    records = add_marks(db, students[0])
+    db.delete(records[0])
+    db.delete(records[1])
+    db.commit()
+
+    assert counters(db) == {
+        (students[0], "Maths", AttendanceStatus.PRESENT): 1,
+        (students[0], "", AttendanceStatus.PRESENT): 1,
+    }
+    assert check_attendance_summary(db) == []
+
+
+def test_rolled_back_changes_are_not_counted(db, students):
+    records = add_marks(db, students[0])
+    before = counters(db)
+    db.add(Attendance(student_id=students[1], subject="Maths", class_date=datetime(2024, 3, 4, 9)))
+    db.delete(records[0])
+    db.flush()
+    db.rollback()
+    assert counters(db) == before
+
+
+def test_rebuild_and_bootstrap(db, students):
+    add_marks(db, students[0])
+    expected = counters(db)
+    assert ensure_attendance_summary(db) is None
+
+    db.query(AttendanceSummary).delete()
+    db.commit()
+    assert len(check_attendance_summary(db)) == 3
+    assert ensure_attendance_summary(db) == 3
+    assert counters(db) == expected
+
+    db.query(AttendanceSummary).update({AttendanceSummary.count: 7})
+    db.commit()
+    assert rebuild_attendance_summary(db) == 3
+    assert counters(db) == expected
@@ -6,10 +6,15 @@ const DataTable = ({
     data,
     searchable = true,
     pagination = true,
-    itemsPerPage = 10
+    itemsPerPage = 10,
+    // Server-side paging: with hasMore, "next" on the last page calls onLoadMore,
+    // which should append the next page of rows to data
+    hasMore = false,
+    onLoadMore
 }) => {
     const [searchTerm, setSearchTerm] = useState('');
-    const [currentPage, setCurrentPage] = useState(1);
+    const [requestedPage, setRequestedPage] = useState(1);
+    const [loadingMore, setLoadingMore] = useState(false);
     const [sortConfig, setSortConfig] = useState({ key: null, direction: 'asc' });
 
     // Filter data based on search
@@ -34,9 +39,26 @@ const DataTable = ({
 
     // Paginate data
     const totalPages = Math.ceil(sortedData.length / itemsPerPage);
+    const currentPage = Math.min(requestedPage, Math.max(totalPages, 1));
+    const canLoadMore = hasMore && Boolean(onLoadMore);
     const startIndex = (currentPage - 1) * itemsPerPage;
     const paginatedData = sortedData.slice(startIndex, startIndex + itemsPerPage);
 
+    const handleNext = async () => {
+        if (currentPage < totalPages) {
+            setRequestedPage(currentPage + 1);
+            return;
+        }
+        if (!canLoadMore) return;
+        setLoadingMore(true);
+        try {
+            await onLoadMore();
+            setRequestedPage(currentPage + 1);
+        } finally {
+            setLoadingMore(false);
+        }
+    };
+
     const handleSort = (key) => {
         setSortConfig({
             key,
@@ -101,14 +123,14 @@ const DataTable = ({
                 </table>
             </div>
 
-            {pagination && totalPages > 1 && (
+            {pagination && (totalPages > 1 || canLoadMore) && (
                 <div className="data-table-pagination">
                     <div className="pagination-info">
-                        Showing {startIndex + 1} to {Math.min(startIndex + itemsPerPage, sortedData.length)} of {sortedData.length} entries
+                        Showing {startIndex + 1} to {Math.min(startIndex + itemsPerPage, sortedData.length)} of {sortedData.length}{canLoadMore ? '+' : ''} entries
                     </div>
                     <div className="pagination-controls">
                         <button
-                            onClick={() => setCurrentPage(p => Math.max(1, p - 1))}
+                            onClick={() => setRequestedPage(Math.max(1, currentPage - 1))}
                             disabled={currentPage === 1}
                             className="pagination-button"
                         >
@@ -118,7 +140,7 @@ const DataTable = ({
                         {Array.from({ length: totalPages }, (_, i) => i + 1).map(page => (
                             <button
                                 key={page}
-                                onClick={() => setCurrentPage(page)}
+                                onClick={() => setRequestedPage(page)}
                                 className={`pagination-button ${currentPage === page ? 'active' : ''}`}
                             >
                                 {page}
@@ -126,8 +148,8 @@ const DataTable = ({
                         ))}
 
                         <button
-                            onClick={() => setCurrentPage(p => Math.min(totalPages, p + 1))}
-                            disabled={currentPage === totalPages}
+                            onClick={handleNext}
+                            disabled={loadingMore || (currentPage >= totalPages && !canLoadMore)}
                             className="pagination-button"
                         >
                             <FaChevronRight />
@@ -17,6 +17,7 @@ const AdminDashboard = () => {
         avgAttendance: 0,
     });
     const [students, setStudents] = useState([]);
+    const [studentsCursor, setStudentsCursor] = useState(null);
     const [loading, setLoading] = useState(true);
     const [error, setError] = useState(null);
 
@@ -29,8 +30,8 @@ const AdminDashboard = () => {
             setLoading(true);
             setError(null);
 
-            const [studentsData, allRecords] = await Promise.all([
-                studentService.getAllStudents(0, 200),
+            const [studentsPage, allRecords] = await Promise.all([
+                studentService.getStudentsPage({ limit: 200 }),
                 attendanceService.getAttendanceRecords({ limit: 200 }),
             ]);
 
@@ -47,12 +48,13 @@ const AdminDashboard = () => {
                 : 0;
 
             setStats({
-                totalStudents: studentsData.length,
+                totalStudents: studentsPage.items.length,
                 totalAttendance: allRecords.length,
                 presentToday: todayPresent,
                 avgAttendance: avgPct,
             });
-            setStudents(studentsData);
+            setStudents(studentsPage.items);
+            setStudentsCursor(studentsPage.nextCursor);
         } catch (err) {
             setError('Failed to load dashboard data.');
             console.error(err);
@@ -61,6 +63,16 @@ const AdminDashboard = () => {
         }
     };
 
+    const loadMoreStudents = async () => {
+        try {
+            const page = await studentService.getStudentsPage({ cursor: studentsCursor, limit: 200 });
+            setStudents(prev => [...prev, ...page.items]);
+            setStudentsCursor(page.nextCursor);
+        } catch {
+            alert('Failed to load more students.');
+        }
+    };
+
     const handleDeleteStudent = async (studentId) => {
         if (!window.confirm('Are you sure you want to delete this student?')) return;
         try {
@@ -157,6 +169,8 @@ const AdminDashboard = () => {
                                     searchable={true}
                                     pagination={true}
                                     itemsPerPage={8}
+                                    hasMore={Boolean(studentsCursor)}
+                                    onLoadMore={loadMoreStudents}
                                 />
                             )}
                         </div>
@@ -9,6 +9,23 @@ export const getStudentStats = async (studentId) => {
     return response.data;
 };
 
+/**
+ * Get attendance statistics for many students in one request
+ * Pass studentIds and/or department, year, section
+ * Returns: { students: [{ student_id, student_roll, total_classes, present, ... }] }
+ */
+export const getStudentsStats = async ({ studentIds, department, year, section } = {}) => {
+    // Repeated student_ids=... keys, which FastAPI reads as a list
+    const params = new URLSearchParams();
+    (studentIds || []).forEach((id) => params.append('student_ids', id));
+    if (department) params.append('department', department);
+    if (year) params.append('year', year);
+    if (section) params.append('section', section);
+
+    const response = await api.get('/attendance/stats', { params });
+    return response.data;
+};
+
 /**
  * Get attendance records with optional filters
  */
@@ -22,6 +39,22 @@ export const getAttendanceRecords = async ({ studentId, startDate, endDate, skip
     return response.data;
 };
 
+/**
+ * Get one page of attendance records, ordered by class date
+ * Pass the nextCursor of the previous page to continue; constant cost at any depth
+ * Returns: { items: [...], nextCursor } (nextCursor is null on the last page)
+ */
+export const getAttendancePage = async ({ studentId, startDate, endDate, cursor, limit = 100 } = {}) => {
+    const params = { limit };
+    if (cursor) params.cursor = cursor;
+    if (studentId) params.student_id = studentId;
+    if (startDate) params.start_date = startDate;
+    if (endDate) params.end_date = endDate;
+
+    const response = await api.get('/attendance/', { params });
+    return { items: response.data, nextCursor: response.headers['x-next-cursor'] || null };
+};
+
 /**
  * Mark attendance manually
  * data: { student_id, subject, status, marked_by, remarks }
@@ -46,6 +79,64 @@ export const markAttendanceByFace = async (imageFile, subject, markedBy) => {
     return response.data;
 };
 
+/**
+ * Mark attendance for a whole class from one group photo (multipart upload)
+ * Returns: { faces_detected, matched: [...], unmatched: [...] }
+ */
+export const markClassAttendanceByFace = async (imageFile, subject, markedBy) => {
+    const formData = new FormData();
+    formData.append('file', imageFile);
+
+    const params = {};
+    if (subject) params.subject = subject;
+    if (markedBy) params.marked_by = markedBy;
+
+    const response = await api.post('/attendance/mark-class-by-face', formData, {
+        params,
+        headers: { 'Content-Type': 'multipart/form-data' },
+    });
+    return response.data;
+};
+
+/**
+ * Open a live recognition session for a camera kiosk (WebSocket)
+ * options: { subject, markedBy, department, year, section }
+ * onEvent receives { type: 'frame' | 'marked' | 'busy' | 'error', ... }
+ * Returns: { sendFrame(blob), close() }
+ */
+export const openLiveRecognition = (options, onEvent) => {
+    const params = new URLSearchParams();
+    if (options.subject) params.set('subject', options.subject);
+    if (options.markedBy) params.set('marked_by', options.markedBy);
+    if (options.department) params.set('department', options.department);
+    if (options.year) params.set('year', options.year);
+    if (options.section) params.set('section', options.section);
+
+    const url = `${api.defaults.baseURL.replace(/^http/, 'ws')}/attendance/live?${params}`;
+    const socket = new WebSocket(url);
+    socket.binaryType = 'arraybuffer';
+    socket.onmessage = (message) => onEvent(JSON.parse(message.data));
+
+    return {
+        // Skip frames while the previous one is still being sent
+        sendFrame: (blob) => {
+            if (socket.readyState === WebSocket.OPEN && socket.bufferedAmount === 0) {
+                socket.send(blob);
+            }
+        },
+        close: () => socket.close(),
+    };
+};
+
+/**
+ * Change the status or remarks of an attendance record
+ * data: { status, remarks }
+ */
+export const updateAttendance = async (attendanceId, data) => {
+    const response = await api.put(`/attendance/${attendanceId}`, data);
+    return response.data;
+};
+
 /**
  * Delete an attendance record
  */
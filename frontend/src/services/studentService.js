@@ -8,6 +8,19 @@ export const getAllStudents = async (skip = 0, limit = 100) => {
     return response.data;
 };
 
+/**
+ * Get one page of students, ordered by id
+ * Pass the nextCursor of the previous page to continue
+ * Returns: { items: [...], nextCursor } (nextCursor is null on the last page)
+ */
+export const getStudentsPage = async ({ cursor, limit = 100 } = {}) => {
+    const params = { limit };
+    if (cursor) params.cursor = cursor;
+
+    const response = await api.get('/students/', { params });
+    return { items: response.data, nextCursor: response.headers['x-next-cursor'] || null };
+};
+
 /**
  * Get a single student by ID
  */
@@ -46,6 +59,51 @@ export const uploadStudentFace = async (studentId, imageFile) => {
     return response.data;
 };
 
+/**
+ * Enroll many faces at once from a ZIP of photos named by roll number
+ * (or with a manifest.csv of filename,student_id)
+ * Returns: { enrolled, total, results: [{ filename, student_id, status, detail }] }
+ */
+export const bulkUploadFaces = async (zipFile) => {
+    const formData = new FormData();
+    formData.append('archive', zipFile);
+
+    const response = await api.post('/students/bulk-upload-faces', formData, {
+        headers: { 'Content-Type': 'multipart/form-data' },
+    });
+    return response.data;
+};
+
+/**
+ * List a student's extra face templates
+ * Returns: [{ id, student_id, label, created_at }]
+ */
+export const getFaceTemplates = async (studentId) => {
+    const response = await api.get(`/students/${studentId}/face-templates`);
+    return response.data;
+};
+
+/**
+ * Add another face template (e.g. with glasses or in different lighting)
+ */
+export const addFaceTemplate = async (studentId, imageFile, label = null) => {
+    const formData = new FormData();
+    formData.append('file', imageFile);
+
+    const response = await api.post(`/students/${studentId}/face-templates`, formData, {
+        params: label ? { label } : {},
+        headers: { 'Content-Type': 'multipart/form-data' },
+    });
+    return response.data;
+};
+
+/**
+ * Delete one face template
+ */
+export const deleteFaceTemplate = async (studentId, templateId) => {
+    await api.delete(`/students/${studentId}/face-templates/${templateId}`);
+};
+
 /**
  * Delete a student
  */